@@ -1,22 +1,49 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
+import asyncio
+import hmac
 import os
+import threading
 
-from database import get_db, User
+from database import get_async_db, User
+from metrics import Gauge, registry
+from principal_cache import principal_cache
 
 # Security configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production-min-32-chars")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
+# bcrypt runs on its own bounded pool so a login storm can't stall the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+# Hash jobs queued or running before new ones are shed with 429
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 32))
+# Scheduling niceness of hash threads, so SOS requests win the CPU when cores are scarce
+PASSWORD_HASH_NICE = int(os.getenv("PASSWORD_HASH_NICE", 10))
+# Shared secret for the /debug endpoints, sent as X-Debug-Token (unset = endpoints hidden)
+DEBUG_TOKEN = os.getenv("DEBUG_TOKEN", "")
+# Shared secret of dispatch/operator consoles, sent as X-Dispatcher-Token (unset = /sos/nearby disabled)
+DISPATCHER_TOKEN = os.getenv("DISPATCHER_TOKEN", "")
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+_hash_pool: Optional[ThreadPoolExecutor] = None
+_hash_lock = threading.Lock()
+_hash_pending = 0
+
+registry.register(Gauge(
+    "password_hash_pending", "bcrypt jobs queued or running on the password pool.",
+    collect=lambda: [((), _hash_pending)]
+))
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -25,9 +52,56 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
+def _lower_thread_priority():
+    try:
+        # Linux schedules threads individually, so this only affects the hash worker
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), PASSWORD_HASH_NICE)
+    except (AttributeError, OSError):
+        pass
+
+def _get_hash_pool() -> ThreadPoolExecutor:
+    """Shared pool for bcrypt work (bcrypt releases the GIL, so threads run in parallel)"""
+    global _hash_pool
+    with _hash_lock:
+        if _hash_pool is None:
+            _hash_pool = ThreadPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                thread_name_prefix="passwords",
+                initializer=_lower_thread_priority if PASSWORD_HASH_NICE else None
+            )
+    return _hash_pool
+
+async def _run_password_job(fn, *args):
+    """Run a bcrypt call off the event loop, shedding with 429 when the queue is full"""
+    global _hash_pending
+    with _hash_lock:
+        if _hash_pending >= PASSWORD_HASH_MAX_PENDING:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many sign-in attempts in progress, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        _hash_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_hash_pool(), fn, *args)
+    finally:
+        with _hash_lock:
+            _hash_pending -= 1
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the password pool"""
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the password pool"""
+    return await _run_password_job(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token"""
     to_encode = data.copy()
+    if "sub" in to_encode:
+        # RFC 7519 requires a string subject; python-jose rejects tokens with an int sub on decode
+        to_encode["sub"] = str(to_encode["sub"])
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
@@ -37,12 +111,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def authenticate_user(db: Session, phone: str, password: str) -> Optional[User]:
+async def authenticate_user(db: AsyncSession, phone: str, password: str) -> Optional[User]:
     """Authenticate a user by phone and password"""
-    user = db.query(User).filter(User.phone == phone).first()
+    user = await db.scalar(select(User).where(User.phone == phone).limit(1))
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    # End the read transaction so the connection isn't held while bcrypt runs
+    await db.commit()
+    if not await verify_password_async(password, user.password_hash):
         return None
     if not user.is_active:
         return None
@@ -50,9 +126,27 @@ def authenticate_user(db: Session, phone: str, password: str) -> Optional[User]:
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
-    """Get the current authenticated user from JWT token"""
+    """Get the current authenticated user from JWT token.
+
+    Verified tokens are served from the principal cache, which returns a
+    detached snapshot; load the user into the session before modifying it.
+    """
+    user = principal_cache.get(token)
+    if user is None:
+        user = await _load_principal(token, db)
+    
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User account is inactive"
+        )
+    
+    return user
+
+async def _load_principal(token: str, db: AsyncSession) -> User:
+    """Verify a token, load its user and cache the result"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -61,22 +155,19 @@ async def get_current_user(
     
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("sub")
+        user_id = payload.get("sub")
         if user_id is None:
             raise credentials_exception
-    except JWTError:
+        user_id = int(user_id)
+    except (JWTError, TypeError, ValueError):
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
+    generation = principal_cache.generation(user_id)
+    user = await db.get(User, user_id)
     if user is None:
         raise credentials_exception
     
-    if not user.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="User account is inactive"
-        )
-    
+    principal_cache.set(token, user, payload.get("exp"), generation)
     return user
 
 def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
@@ -87,3 +178,21 @@ def get_current_active_user(current_user: User = Depends(get_current_user)) -> U
             detail="User account is inactive"
         )
     return current_user
+
+def _check_shared_secret(expected: str, supplied: Optional[str], name: str):
+    # An unset secret hides the endpoint instead of leaving it open
+    if not expected:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if supplied is None or not hmac.compare_digest(supplied.encode(), expected.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Invalid {name} token"
+        )
+
+def require_debug_token(x_debug_token: Optional[str] = Header(None)):
+    """Guard for operator-only debug endpoints"""
+    _check_shared_secret(DEBUG_TOKEN, x_debug_token, "debug")
+
+def require_dispatcher_token(x_dispatcher_token: Optional[str] = Header(None)):
+    """Guard for endpoints exposing other users' alerts, for dispatch consoles only"""
+    _check_shared_secret(DISPATCHER_TOKEN, x_dispatcher_token, "dispatcher")
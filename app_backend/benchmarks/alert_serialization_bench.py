@@ -0,0 +1,79 @@
+"""
+Alert list serialization cost: field-by-field AlertResponse + response_model
+re-validation (the old path) vs the shared alert_list_response builder
+
+Run from app_backend/:  python benchmarks/alert_serialization_bench.py [repeats]
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from database import Alert
+from location import generate_google_maps_link
+from models import AlertResponse, AlertListResponse
+from routers.sos import alert_list_response
+
+SIZES = [50, 500]
+
+def make_alerts(count: int):
+    start = datetime(2024, 1, 1)
+    return [
+        Alert(id=i + 1, user_id=1, latitude=28.6 + i / 1000, longitude=77.2 - i / 1000,
+              address=f"{i} Bench Street, New Delhi", status="active", severity="high",
+              triggered_by="voice", created_at=start + timedelta(minutes=i), resolved_at=None)
+        for i in range(count)
+    ]
+
+_list_field = create_response_field(name="bench_response", type_=AlertListResponse)
+
+async def old_path(alerts):
+    """What get_alerts did before: build each model by hand, let FastAPI validate and encode it again"""
+    page = AlertListResponse(alerts=[
+        AlertResponse(
+            id=alert.id,
+            user_id=alert.user_id,
+            latitude=alert.latitude,
+            longitude=alert.longitude,
+            address=alert.address,
+            status=alert.status,
+            severity=alert.severity,
+            triggered_by=alert.triggered_by,
+            created_at=alert.created_at,
+            resolved_at=alert.resolved_at,
+            google_maps_link=generate_google_maps_link(alert.latitude, alert.longitude)
+        )
+        for alert in alerts
+    ])
+    content = await serialize_response(field=_list_field, response_content=page, is_coroutine=True)
+    return JSONResponse(content).body
+
+async def new_path(alerts):
+    return alert_list_response(alerts, None, None).body
+
+async def timed(fn, alerts, repeats: int) -> float:
+    await fn(alerts)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        await fn(alerts)
+    return (time.perf_counter() - start) / repeats * 1000
+
+async def run(repeats: int):
+    print(f"{'alerts':>6} | {'old ms':>8} | {'new ms':>8} | {'speedup':>7}")
+    for size in SIZES:
+        alerts = make_alerts(size)
+        assert json.loads(await old_path(alerts)) == json.loads(await new_path(alerts)), "paths disagree"
+        old_ms = await timed(old_path, alerts, repeats)
+        new_ms = await timed(new_path, alerts, repeats)
+        print(f"{size:>6} | {old_ms:>8.2f} | {new_ms:>8.2f} | {old_ms / new_ms:>6.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
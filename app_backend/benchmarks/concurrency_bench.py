@@ -0,0 +1,177 @@
+"""
+Mixed-load concurrency benchmark: SOS triggers, alert location updates and history reads
+against a real uvicorn server
+
+Run from app_backend/:  python benchmarks/concurrency_bench.py [clients] [seconds] [geocode_latency_ms]
+
+With a geocode latency, reverse geocoding goes to a local fake Geocoding API that
+answers after that delay, which shows whether slow upstream calls stall other requests.
+"""
+import asyncio
+import os
+import random
+import json
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmpdir}/bench.db")
+os.environ.setdefault("OUTBOX_WORKERS", "0")
+
+import httpx
+
+from auth import get_password_hash
+from database import SessionLocal, User
+
+PORT = int(os.getenv("BENCH_PORT", 8799))
+BASE_URL = f"http://127.0.0.1:{PORT}"
+
+# Share of each operation in the request mix
+MIX = [("trigger", 0.1), ("location", 0.6), ("history", 0.3)]
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def start_fake_geocoder(latency_ms: float) -> ThreadingHTTPServer:
+    """Minimal Geocoding API stand-in that answers every lookup after a fixed delay"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency_ms / 1000)
+            body = json.dumps({"status": "OK", "results": [{"formatted_address": "Bench Street"}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    geocoder = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=geocoder.serve_forever, daemon=True).start()
+    return geocoder
+
+def start_server() -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=os.environ.copy(),
+        stdout=subprocess.DEVNULL
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"{BASE_URL}/health", timeout=1)
+            return server
+        except httpx.TransportError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("Server did not start")
+
+PASSWORD = "benchpassword"
+
+def seed_users(count: int):
+    """Create one user per client and return their phone numbers"""
+    password_hash = get_password_hash(PASSWORD)
+    db = SessionLocal()
+    try:
+        users = [
+            User(name=f"Bench {i}", phone=f"+1555{i:07d}", email=f"bench{i}@example.com",
+                 password_hash=password_hash, codeword="helpme")
+            for i in range(count)
+        ]
+        db.add_all(users)
+        db.commit()
+        return [user.phone for user in users]
+    finally:
+        db.close()
+
+async def open_alert(client: httpx.AsyncClient, index: int, token: str):
+    rng = random.Random(index)
+    headers = {"Authorization": f"Bearer {token}"}
+    lat, lon = 28.6 + rng.random() / 10, 77.2 + rng.random() / 10
+    response = await client.post("/sos/trigger", json={"latitude": lat, "longitude": lon}, headers=headers)
+    return rng, headers, lat, lon, response.json()["id"]
+
+async def client_loop(client: httpx.AsyncClient, state, deadline: float, samples):
+    rng, headers, lat, lon, alert_id = state
+    operations, weights = zip(*MIX)
+    while time.perf_counter() < deadline:
+        operation = rng.choices(operations, weights)[0]
+        start = time.perf_counter()
+        if operation == "trigger":
+            response = await client.post("/sos/trigger", json={"latitude": lat, "longitude": lon}, headers=headers)
+        elif operation == "location":
+            # Move ~100 m so every update is stored rather than merged into a stop
+            lat += 0.001
+            response = await client.post(f"/sos/{alert_id}/location",
+                                         json={"latitude": lat, "longitude": lon}, headers=headers)
+        else:
+            response = await client.get(f"/sos/{alert_id}/location-history", headers=headers)
+        samples[operation].append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            samples["errors"].append(response.status_code)
+
+async def log_in(client: httpx.AsyncClient, phones, concurrency: int = 4):
+    """Bearer tokens from /auth/login, the way the app gets them"""
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(phone):
+        async with slots:
+            response = await client.post("/auth/login", json={"phone": phone, "password": PASSWORD})
+        response.raise_for_status()
+        return response.json()["access_token"]
+
+    return await asyncio.gather(*(one(phone) for phone in phones))
+
+async def run_load(phones, seconds: float):
+    samples = defaultdict(list)
+    limits = httpx.Limits(max_connections=len(phones), max_keepalive_connections=len(phones))
+    async with httpx.AsyncClient(base_url=BASE_URL, limits=limits, timeout=60) as client:
+        tokens = await log_in(client, phones)
+        # Every client opens its alert before the measured window starts
+        states = await asyncio.gather(*(open_alert(client, i, token) for i, token in enumerate(tokens)))
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(client_loop(client, state, deadline, samples) for state in states))
+    return samples
+
+def main(clients: int = 50, seconds: float = 10, geocode_latency_ms: float = 0):
+    geocoder = None
+    if geocode_latency_ms:
+        geocoder = start_fake_geocoder(geocode_latency_ms)
+        os.environ["GOOGLE_MAPS_API_KEY"] = "bench"
+        os.environ["GOOGLE_GEOCODE_URL"] = f"http://127.0.0.1:{geocoder.server_address[1]}/geocode/json"
+
+    server = start_server()
+    try:
+        samples = asyncio.run(run_load(seed_users(clients), seconds))
+    finally:
+        server.terminate()
+        server.wait()
+        if geocoder:
+            geocoder.shutdown()
+
+    total = sum(len(samples[operation]) for operation, _ in MIX)
+    print(f"{clients} clients, {seconds:.0f}s, geocode latency {geocode_latency_ms:.0f}ms: "
+          f"{total / seconds:.0f} req/s, {len(samples['errors'])} errors")
+    print(f"{'operation':>10} | {'count':>6} | {'p50 ms':>8} | {'p99 ms':>8}")
+    for operation, _ in MIX:
+        values = samples[operation]
+        if values:
+            print(f"{operation:>10} | {len(values):>6} | {percentile(values, 50):>8.1f} | {percentile(values, 99):>8.1f}")
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 10,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 0
+    )
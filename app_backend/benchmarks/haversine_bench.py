@@ -0,0 +1,69 @@
+"""
+Vectorized haversine and trajectory metrics vs the scalar calculate_distance loop
+
+Run from app_backend/:  python benchmarks/haversine_bench.py [sizes...]
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from location import calculate_distance, distances_from, path_metrics
+
+def make_track(count: int, seed: int = 42):
+    """A random walk of ~10 m steps, one fix per second"""
+    rng = np.random.default_rng(seed)
+    latitudes = 28.6 + np.cumsum(rng.normal(0, 0.0001, count))
+    longitudes = 77.2 + np.cumsum(rng.normal(0, 0.0001, count))
+    start = np.datetime64(datetime(2024, 1, 1), "us")
+    timestamps = start + np.arange(count) * np.timedelta64(1, "s")
+    return latitudes, longitudes, timestamps
+
+def scalar_path(latitudes, longitudes, timestamps):
+    lats, lons = latitudes.tolist(), longitudes.tolist()
+    times = timestamps.astype(datetime).tolist()
+    total_km = 0.0
+    max_speed = 0.0
+    for i in range(1, len(lats)):
+        km = calculate_distance(lats[i - 1], lons[i - 1], lats[i], lons[i])
+        total_km += km
+        seconds = (times[i] - times[i - 1]).total_seconds()
+        if seconds > 0:
+            max_speed = max(max_speed, km * 1000 / seconds)
+    return total_km, max_speed
+
+def vector_path(latitudes, longitudes, timestamps):
+    metrics = path_metrics(latitudes, longitudes, timestamps)
+    return float(metrics["cumulative_km"][-1]), float(np.nanmax(metrics["speed_mps"]))
+
+def scalar_one_to_many(latitudes, longitudes):
+    return [calculate_distance(28.6, 77.2, lat, lon) for lat, lon in zip(latitudes.tolist(), longitudes.tolist())]
+
+def vector_one_to_many(latitudes, longitudes):
+    return distances_from(28.6, 77.2, latitudes, longitudes)
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return (time.perf_counter() - start) * 1000, result
+
+def main(sizes):
+    print(f"{'points':>9} | {'operation':>11} | {'scalar ms':>10} | {'numpy ms':>9} | {'speedup':>7}")
+    for size in sizes:
+        latitudes, longitudes, timestamps = make_track(size)
+        cases = [
+            ("path", scalar_path, vector_path, (latitudes, longitudes, timestamps)),
+            ("one-to-many", scalar_one_to_many, vector_one_to_many, (latitudes, longitudes)),
+        ]
+        for name, scalar_fn, vector_fn, args in cases:
+            scalar_ms, expected = timed(scalar_fn, *args)
+            vector_ms, actual = timed(vector_fn, *args)
+            assert np.allclose(expected, actual, rtol=1e-9), name
+            print(f"{size:>9} | {name:>11} | {scalar_ms:>10.1f} | {vector_ms:>9.2f} | {scalar_ms / vector_ms:>6.0f}x")
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 1_000_000])
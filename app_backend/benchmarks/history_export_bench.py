@@ -0,0 +1,81 @@
+"""
+Peak memory and time: JSON location history vs the streaming export, as the trajectory grows
+
+Run from app_backend/:  python benchmarks/history_export_bench.py [points...]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmpdir}/bench.db")
+
+from sqlalchemy import insert
+
+from database import AsyncSessionLocal, SessionLocal, User, Alert, LocationUpdate, init_db
+from history_export import EXPORT_FORMATS, export_location_history
+from sos import get_alert_location_history
+
+def seed_alert(points: int) -> int:
+    db = SessionLocal()
+    try:
+        user = User(name="Bench User", phone=f"+1{points:010d}", email=f"bench{points}@example.com",
+                    password_hash="x", codeword="helpme")
+        db.add(user)
+        db.commit()
+        alert = Alert(user_id=user.id, latitude=28.6, longitude=77.2, status="active")
+        db.add(alert)
+        db.commit()
+
+        start = datetime(2024, 1, 1)
+        for offset in range(0, points, 10000):
+            db.execute(insert(LocationUpdate), [
+                {"user_id": user.id, "alert_id": alert.id, "latitude": 28.6 + i * 1e-5,
+                 "longitude": 77.2 + i * 1e-5, "accuracy": 5.0, "speed": 1.2, "heading": 90.0,
+                 "timestamp": start + timedelta(seconds=i)}
+                for i in range(offset, min(points, offset + 10000))
+            ])
+        db.commit()
+        return alert.id
+    finally:
+        db.close()
+
+async def json_history(alert_id: int) -> int:
+    async with AsyncSessionLocal() as db:
+        history, summary = await get_alert_location_history(db, alert_id)
+    return len(history)
+
+async def streamed_export(alert_id: int, export_format: str) -> int:
+    written = 0
+    async for chunk in export_location_history(alert_id, export_format):
+        written += len(chunk)
+    return written
+
+async def measure(coroutine):
+    tracemalloc.start()
+    start = time.perf_counter()
+    await coroutine
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1e6, elapsed * 1000
+
+async def run(sizes):
+    print(f"{'points':>8} | {'path':>14} | {'peak MB':>8} | {'ms':>8}")
+    for size in sizes:
+        alert_id = seed_alert(size)
+        cases = [("json history", json_history(alert_id))]
+        cases += [(f"export {name}", streamed_export(alert_id, name)) for name in EXPORT_FORMATS]
+        for label, coroutine in cases:
+            peak_mb, elapsed_ms = await measure(coroutine)
+            print(f"{size:>8} | {label:>14} | {peak_mb:>8.1f} | {elapsed_ms:>8.0f}")
+
+if __name__ == "__main__":
+    init_db()
+    asyncio.run(run([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]))
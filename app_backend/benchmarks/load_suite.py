@@ -0,0 +1,467 @@
+"""
+Load-test suite: the API under a realistic request mix, with local stand-ins for
+Twilio, SendGrid and the Google Geocoding API
+
+Run from app_backend/:
+    python benchmarks/load_suite.py [--clients 50] [--seconds 30] [--mix trigger=0.05,location=0.6,...]
+                                    [--geocode-latency-ms 80] [--sms-error-rate 0.05] ...
+                                    [--output run.json] [--compare baseline.json]
+
+The API runs in its own uvicorn process with every SQL statement counted against the
+operation that issued it. Results (p50/p95/p99 latency, throughput and DB queries per
+request for each operation, plus provider call counts) are written as JSON to stdout or
+--output; a summary table goes to stderr. With --compare, the run is checked against an
+earlier result file and the exit status is non-zero if an operation regressed.
+"""
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+_tmpdir = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmpdir}/bench.db")
+
+BENCH_HEADER = "x-bench-op"
+COUNTS_PATH = "/__bench__/queries"
+BACKGROUND = "background"
+PASSWORD = "benchpassword"
+
+# Operation -> (method, route) as reported in the results
+OPERATIONS = {
+    "trigger": ("POST", "/sos/trigger"),
+    "location": ("POST", "/location/update"),
+    "history": ("GET", "/sos/{alert_id}/location-history"),
+    "login": ("POST", "/auth/login"),
+}
+DEFAULT_MIX = "trigger=0.05,location=0.6,history=0.25,login=0.1"
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+# --- API process -------------------------------------------------------------------------
+
+def serve(port: int):
+    """Run the API with per-operation SQL statement counts, readable at COUNTS_PATH"""
+    import uvicorn
+    from sqlalchemy import event
+
+    from database import async_engine, async_read_engine, engine
+    from main import app
+
+    current_op = contextvars.ContextVar("bench_op", default=BACKGROUND)
+    counts = defaultdict(lambda: {"requests": 0, "queries": 0})
+    lock = threading.Lock()
+
+    def count_query(*args):
+        # Async sessions run statements in greenlets that share the request's context
+        with lock:
+            counts[current_op.get()]["queries"] += 1
+
+    for _engine in (engine, async_engine, async_read_engine):
+        if _engine is not None:
+            event.listen(getattr(_engine, "sync_engine", _engine), "before_cursor_execute", count_query)
+
+    async def counting_app(scope, receive, send):
+        if scope["type"] != "http":
+            return await app(scope, receive, send)
+        if scope["path"] == COUNTS_PATH:
+            with lock:
+                body = json.dumps(counts).encode()
+                counts.clear()
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"application/json")]})
+            return await send({"type": "http.response.body", "body": body})
+
+        headers = dict(scope["headers"])
+        op = headers.get(BENCH_HEADER.encode(), b"other").decode()
+        with lock:
+            counts[op]["requests"] += 1
+        token = current_op.set(op)
+        try:
+            await app(scope, receive, send)
+        finally:
+            current_op.reset(token)
+
+    uvicorn.run(counting_app, host="127.0.0.1", port=port, log_level="warning")
+
+# --- Provider stand-ins ------------------------------------------------------------------
+
+class ProviderProfile:
+    """Latency and failure behaviour of one fake provider, and what it has been asked to do"""
+
+    def __init__(self, latency_ms: float, error_rate: float, rng: random.Random):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.rng = rng
+        self.calls = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def answer(self) -> bool:
+        """Wait the configured latency; returns False when this call should fail"""
+        with self.lock:
+            self.calls += 1
+            failed = self.rng.random() < self.error_rate
+            self.failures += failed
+        # +-20% jitter around the configured latency
+        time.sleep(self.latency_ms * self.rng.uniform(0.8, 1.2) / 1000)
+        return not failed
+
+    def stats(self) -> dict:
+        return {"latency_ms": self.latency_ms, "error_rate": self.error_rate,
+                "calls": self.calls, "failures": self.failures}
+
+def start_fake_providers(profiles: Dict[str, ProviderProfile]) -> ThreadingHTTPServer:
+    """One local HTTP server answering the Geocoding, Twilio Messages and SendGrid mail/send APIs"""
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, payload: dict):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if not self.path.startswith("/geocode/json"):
+                return self._reply(404, {})
+            if profiles["geocode"].answer():
+                self._reply(200, {"status": "OK", "results": [{"formatted_address": "Bench Street"}]})
+            else:
+                self._reply(500, {"status": "UNKNOWN_ERROR", "results": []})
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path.startswith("/2010-04-01/Accounts/"):
+                provider, created = "sms", (201, {"sid": "SMbench", "status": "queued"})
+            elif self.path.startswith("/v3/mail/send"):
+                provider, created = "email", (202, {})
+            else:
+                return self._reply(404, {})
+            if profiles[provider].answer():
+                self._reply(*created)
+            else:
+                self._reply(503, {"message": "Service Unavailable"})
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def provider_env(server: ThreadingHTTPServer) -> Dict[str, str]:
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    return {
+        "GOOGLE_MAPS_API_KEY": "bench",
+        "GOOGLE_GEOCODE_URL": f"{base}/geocode/json",
+        "TWILIO_ACCOUNT_SID": "ACbench",
+        "TWILIO_AUTH_TOKEN": "bench",
+        "TWILIO_PHONE_NUMBER": "+15550000000",
+        "TWILIO_API_URL": base,
+        "SENDGRID_API_KEY": "bench",
+        "SENDGRID_API_URL": f"{base}/v3/mail/send",
+    }
+
+# --- Load driver -------------------------------------------------------------------------
+
+def seed(clients: int, history_points: int):
+    """One user per client, each with a trusted contact and an active alert with a recorded trajectory"""
+    from sqlalchemy import insert
+
+    from auth import get_password_hash
+    from database import SessionLocal, Alert, Contact, LocationUpdate, User, init_db
+
+    init_db()
+    password_hash = get_password_hash(PASSWORD)
+    db = SessionLocal()
+    try:
+        users = [
+            User(name=f"Bench {i}", phone=f"+1555{i:07d}", email=f"bench{i}@example.com",
+                 password_hash=password_hash, codeword="helpme")
+            for i in range(clients)
+        ]
+        db.add_all(users)
+        db.flush()
+        db.add_all(Contact(user_id=user.id, name="Contact", phone=f"+1666{i:07d}",
+                           email=f"contact{i}@example.com", is_primary=True)
+                   for i, user in enumerate(users))
+        alerts = [Alert(user_id=user.id, latitude=28.6, longitude=77.2, status="active") for user in users]
+        db.add_all(alerts)
+        db.flush()
+
+        start = datetime.utcnow() - timedelta(seconds=history_points * 5)
+        for alert in alerts:
+            if history_points:
+                db.execute(insert(LocationUpdate), [
+                    {"user_id": alert.user_id, "alert_id": alert.id, "latitude": 28.6 + j * 1e-4,
+                     "longitude": 77.2, "address": "Bench Street", "timestamp": start + timedelta(seconds=j * 5)}
+                    for j in range(history_points)
+                ])
+        db.commit()
+        return [{"phone": user.phone, "alert_id": alert.id} for user, alert in zip(users, alerts)]
+    finally:
+        db.close()
+
+def start_server(port: int, env: Dict[str, str]) -> subprocess.Popen:
+    import httpx
+
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port)],
+        cwd=APP_DIR, env={**os.environ, **env}, stdout=subprocess.DEVNULL
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health", timeout=1)
+            return server
+        except httpx.TransportError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("Server did not start")
+
+async def log_in(client, accounts, concurrency: int = 4):
+    """Get every account's token from /auth/login, as the app does, and check the API accepts it"""
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(account):
+        async with slots:
+            response = await client.post("/auth/login", json={"phone": account["phone"], "password": PASSWORD})
+        if response.status_code != 200:
+            raise RuntimeError(f"Login failed for {account['phone']}: {response.status_code} {response.text}")
+        account["token"] = response.json()["access_token"]
+
+    await asyncio.gather(*(one(account) for account in accounts))
+    response = await client.get("/profile/", headers={"Authorization": f"Bearer {accounts[0]['token']}"})
+    if response.status_code != 200:
+        raise RuntimeError(f"Token from /auth/login was rejected: {response.status_code} {response.text}")
+
+async def client_loop(client, account: dict, mix, rng: random.Random, deadline: float, samples, errors):
+    operations, weights = zip(*mix)
+    lat, lon = 28.6 + rng.random() / 10, 77.2 + rng.random() / 10
+    while time.perf_counter() < deadline:
+        op = rng.choices(operations, weights)[0]
+        op_headers = {"Authorization": f"Bearer {account['token']}", BENCH_HEADER: op}
+        start = time.perf_counter()
+        if op == "trigger":
+            response = await client.post("/sos/trigger", json={"latitude": lat, "longitude": lon}, headers=op_headers)
+        elif op == "location":
+            # Move ~100 m so every fix is stored (and geocoded) rather than merged into a stop
+            lat += 0.001
+            response = await client.post("/location/update", json={"latitude": lat, "longitude": lon},
+                                         headers=op_headers)
+        elif op == "history":
+            response = await client.get(f"/sos/{account['alert_id']}/location-history", headers=op_headers)
+        else:
+            response = await client.post("/auth/login", json={"phone": account["phone"], "password": PASSWORD},
+                                         headers={BENCH_HEADER: op})
+            if response.status_code == 200:
+                # Later requests use the fresh token, like a client that just signed in
+                account["token"] = response.json()["access_token"]
+        samples[op].append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            errors[op][str(response.status_code)] += 1
+
+async def run_load(base_url: str, accounts, mix, seconds: float, warmup: float, seed_value: int):
+    import httpx
+
+    limits = httpx.Limits(max_connections=len(accounts), max_keepalive_connections=len(accounts))
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await log_in(client, accounts)
+        for phase_seconds, measured in ((warmup, False), (seconds, True)):
+            if phase_seconds <= 0:
+                continue
+            samples = defaultdict(list)
+            errors = defaultdict(lambda: defaultdict(int))
+            # Counts collected so far (startup, warm-up) are discarded
+            await client.get(COUNTS_PATH)
+            deadline = time.perf_counter() + phase_seconds
+            await asyncio.gather(*(
+                client_loop(client, account, mix, random.Random(seed_value + i), deadline, samples, errors)
+                for i, account in enumerate(accounts)
+            ))
+        counts = (await client.get(COUNTS_PATH)).json()
+    return samples, errors, counts
+
+def summarize(samples, errors, counts, seconds: float) -> dict:
+    endpoints = {}
+    for op, (method, route) in OPERATIONS.items():
+        values = samples.get(op)
+        if not values:
+            continue
+        requests = counts.get(op, {}).get("requests", 0)
+        endpoints[op] = {
+            "method": method,
+            "route": route,
+            "requests": len(values),
+            "errors": dict(errors[op]),
+            "throughput_rps": round(len(values) / seconds, 1),
+            "latency_ms": {
+                "p50": round(percentile(values, 50), 2),
+                "p95": round(percentile(values, 95), 2),
+                "p99": round(percentile(values, 99), 2),
+                "mean": round(statistics.fmean(values), 2),
+                "max": round(max(values), 2),
+            },
+            "db_queries_per_request": round(counts.get(op, {}).get("queries", 0) / requests, 2) if requests else None,
+        }
+    total = sum(endpoint["requests"] for endpoint in endpoints.values())
+    return {
+        "endpoints": endpoints,
+        "total": {
+            "requests": total,
+            "errors": sum(sum(endpoint["errors"].values()) for endpoint in endpoints.values()),
+            "throughput_rps": round(total / seconds, 1),
+        },
+        # Statements issued outside requests: notification workers, geocode back-fills
+        "background_db_queries": counts.get(BACKGROUND, {}).get("queries", 0),
+    }
+
+def print_table(result: dict, out=sys.stderr):
+    config = result["config"]
+    print(f"{config['clients']} clients, {config['seconds']:.0f}s: {result['total']['throughput_rps']} req/s, "
+          f"{result['total']['errors']} errors, {result['background_db_queries']} background queries", file=out)
+    print(f"{'operation':>10} | {'requests':>8} | {'req/s':>7} | {'p50 ms':>8} | {'p95 ms':>8} | "
+          f"{'p99 ms':>8} | {'queries':>7} | errors", file=out)
+    for op, endpoint in result["endpoints"].items():
+        latency = endpoint["latency_ms"]
+        print(f"{op:>10} | {endpoint['requests']:>8} | {endpoint['throughput_rps']:>7} | {latency['p50']:>8.1f} | "
+              f"{latency['p95']:>8.1f} | {latency['p99']:>8.1f} | {endpoint['db_queries_per_request']!s:>7} | "
+              f"{endpoint['errors'] or ''}", file=out)
+    for name, provider in result["providers"].items():
+        print(f"{name:>10} | {provider['calls']} calls, {provider['failures']} failed", file=out)
+
+def compare(result: dict, baseline: dict, max_regression_pct: float) -> bool:
+    """Print changes against a baseline run; False if an operation got slower or chattier than allowed"""
+    ok = True
+    print(f"\nvs baseline ({baseline.get('started_at', '?')}):", file=sys.stderr)
+    for op, endpoint in result["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(op)
+        if before is None:
+            continue
+        changes = []
+        for pct in ("p50", "p95", "p99"):
+            old, new = before["latency_ms"][pct], endpoint["latency_ms"][pct]
+            delta = (new - old) / old * 100 if old else 0.0
+            changes.append(f"{pct} {old:.1f}->{new:.1f} ms ({delta:+.0f}%)")
+            if pct != "p50" and delta > max_regression_pct:
+                ok = False
+        old_queries, new_queries = before.get("db_queries_per_request"), endpoint["db_queries_per_request"]
+        if old_queries is not None and new_queries is not None:
+            changes.append(f"queries {old_queries}->{new_queries}")
+            # Query counts are deterministic per request; any growth is a regression
+            if new_queries > old_queries + 0.05:
+                ok = False
+        print(f"{op:>10} | " + ", ".join(changes), file=sys.stderr)
+    print("OK" if ok else f"REGRESSION (p95/p99 over +{max_regression_pct:.0f}% or more queries)", file=sys.stderr)
+    return ok
+
+def parse_mix(text: str):
+    mix = []
+    for part in text.split(","):
+        op, _, weight = part.partition("=")
+        if op not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {op!r} (choose from {', '.join(OPERATIONS)})")
+        mix.append((op, float(weight)))
+    return mix
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=int(os.getenv("BENCH_PORT", 8799)))
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"operation=weight list (default {DEFAULT_MIX})")
+    parser.add_argument("--history-points", type=int, default=500, help="recorded points per client's alert")
+    parser.add_argument("--seed", type=int, default=42)
+    for provider, latency in (("geocode", 80), ("sms", 150), ("email", 100)):
+        parser.add_argument(f"--{provider}-latency-ms", type=float, default=latency)
+        parser.add_argument(f"--{provider}-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="write the JSON result here instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON result to check this run against")
+    parser.add_argument("--max-regression-pct", type=float, default=20)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args.port)
+        return 0
+
+    rng = random.Random(args.seed)
+    profiles = {
+        name: ProviderProfile(getattr(args, f"{name}_latency_ms"), getattr(args, f"{name}_error_rate"),
+                              random.Random(rng.random()))
+        for name in ("geocode", "sms", "email")
+    }
+    providers = start_fake_providers(profiles)
+
+    started_at = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    # Keep stdout for the JSON result
+    with contextlib.redirect_stdout(sys.stderr):
+        accounts = seed(args.clients, args.history_points)
+    server = start_server(args.port, provider_env(providers))
+    try:
+        samples, errors, counts = asyncio.run(run_load(
+            f"http://127.0.0.1:{args.port}", accounts, args.mix, args.seconds, args.warmup, args.seed
+        ))
+    finally:
+        server.terminate()
+        server.wait()
+        providers.shutdown()
+
+    result = {
+        "suite": "load_suite",
+        "started_at": started_at,
+        "config": {
+            "clients": args.clients,
+            "seconds": args.seconds,
+            "warmup_seconds": args.warmup,
+            "mix": dict(args.mix),
+            "history_points": args.history_points,
+            "seed": args.seed,
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            "python": sys.version.split()[0],
+            "cpus": os.cpu_count(),
+        },
+        **summarize(samples, errors, counts, args.seconds),
+        "providers": {name: profile.stats() for name, profile in profiles.items()},
+    }
+    print_table(result)
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        return 0 if compare(result, baseline, args.max_regression_pct) else 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
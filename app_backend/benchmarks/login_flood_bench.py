@@ -0,0 +1,71 @@
+"""
+SOS trigger latency while /auth/login is flooded, against a real uvicorn server
+
+Run from app_backend/:  python benchmarks/login_flood_bench.py [login_clients] [seconds]
+Exits non-zero when trigger p50 during the flood exceeds FLOOD_MAX_SLOWDOWN times the quiet p50.
+"""
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+from concurrency_bench import BASE_URL, percentile, seed_users, start_server
+
+FLOOD_MAX_SLOWDOWN = float(os.getenv("FLOOD_MAX_SLOWDOWN", 2))
+TRIGGER_INTERVAL_SECONDS = 0.05
+
+async def measure_triggers(client: httpx.AsyncClient, token: str, until: float):
+    """Trigger alerts at a steady pace and return their latencies in ms"""
+    headers = {"Authorization": f"Bearer {token}"}
+    samples = []
+    while time.perf_counter() < until:
+        start = time.perf_counter()
+        response = await client.post("/sos/trigger", json={"latitude": 28.6, "longitude": 77.2}, headers=headers)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 201, response.text
+        await asyncio.sleep(TRIGGER_INTERVAL_SECONDS)
+    return samples
+
+async def flood_logins(client: httpx.AsyncClient, until: float, outcomes: Counter):
+    while time.perf_counter() < until:
+        response = await client.post("/auth/login", json={"phone": "+15550000000", "password": "benchpassword"})
+        outcomes[response.status_code] += 1
+        if response.status_code == 429:
+            await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+
+async def run(login_clients: int, seconds: float):
+    token = seed_users(1)[0]
+    limits = httpx.Limits(max_connections=login_clients + 1, max_keepalive_connections=login_clients + 1)
+    async with httpx.AsyncClient(base_url=BASE_URL, limits=limits, timeout=60) as client:
+        quiet = await measure_triggers(client, token, time.perf_counter() + seconds)
+
+        outcomes = Counter()
+        until = time.perf_counter() + seconds
+        results = await asyncio.gather(
+            measure_triggers(client, token, until),
+            *(flood_logins(client, until, outcomes) for _ in range(login_clients))
+        )
+    return quiet, results[0], outcomes
+
+def main(login_clients: int = 50, seconds: float = 10) -> bool:
+    server = start_server()
+    try:
+        quiet, flooded, outcomes = asyncio.run(run(login_clients, seconds))
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"/sos/trigger quiet:        p50 {percentile(quiet, 50):7.1f} ms, p99 {percentile(quiet, 99):7.1f} ms")
+    print(f"/sos/trigger during flood: p50 {percentile(flooded, 50):7.1f} ms, p99 {percentile(flooded, 99):7.1f} ms")
+    print(f"{login_clients} login clients: " + ", ".join(f"{code}: {count}" for code, count in sorted(outcomes.items())))
+    return percentile(flooded, 50) <= FLOOD_MAX_SLOWDOWN * percentile(quiet, 50)
+
+if __name__ == "__main__":
+    ok = main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    )
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,79 @@
+"""
+Cost of metrics recording on the request path: histogram observe, the ASGI middleware
+and the SQL statement hooks, each measured against the same work without metrics
+
+Run from app_backend/:  python benchmarks/metrics_overhead_bench.py [iterations]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+from metrics import Histogram, MetricsMiddleware, instrument_engine
+
+class _Route:
+    path = "/sos/{alert_id}"
+
+async def _endpoint(scope, receive, send):
+    scope["route"] = _Route()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+async def _send(message):
+    pass
+
+ROUNDS = 5
+
+def per_call_us(fn, iterations: int) -> float:
+    """Best of ROUNDS, so scheduler noise doesn't land on one side of the comparison"""
+    fn()
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for _ in range(iterations // ROUNDS):
+            fn()
+        best = min(best, (time.perf_counter() - start) / (iterations // ROUNDS) * 1e6)
+    return best
+
+async def per_request_us(app, iterations: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/sos/1", "headers": []}
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for _ in range(iterations // ROUNDS):
+            await app(dict(scope), _receive, _send)
+        best = min(best, (time.perf_counter() - start) / (iterations // ROUNDS) * 1e6)
+    return best
+
+def main(iterations: int = 100000):
+    histogram = Histogram("bench_seconds", "Benchmark histogram.", ("method", "route", "status"))
+    observe_us = per_call_us(lambda: histogram.labels("GET", "/sos/{alert_id}", 200).observe(0.0042), iterations)
+
+    plain_us = asyncio.run(per_request_us(_endpoint, iterations))
+    wrapped_us = asyncio.run(per_request_us(MetricsMiddleware(_endpoint), iterations))
+
+    queries = max(iterations // 10, 1000)
+    timings = []
+    for instrumented in (False, True):
+        engine = create_engine("sqlite://")
+        if instrumented:
+            instrument_engine(engine, "bench")
+        with engine.connect() as conn:
+            statement = text("SELECT 1")
+            timings.append(per_call_us(lambda: conn.execute(statement).scalar(), queries))
+        engine.dispose()
+
+    print(f"{'operation':>28} | {'without us':>10} | {'with us':>8} | {'added us':>8}")
+    print(f"{'histogram observe':>28} | {'':>10} | {observe_us:>8.2f} | {observe_us:>8.2f}")
+    print(f"{'ASGI request (middleware)':>28} | {plain_us:>10.2f} | {wrapped_us:>8.2f} | {wrapped_us - plain_us:>8.2f}")
+    print(f"{'SELECT 1 (engine hooks)':>28} | {timings[0]:>10.2f} | {timings[1]:>8.2f} | {timings[1] - timings[0]:>8.2f}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
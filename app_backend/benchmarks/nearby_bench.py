@@ -0,0 +1,93 @@
+"""
+Nearby-alert query latency against the in-memory active alert index
+
+Run from app_backend/:  python benchmarks/nearby_bench.py [alerts] [queries]
+Exits non-zero when the p50 of a 2 km query (lookup + incident grouping) exceeds NEARBY_TARGET_MS.
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from location import calculate_distance
+from spatial_index import ActiveAlertIndex, IndexedAlert, group_incidents
+
+NEARBY_TARGET_MS = float(os.getenv("NEARBY_TARGET_MS", 1.0))
+RADIUS_KM = 2.0
+LIMIT = 50
+
+# A third of the alerts cluster around city centres, the rest are spread over the country
+CITIES = [(28.61, 77.21), (19.08, 72.88), (12.97, 77.59), (22.57, 88.36), (13.08, 80.27),
+          (17.39, 78.49), (23.02, 72.57), (18.52, 73.86), (26.91, 75.79), (26.85, 80.95)]
+BOUNDS = ((8.0, 34.0), (68.0, 97.0))
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def make_alerts(count: int, rng: random.Random):
+    start = datetime(2024, 1, 1)
+    alerts = []
+    for i in range(count):
+        if i % 3 == 0:
+            lat, lon = rng.choice(CITIES)
+            # ~10 km spread around the centre
+            lat, lon = lat + rng.gauss(0, 0.09), lon + rng.gauss(0, 0.09)
+        else:
+            lat, lon = rng.uniform(*BOUNDS[0]), rng.uniform(*BOUNDS[1])
+        created_at = start + timedelta(seconds=rng.uniform(0, 86400))
+        alerts.append(IndexedAlert(i + 1, i + 1, lat, lon, "active", "high", created_at, created_at))
+    return alerts
+
+def timed_queries(index: ActiveAlertIndex, points, with_incidents: bool):
+    samples = []
+    sizes = []
+    for lat, lon in points:
+        start = time.perf_counter()
+        found = index.nearby(lat, lon, RADIUS_KM, LIMIT)
+        if with_incidents:
+            group_incidents([entry for entry, _ in found])
+        samples.append((time.perf_counter() - start) * 1000)
+        sizes.append(len(found))
+    return samples, sum(sizes) / len(sizes)
+
+def main(alert_count: int = 100000, query_count: int = 2000) -> bool:
+    rng = random.Random(42)
+    alerts = make_alerts(alert_count, rng)
+    index = ActiveAlertIndex()
+    start = time.perf_counter()
+    index.replace(alerts)
+    print(f"Indexed {len(index)} alerts in {(time.perf_counter() - start) * 1000:.0f} ms "
+          f"({index.stats()['cells']} cells)")
+
+    city_points = [(lat + rng.gauss(0, 0.05), lon + rng.gauss(0, 0.05))
+                   for lat, lon in (rng.choice(CITIES) for _ in range(query_count))]
+    spread_points = [(rng.uniform(*BOUNDS[0]), rng.uniform(*BOUNDS[1])) for _ in range(query_count)]
+
+    # Reference: what a caller had to do before, a distance check against every alert
+    lat, lon = city_points[0]
+    start = time.perf_counter()
+    [a for a in alerts if calculate_distance(lat, lon, a.latitude, a.longitude) <= RADIUS_KM]
+    print(f"Full scan with calculate_distance: {(time.perf_counter() - start) * 1000:.1f} ms per query")
+
+    print(f"{'query':>24} | {'avg hits':>8} | {'p50 ms':>7} | {'p99 ms':>7}")
+    passed = True
+    for label, points in [("city centres", city_points), ("spread out", spread_points)]:
+        for with_incidents in (False, True):
+            samples, hits = timed_queries(index, points, with_incidents)
+            name = f"{label}{' + incidents' if with_incidents else ''}"
+            print(f"{name:>24} | {hits:>8.1f} | {percentile(samples, 50):>7.3f} | {percentile(samples, 99):>7.3f}")
+            if with_incidents:
+                passed = passed and percentile(samples, 50) <= NEARBY_TARGET_MS
+    return passed
+
+if __name__ == "__main__":
+    ok = main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    )
+    sys.exit(0 if ok else 1)
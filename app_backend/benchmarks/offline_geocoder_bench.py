@@ -0,0 +1,57 @@
+"""
+Benchmark offline reverse geocoding: index build time, lookup latency and memory
+
+Run from app_backend/:  python benchmarks/offline_geocoder_bench.py [sizes...]
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from offline_geocoder import PlaceIndex
+
+def random_places(count: int, rng: random.Random):
+    return [
+        (rng.uniform(-60, 70), rng.uniform(-180, 180), f"Place {i}")
+        for i in range(count)
+    ]
+
+def brute_force_nearest(places, latitude, longitude):
+    from location import calculate_distance
+    return min(places, key=lambda p: calculate_distance(latitude, longitude, p[0], p[1]))[2]
+
+def run(count: int, queries: int = 20000, seed: int = 42):
+    rng = random.Random(seed)
+    places = random_places(count, rng)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = PlaceIndex(places)
+    build_s = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    index_bytes = sum(col.itemsize * len(col) for col in (index.xs, index.ys, index.zs))
+    points = [(rng.uniform(-60, 70), rng.uniform(-180, 180)) for _ in range(queries)]
+
+    start = time.perf_counter()
+    for latitude, longitude in points:
+        index.nearest(latitude, longitude)
+    lookup_us = (time.perf_counter() - start) / queries * 1e6
+
+    # Spot-check correctness against a linear scan
+    for latitude, longitude in points[:5]:
+        assert index.nearest(latitude, longitude)[0] == brute_force_nearest(places, latitude, longitude)
+
+    print(
+        f"{count:>9,} places | build {build_s:6.2f}s | lookup {lookup_us:6.1f} us | "
+        f"coord arrays {index_bytes / 1e6:6.1f} MB | build peak {peak / 1e6:7.1f} MB"
+    )
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    for size in sizes:
+        run(size)
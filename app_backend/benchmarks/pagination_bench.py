@@ -0,0 +1,110 @@
+"""
+Compare OFFSET and keyset (cursor) page latency at increasing depth
+
+Run from app_backend/:  python benchmarks/pagination_bench.py [alerts]
+                   or:  python benchmarks/pagination_bench.py --synthetic [users]
+The second form pages through the busiest user of a synthetic_data.py dataset.
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmpdir}/bench.db")
+
+from sqlalchemy import func, insert, select
+
+from database import AsyncSessionLocal, SessionLocal, User, Alert, engine, init_db
+from pagination import encode_cursor, paginate_desc
+
+PAGE_SIZE = 50
+
+def seed(alert_count: int, seed: int = 42) -> int:
+    rng = random.Random(seed)
+    db = SessionLocal()
+    try:
+        user = User(name="Bench User", phone="+10000000000", email="bench@example.com",
+                    password_hash="x", codeword="helpme")
+        db.add(user)
+        db.commit()
+
+        start = datetime(2020, 1, 1)
+        rows = [
+            {
+                "user_id": user.id,
+                "latitude": rng.uniform(-60, 70),
+                "longitude": rng.uniform(-180, 180),
+                "status": rng.choice(["active", "resolved", "resolved", "cancelled"]),
+                "severity": "medium",
+                "triggered_by": "voice",
+                "created_at": start + timedelta(seconds=i * 60),
+            }
+            for i in range(alert_count)
+        ]
+        for i in range(0, len(rows), 10000):
+            db.execute(insert(Alert), rows[i:i + 10000])
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+def seed_synthetic(users: int):
+    """Load the synthetic dataset; returns the user with the most alerts and their alert count"""
+    from synthetic_data import generate_dataset
+
+    generate_dataset(engine, users)
+    db = SessionLocal()
+    try:
+        return db.execute(
+            select(Alert.user_id, func.count(Alert.id)).group_by(Alert.user_id)
+            .order_by(func.count(Alert.id).desc()).limit(1)
+        ).one()
+    finally:
+        db.close()
+
+async def timed(fn, repeats: int = 20) -> float:
+    await fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        await fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+async def run(user_id: int, alert_count: int):
+    db = AsyncSessionLocal()
+    query = select(Alert).where(Alert.user_id == user_id)
+    ordered = query.order_by(Alert.created_at.desc(), Alert.id.desc())
+
+    print(f"{alert_count:,} alerts, page size {PAGE_SIZE}")
+    print(f"{'depth':>10} | {'offset+count ms':>15} | {'keyset ms':>9}")
+    for depth in [0, 1_000, 10_000, alert_count // 2, alert_count - PAGE_SIZE]:
+        if depth < 0 or depth >= alert_count:
+            continue
+
+        async def offset_page():
+            await db.scalar(select(func.count()).select_from(query.subquery()))
+            (await db.scalars(ordered.offset(depth).limit(PAGE_SIZE))).all()
+
+        # The cursor a client would hold after paging down to this depth
+        boundary = await db.scalar(ordered.offset(depth - 1).limit(1)) if depth else None
+        cursor = encode_cursor(boundary.created_at, boundary.id) if boundary else None
+
+        async def keyset_page():
+            await paginate_desc(db, query, Alert.created_at, Alert.id, PAGE_SIZE, cursor)
+
+        print(f"{depth:>10,} | {await timed(offset_page):>15.2f} | {await timed(keyset_page):>9.2f}")
+    await db.close()
+
+if __name__ == "__main__":
+    init_db()
+    if len(sys.argv) > 1 and sys.argv[1] == "--synthetic":
+        user_id, alert_count = seed_synthetic(int(sys.argv[2]) if len(sys.argv) > 2 else 50_000)
+    else:
+        alert_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+        user_id = seed(alert_count)
+    asyncio.run(run(user_id, alert_count))
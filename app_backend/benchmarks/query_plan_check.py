@@ -0,0 +1,132 @@
+"""
+EXPLAIN QUERY PLAN check: drive every router endpoint and flag queries that scan a table
+
+Run from app_backend/:  python benchmarks/query_plan_check.py [--synthetic users]
+Exits non-zero if any filtered query does a full table scan. With --synthetic, the scratch
+database is first loaded (and ANALYZEd) with a synthetic_data.py dataset of that many users,
+so plans are checked with realistic table sizes and statistics.
+"""
+import os
+import re
+import sys
+import tempfile
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/plans.db"
+os.environ["OUTBOX_WORKERS"] = "0"
+os.environ["DISPATCHER_TOKEN"] = "plan-check"
+os.environ["LOCATION_ARCHIVE_DIR"] = f"{_tmpdir}/archive"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from database import async_engine, async_read_engine, engine
+from main import app
+from retention import run_retention
+
+captured: "OrderedDict[str, tuple]" = OrderedDict()
+
+def capture(conn, cursor, statement, parameters, context, executemany):
+    if re.match(r"\s*(SELECT|UPDATE|DELETE)\b", statement, re.IGNORECASE):
+        params = parameters[0] if executemany and parameters else parameters
+        captured.setdefault(statement, params)
+
+# Requests run on the async engines; startup and the outbox workers use the sync one
+for _engine in (engine, async_engine, async_read_engine):
+    if _engine is not None:
+        event.listen(getattr(_engine, "sync_engine", _engine), "before_cursor_execute", capture)
+
+def exercise(client: TestClient):
+    """Call every router endpoint at least once"""
+    response = client.post("/auth/register", json={
+        "name": "Plan Check", "phone": "+10000000000", "email": "plan@example.com",
+        "password": "plancheck123", "codeword": "helpme"
+    })
+    response = client.post("/auth/login", json={"phone": "+10000000000", "password": "plancheck123"})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    client.get("/auth/me", headers=headers)
+
+    client.get("/profile/", headers=headers)
+    client.put("/profile/", json={"name": "Plan Checker", "email": "plan2@example.com"}, headers=headers)
+    client.get("/profile/stats", headers=headers)
+
+    contact = client.post("/contacts/", json={
+        "name": "Contact", "phone": "+10000000001", "email": "c@example.com", "is_primary": True
+    }, headers=headers).json()
+    client.get("/contacts/", headers=headers)
+    client.get(f"/contacts/{contact['id']}", headers=headers)
+    client.put(f"/contacts/{contact['id']}", json={"is_primary": True}, headers=headers)
+    client.post("/contacts/open/", json={"name": "Open", "phone": "+10000000002"})
+    client.get("/contacts/open/")
+
+    alert = client.post("/sos/trigger", json={"latitude": 28.6, "longitude": 77.2}, headers=headers).json()
+    client.post("/sos/voice-trigger", json={
+        "voice_data": {"detected_word": "helpme", "confidence": 0.9},
+        "alert_data": {"latitude": 28.6, "longitude": 77.2}
+    }, headers=headers)
+    for i in range(3):
+        client.post(f"/sos/{alert['id']}/location", json={"latitude": 28.6 + i * 0.01, "longitude": 77.2}, headers=headers)
+    client.post(f"/sos/{alert['id']}/location/batch", json={"fixes": [
+        {"latitude": 28.7, "longitude": 77.2}, {"latitude": 28.8, "longitude": 77.2}
+    ]}, headers=headers)
+    page = client.get("/sos/?limit=1", headers=headers).json()
+    client.get(f"/sos/?limit=1&cursor={page['next_cursor']}&status_filter=active&include_total=true", headers=headers)
+    client.get(f"/sos/{alert['id']}", headers=headers)
+    client.get(f"/sos/{alert['id']}/location-history?tolerance=5", headers=headers)
+    client.get(f"/sos/{alert['id']}/location-history/export?format=geojson", headers=headers)
+    client.get("/sos/nearby?latitude=28.6&longitude=77.2", headers={"X-Dispatcher-Token": "plan-check"})
+    client.put(f"/sos/{alert['id']}", json={"severity": "high"}, headers=headers)
+    client.post(f"/sos/{alert['id']}/escalate", json={"alert_id": alert["id"]}, headers=headers)
+    client.put(f"/sos/{alert['id']}/resolve", headers=headers)
+
+    client.post("/location/update", json={"latitude": 28.6, "longitude": 77.2}, headers=headers)
+    client.post("/location/batch", json={"fixes": [{"latitude": 28.61, "longitude": 77.2}]}, headers=headers)
+    history = client.get("/location/history?limit=1", headers=headers)
+    client.get(f"/location/history?limit=1&cursor={history.headers.get('x-next-cursor', '')}", headers=headers)
+
+    client.delete(f"/contacts/{contact['id']}", headers=headers)
+    client.get("/metrics")
+
+def main(argv) -> int:
+    if argv[:1] == ["--synthetic"]:
+        from database import init_db
+        from synthetic_data import generate_dataset
+
+        init_db()
+        generate_dataset(engine, int(argv[1]) if len(argv) > 1 else 50000)
+        captured.clear()
+
+    with TestClient(app) as client:
+        exercise(client)
+    # The retention job, run far enough ahead that everything above is old enough to compact
+    run_retention(now=datetime.utcnow() + timedelta(days=365), max_rows_per_second=0)
+
+    failures = 0
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for statement, params in captured.items():
+            plan = cursor.execute(f"EXPLAIN QUERY PLAN {statement}", params or ()).fetchall()
+            details = [row[-1] for row in plan]
+            has_filter = re.search(r"\bWHERE\b", statement, re.IGNORECASE) is not None
+            scans = [d for d in details if d.startswith("SCAN") and "USING" not in d]
+            # Unfiltered reads (e.g. SELECT ... LIMIT 1) legitimately scan
+            bad = has_filter and scans
+            failures += bool(bad)
+            status = "SCAN" if bad else "ok  "
+            summary = " ".join(statement.split())[:110]
+            print(f"[{status}] {summary}")
+            for detail in details:
+                print(f"         {detail}")
+    finally:
+        raw.close()
+
+    print(f"\n{len(captured)} distinct statements, {failures} with full table scans")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
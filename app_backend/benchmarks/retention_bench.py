@@ -0,0 +1,121 @@
+"""
+Live location write latency while the retention job compacts location_updates, paced vs unpaced
+
+Run from app_backend/:  python benchmarks/retention_bench.py [users] [days] [alerts]
+Each pass reseeds the same history: `days` of 1-per-minute tracking fixes per user from
+40+ days ago, plus `alerts` resolved alerts with 300-point trajectories from 100+ days ago.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmpdir}/bench.db")
+os.environ.setdefault("LOCATION_ARCHIVE_DIR", f"{_tmpdir}/archive")
+
+from sqlalchemy import delete, func, insert, select
+
+from database import (AsyncSessionLocal, SessionLocal, Alert, LocationArchive, LocationUpdate,
+                      RetentionState, User, init_db)
+from retention import RETENTION_MAX_ROWS_PER_SECOND, run_retention
+from tracking import record_location
+
+WRITES = 400
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def seed(users: int, days: int, alerts: int) -> int:
+    db = SessionLocal()
+    try:
+        for table in (LocationArchive, RetentionState, LocationUpdate, Alert, User):
+            db.execute(delete(table))
+        db.commit()
+        user_ids = []
+        for i in range(users):
+            user = User(name=f"Bench {i}", phone=f"+1{i:010d}", email=f"bench{i}@example.com",
+                        password_hash="x", codeword="helpme")
+            db.add(user)
+            db.flush()
+            user_ids.append(user.id)
+
+        now = datetime.utcnow()
+        start = now - timedelta(days=40 + days)
+        for user_id in user_ids:
+            for day in range(days):
+                db.execute(insert(LocationUpdate), [
+                    {"user_id": user_id, "latitude": 28.6 + i * 1e-5, "longitude": 77.2, "address": "",
+                     "timestamp": start + timedelta(days=day, minutes=i)}
+                    for i in range(1440)
+                ])
+
+        resolved_at = now - timedelta(days=100)
+        for i in range(alerts):
+            alert = Alert(user_id=user_ids[i % users], latitude=28.6, longitude=77.2, status="resolved",
+                          created_at=resolved_at - timedelta(hours=1), resolved_at=resolved_at)
+            db.add(alert)
+            db.flush()
+            db.execute(insert(LocationUpdate), [
+                {"user_id": alert.user_id, "alert_id": alert.id, "latitude": 28.6 + j * 1e-5,
+                 "longitude": 77.2, "address": "", "timestamp": alert.created_at + timedelta(seconds=j * 10)}
+                for j in range(300)
+            ])
+        db.commit()
+        return user_ids[0]
+    finally:
+        db.close()
+
+def row_count() -> int:
+    db = SessionLocal()
+    try:
+        return db.scalar(select(func.count(LocationUpdate.id)))
+    finally:
+        db.close()
+
+async def live_writes(user_id: int, count: int):
+    samples = []
+    async with AsyncSessionLocal() as db:
+        for i in range(count):
+            start = time.perf_counter()
+            await record_location(db, user_id, 28.6 + i * 1e-3, 77.2, address="")
+            samples.append((time.perf_counter() - start) * 1000)
+            # ~100 writes/s from the rest of the fleet
+            await asyncio.sleep(0.01)
+    return samples
+
+async def run_pass(label: str, user_id: int, max_rows_per_second):
+    before = row_count()
+    job = {}
+    thread = None
+    if max_rows_per_second is not None:
+        def target():
+            job.update(run_retention(max_rows_per_second=max_rows_per_second))
+        thread = threading.Thread(target=target)
+        thread.start()
+    samples = await live_writes(user_id, WRITES)
+    if thread is not None:
+        await asyncio.to_thread(thread.join)
+    after = row_count()
+    print(f"{label:>22} | {percentile(samples, 50):>7.2f} | {percentile(samples, 99):>7.2f} | "
+          f"{max(samples):>7.1f} | {before:>8} | {after:>8} | {job.get('seconds', 0):>6.1f}")
+
+async def run(users: int, days: int, alerts: int):
+    print(f"{'pass':>22} | {'p50 ms':>7} | {'p99 ms':>7} | {'max ms':>7} | {'rows in':>8} | {'rows out':>8} | {'job s':>6}")
+    paced = RETENTION_MAX_ROWS_PER_SECOND or 5000
+    for label, rate in [("no retention job", None), (f"paced {paced:.0f} rows/s", paced), ("unpaced", 0)]:
+        user_id = seed(users, days, alerts)
+        await run_pass(label, user_id, rate)
+
+if __name__ == "__main__":
+    init_db()
+    args = [int(arg) for arg in sys.argv[1:]]
+    users, days, alerts = (args + [20, 3, 200][len(args):])[:3]
+    asyncio.run(run(users, days, alerts))
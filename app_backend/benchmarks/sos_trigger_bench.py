@@ -0,0 +1,78 @@
+"""
+Measure POST /sos/trigger latency (time to acknowledge) against a latency target
+
+Run from app_backend/:  python benchmarks/sos_trigger_bench.py [requests]
+Exits non-zero when p99 exceeds SOS_TRIGGER_P99_TARGET_MS.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmpdir = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmpdir}/bench.db")
+os.environ.setdefault("OUTBOX_WORKERS", "0")
+
+from fastapi.testclient import TestClient
+
+from auth import get_password_hash
+from database import SessionLocal, User, Contact
+from main import app
+
+SOS_TRIGGER_P50_TARGET_MS = float(os.getenv("SOS_TRIGGER_P50_TARGET_MS", 20))
+SOS_TRIGGER_P99_TARGET_MS = float(os.getenv("SOS_TRIGGER_P99_TARGET_MS", 50))
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def seed_user():
+    db = SessionLocal()
+    try:
+        user = User(
+            name="Bench User",
+            phone="+10000000000",
+            email="bench@example.com",
+            password_hash=get_password_hash("benchpassword"),
+            codeword="helpme"
+        )
+        db.add(user)
+        db.commit()
+        for i in range(3):
+            db.add(Contact(user_id=user.id, name=f"Contact {i}", phone=f"+1000000000{i}",
+                           email=f"contact{i}@example.com"))
+        db.commit()
+    finally:
+        db.close()
+
+def run(requests: int = 500):
+    with TestClient(app) as client:
+        seed_user()
+        response = client.post("/auth/login", json={"phone": "+10000000000", "password": "benchpassword"})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        body = {"latitude": 28.6139, "longitude": 77.2090, "severity": "medium"}
+
+        # Warm up imports, connection pool and SQLite page cache
+        for _ in range(20):
+            client.post("/sos/trigger", json=body, headers=headers)
+
+        samples = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = client.post("/sos/trigger", json=body, headers=headers)
+            samples.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 201, response.text
+
+    p50 = percentile(samples, 50)
+    p99 = percentile(samples, 99)
+    print(f"/sos/trigger x{requests}: p50 {p50:.2f} ms (target {SOS_TRIGGER_P50_TARGET_MS:.0f}), "
+          f"p99 {p99:.2f} ms (target {SOS_TRIGGER_P99_TARGET_MS:.0f}), max {max(samples):.2f} ms")
+    return p50 <= SOS_TRIGGER_P50_TARGET_MS and p99 <= SOS_TRIGGER_P99_TARGET_MS
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    sys.exit(0 if run(count) else 1)
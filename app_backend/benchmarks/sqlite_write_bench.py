@@ -0,0 +1,134 @@
+"""
+SQLite write throughput under mixed load: default vs production storage profile
+
+Run from app_backend/:  python benchmarks/sqlite_write_bench.py [seconds]
+
+Each profile runs in its own process against a fresh database file: async
+location writers and history readers (the API request path) plus sync
+threads inserting notifications (the outbox workers).
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ASYNC_WRITERS = 8
+READERS = 8
+SYNC_WRITERS = 2
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index] if ordered else 0.0
+
+def run_child(seconds: float) -> dict:
+    from sqlalchemy import select
+    from sqlalchemy.exc import OperationalError
+
+    from database import AsyncSessionLocal, SessionLocal, User, Alert, LocationUpdate, Notification, init_db
+    from tracking import record_location
+
+    init_db()
+    db = SessionLocal()
+    user = User(name="Bench", phone="+10000000000", email="bench@example.com", password_hash="x", codeword="helpme")
+    db.add(user)
+    db.commit()
+    alert = Alert(user_id=user.id, latitude=28.6, longitude=77.2, status="active")
+    db.add(alert)
+    db.commit()
+    user_id, alert_id = user.id, alert.id
+    db.close()
+
+    counts = {"async_writes": 0, "sync_writes": 0, "errors": 0}
+    read_ms = []
+    deadline = time.perf_counter() + seconds
+
+    def sync_writer():
+        session = SessionLocal()
+        while time.perf_counter() < deadline:
+            try:
+                session.add(Notification(alert_id=alert_id, recipient_type="contact", message="bench", status="sent"))
+                session.commit()
+                counts["sync_writes"] += 1
+            except OperationalError:
+                session.rollback()
+                counts["errors"] += 1
+        session.close()
+
+    async def async_writer(index: int):
+        step = 0
+        while time.perf_counter() < deadline:
+            step += 1
+            try:
+                async with AsyncSessionLocal() as session:
+                    # Far enough apart that every fix is stored rather than merged
+                    await record_location(session, user_id, 28.6 + step * 0.001, 77.2 + index * 0.01,
+                                          alert_id=alert_id, address="bench")
+                counts["async_writes"] += 1
+            except OperationalError:
+                counts["errors"] += 1
+
+    async def reader():
+        query = (select(LocationUpdate).where(LocationUpdate.alert_id == alert_id)
+                 .order_by(LocationUpdate.timestamp.desc()).limit(50))
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                async with AsyncSessionLocal() as session:
+                    (await session.scalars(query)).all()
+                read_ms.append((time.perf_counter() - start) * 1000)
+            except OperationalError:
+                counts["errors"] += 1
+            await asyncio.sleep(0)
+
+    async def main():
+        await asyncio.gather(*(async_writer(i) for i in range(ASYNC_WRITERS)),
+                             *(reader() for _ in range(READERS)))
+
+    threads = [threading.Thread(target=sync_writer) for _ in range(SYNC_WRITERS)]
+    for thread in threads:
+        thread.start()
+    asyncio.run(main())
+    for thread in threads:
+        thread.join()
+
+    return {
+        "async_writes_per_s": counts["async_writes"] / seconds,
+        "sync_writes_per_s": counts["sync_writes"] / seconds,
+        "reads_per_s": len(read_ms) / seconds,
+        "read_p50_ms": percentile(read_ms, 50),
+        "read_p99_ms": percentile(read_ms, 99),
+        "errors": counts["errors"],
+    }
+
+def run_profile(profile: str, seconds: float) -> dict:
+    env = os.environ.copy()
+    env["SQLITE_PROFILE"] = profile
+    env["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    env.pop("ASYNC_DATABASE_URL", None)
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", str(seconds)],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main(seconds: float = 10):
+    print(f"{ASYNC_WRITERS} async writers, {READERS} readers, {SYNC_WRITERS} sync writers, {seconds:.0f}s each")
+    print(f"{'profile':>10} | {'async w/s':>9} | {'sync w/s':>8} | {'reads/s':>8} | "
+          f"{'read p50':>8} | {'read p99':>8} | {'errors':>6}")
+    for profile in ["default", "production"]:
+        r = run_profile(profile, seconds)
+        print(f"{profile:>10} | {r['async_writes_per_s']:>9.0f} | {r['sync_writes_per_s']:>8.0f} | "
+              f"{r['reads_per_s']:>8.0f} | {r['read_p50_ms']:>8.2f} | {r['read_p99_ms']:>8.2f} | {r['errors']:>6}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        print(json.dumps(run_child(float(sys.argv[2]))))
+    else:
+        main(float(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,122 @@
+"""
+Per-user counters for profile stats, maintained in the same transaction as alert/contact writes
+"""
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import Alert, AlertStatus, Contact, User, UserCounters
+
+async def compute_user_counters(db: AsyncSession, user_id: int) -> UserCounters:
+    """Build a user's counters from the source tables"""
+    total_alerts, active_alerts, last_alert_at = (await db.execute(
+        select(
+            func.count(Alert.id),
+            func.coalesce(func.sum(case((Alert.status == AlertStatus.ACTIVE.value, 1), else_=0)), 0),
+            func.max(Alert.created_at)
+        ).where(Alert.user_id == user_id)
+    )).one()
+    total_contacts = await db.scalar(select(func.count(Contact.id)).where(Contact.user_id == user_id))
+
+    return UserCounters(
+        user_id=user_id,
+        total_alerts=total_alerts,
+        active_alerts=active_alerts,
+        total_contacts=total_contacts,
+        last_alert_at=last_alert_at
+    )
+
+async def get_user_counters(db: AsyncSession, user_id: int) -> UserCounters:
+    """Primary-key lookup of a user's counters, building them on first use"""
+    counters = await db.get(UserCounters, user_id)
+    if counters is None:
+        counters = await compute_user_counters(db, user_id)
+        await db.merge(counters)
+        await db.commit()
+    return counters
+
+async def _apply(db: AsyncSession, user_id: int, last_alert_at: Optional[datetime] = None, **deltas):
+    """Atomically add deltas to a user's counters; call before committing the write they describe"""
+    values = {name: getattr(UserCounters, name) + delta for name, delta in deltas.items() if delta}
+    if last_alert_at is not None:
+        values["last_alert_at"] = last_alert_at
+    if not values:
+        return
+
+    result = await db.execute(
+        update(UserCounters).where(UserCounters.user_id == user_id).values(**values)
+    )
+    if result.rowcount == 0:
+        # No counters yet: build them from the source rows, including this write
+        await db.flush()
+        await db.merge(await compute_user_counters(db, user_id))
+
+async def record_alert_created(db: AsyncSession, alert: Alert):
+    await _apply(
+        db, alert.user_id,
+        last_alert_at=alert.created_at,
+        total_alerts=1,
+        active_alerts=1 if alert.status == AlertStatus.ACTIVE.value else 0
+    )
+
+async def record_alert_status_change(db: AsyncSession, user_id: int, old_status: str, new_status: str):
+    active = AlertStatus.ACTIVE.value
+    delta = (new_status == active) - (old_status == active)
+    await _apply(db, user_id, active_alerts=delta)
+
+async def record_contact_added(db: AsyncSession, user_id: int):
+    await _apply(db, user_id, total_contacts=1)
+
+async def record_contact_removed(db: AsyncSession, user_id: int):
+    await _apply(db, user_id, total_contacts=-1)
+
+def reconcile_user_counters(db: Session, user_ids: Optional[Iterable[int]] = None) -> int:
+    """Rebuild counters from the source tables (all users by default); returns users reconciled.
+
+    A batch job, so it runs on a sync session like the other CLI tools.
+    """
+    alerts = db.query(
+        Alert.user_id,
+        func.count(Alert.id),
+        func.coalesce(func.sum(case((Alert.status == AlertStatus.ACTIVE.value, 1), else_=0)), 0),
+        func.max(Alert.created_at)
+    )
+    contacts = db.query(Contact.user_id, func.count(Contact.id))
+    users = db.query(User.id)
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        alerts = alerts.filter(Alert.user_id.in_(user_ids))
+        contacts = contacts.filter(Contact.user_id.in_(user_ids))
+        users = users.filter(User.id.in_(user_ids))
+
+    alert_totals = {row[0]: row[1:] for row in alerts.group_by(Alert.user_id).all()}
+    contact_totals = dict(contacts.group_by(Contact.user_id).all())
+
+    count = 0
+    for (user_id,) in users.all():
+        total_alerts, active_alerts, last_alert_at = alert_totals.get(user_id, (0, 0, None))
+        db.merge(UserCounters(
+            user_id=user_id,
+            total_alerts=total_alerts,
+            active_alerts=active_alerts,
+            total_contacts=contact_totals.get(user_id, 0),
+            last_alert_at=last_alert_at
+        ))
+        count += 1
+        if count % 1000 == 0:
+            db.commit()
+    db.commit()
+    return count
+
+if __name__ == "__main__":
+    from database import SessionLocal, init_db
+
+    init_db()
+    session = SessionLocal()
+    try:
+        print(f"Reconciled counters for {reconcile_user_counters(session)} user(s)")
+    finally:
+        session.close()
@@ -1,6 +1,8 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, Float, DateTime, ForeignKey, Boolean, Enum as SQLEnum
+from sqlalchemy import create_engine, event, Delete, Insert, Update, Column, Integer, String, Text, Float, DateTime, ForeignKey, Boolean, Index, Enum as SQLEnum
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import Session, sessionmaker, relationship
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from datetime import datetime
 import os
 import enum
@@ -8,15 +10,110 @@ import enum
 # Database config - Use SQLite for development, can be changed to PostgreSQL for production
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./safevoice.db")
 
+# SQLite storage profile: "production" (WAL, tuned pragmas, single writer +
+# reader pool) or "default" (stock journaling, one shared connection)
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "production")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # NORMAL is durable enough under WAL
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", 64 * 1024))
+SQLITE_MMAP_SIZE_MB = int(os.getenv("SQLITE_MMAP_SIZE_MB", 256))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", 4))
+
+def _is_file_sqlite(url: str) -> bool:
+    return url.startswith("sqlite") and ":memory:" not in url and not url.rstrip("/").endswith(":")
+
+USE_SQLITE_PROFILE = SQLITE_PROFILE == "production" and _is_file_sqlite(SQLALCHEMY_DATABASE_URL)
+
+def _sqlite_pragmas(query_only: bool = False):
+    """Connect hook applying the production pragmas to every new SQLite connection"""
+    def apply(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE_MB * 1024 * 1024}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if query_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    return apply
+
 if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
     engine = create_engine(
         SQLALCHEMY_DATABASE_URL, 
         connect_args={"check_same_thread": False}
     )
+    if USE_SQLITE_PROFILE:
+        event.listen(engine, "connect", _sqlite_pragmas())
 else:
     engine = create_engine(SQLALCHEMY_DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def _async_url(url: str) -> str:
+    """Map a sync database URL to its asyncio driver (aiosqlite / asyncpg)"""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql:") or url.startswith("postgres:"):
+        return "postgresql+asyncpg:" + url.split(":", 1)[1]
+    return url
+
+# Async engine used by the API request path; the sync engine above serves
+# startup migrations, CLI jobs and the notification worker threads
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_url(SQLALCHEMY_DATABASE_URL))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+
+# Separate read-only pool, only used by the SQLite production profile
+async_read_engine = None
+
+if ASYNC_DATABASE_URL.startswith("sqlite"):
+    # SQLite allows one writer at a time; a single pooled connection queues
+    # writes in the pool instead of failing with "database is locked"
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL, poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0
+    )
+    if USE_SQLITE_PROFILE:
+        event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas())
+        # WAL readers never block the writer, so reads get a pool of their own
+        async_read_engine = create_async_engine(
+            ASYNC_DATABASE_URL, poolclass=AsyncAdaptedQueuePool,
+            pool_size=SQLITE_READ_POOL_SIZE, max_overflow=0
+        )
+        event.listen(async_read_engine.sync_engine, "connect", _sqlite_pragmas(query_only=True))
+else:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_pre_ping=True
+    )
+
+class RoutingSession(Session):
+    """Sends reads to the reader pool and writes to the single writer connection.
+
+    Once a transaction has written, its later reads stay on the writer so
+    they see their own uncommitted changes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if async_read_engine is None:
+            return super().get_bind(mapper, clause=clause, **kw)
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            self.info["use_writer"] = True
+        if self.info.get("use_writer"):
+            return async_engine.sync_engine
+        return async_read_engine.sync_engine
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _reset_routing(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("use_writer", None)
+
+# Objects stay loaded after commit: async sessions can't lazily reload attributes
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, sync_session_class=RoutingSession,
+    autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 # Enums
@@ -70,6 +167,10 @@ class Contact(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     owner = relationship("User", back_populates="contacts")
+    
+    __table_args__ = (
+        Index("ix_contacts_user_phone", "user_id", "phone"),
+    )
 
 class Alert(Base):
     __tablename__ = "alerts"
@@ -91,6 +192,10 @@ class Alert(Base):
     user = relationship("User", back_populates="alerts")
     location_updates = relationship("LocationUpdate", back_populates="alert", cascade="all, delete-orphan")
     notifications = relationship("Notification", back_populates="alert", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index("ix_alerts_user_created", "user_id", "created_at", "id"),
+    )
 
 class LocationUpdate(Base):
     __tablename__ = "location_updates"
@@ -109,6 +214,11 @@ class LocationUpdate(Base):
     # Relationships
     user = relationship("User", back_populates="location_updates")
     alert = relationship("Alert", back_populates="location_updates")
+    
+    __table_args__ = (
+        Index("ix_location_updates_alert_timestamp", "alert_id", "timestamp", "id"),
+        Index("ix_location_updates_user_timestamp", "user_id", "timestamp", "id"),
+    )
 
 class Notification(Base):
     __tablename__ = "notifications"
@@ -126,6 +236,56 @@ class Notification(Base):
     
     alert = relationship("Alert", back_populates="notifications")
 
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    alert_id = Column(Integer, ForeignKey("alerts.id", ondelete="CASCADE"), nullable=False)
+    contact_id = Column(Integer, ForeignKey("contacts.id", ondelete="SET NULL"), nullable=True)
+    recipient_type = Column(String(20), nullable=False)  # contact, authority
+    channel = Column(String(20), nullable=False)  # sms, email, authority
+    recipient = Column(String(100), nullable=False)  # Phone number or email address
+    subject = Column(String(255))
+    message = Column(Text, nullable=False)
+    status = Column(String(20), default="pending", index=True)  # pending, in_progress, sent, failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, index=True)
+    locked_at = Column(DateTime, nullable=True)  # Set while a worker holds the row
+    last_error = Column(String(255))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_notification_outbox_status_due", "status", "next_attempt_at"),
+        Index("ix_notification_outbox_alert_type", "alert_id", "recipient_type"),
+    )
+
+class UserCounters(Base):
+    __tablename__ = "user_counters"
+    
+    # Maintained alongside alert/contact writes; rebuilt by counters.reconcile_user_counters
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    total_alerts = Column(Integer, nullable=False, default=0)
+    active_alerts = Column(Integer, nullable=False, default=0)
+    total_contacts = Column(Integer, nullable=False, default=0)
+    last_alert_at = Column(DateTime, nullable=True)
+
+class LocationArchive(Base):
+    __tablename__ = "location_archives"
+    
+    # Trajectory of a closed alert moved out of location_updates into a compressed file (see retention.py)
+    alert_id = Column(Integer, ForeignKey("alerts.id", ondelete="CASCADE"), primary_key=True)
+    path = Column(String(255), nullable=False)  # Relative to LOCATION_ARCHIVE_DIR
+    points = Column(Integer, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+class RetentionState(Base):
+    __tablename__ = "retention_state"
+    
+    # Progress markers of the retention job, e.g. how far tracking points have been downsampled
+    name = Column(String(50), primary_key=True)
+    value = Column(DateTime, nullable=True)
+
 class EmergencyEscalation(Base):
     __tablename__ = "emergency_escalations"
     
@@ -149,14 +309,26 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # Create tables function
 def init_db():
     Base.metadata.create_all(bind=engine)
+    
+    from migrations import run_migrations
+    applied = run_migrations(engine)
+    if applied:
+        print(f"✅ Applied schema migrations: {', '.join(str(v) for v in applied)}")
     print("✅ Database & tables created successfully")
 
 # Export for other modules
 __all__ = [
-    "engine", "SessionLocal", "get_db", "init_db", "Base",
-    "User", "Contact", "Alert", "LocationUpdate", "Notification", "EmergencyEscalation",
+    "engine", "SessionLocal", "get_db", "async_engine", "async_read_engine", "AsyncSessionLocal",
+    "get_async_db",
+    "init_db", "Base",
+    "User", "Contact", "Alert", "LocationUpdate", "Notification", "NotificationOutbox",
+    "UserCounters", "LocationArchive", "RetentionState", "EmergencyEscalation",
     "AlertStatus", "SeverityLevel", "ContactRelation"
 ]
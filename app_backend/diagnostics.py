@@ -0,0 +1,198 @@
+"""
+On-demand diagnostics for a live worker - a sampling CPU profiler producing collapsed
+stacks (flamegraph.pl / speedscope input) and tracemalloc snapshot diffs for leak hunting
+"""
+import gc
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional
+
+# Upper bound on one profiling run, so a forgotten request can't sample for hours
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", 60))
+
+# Leaf frames of threads parked on a lock, queue or selector; dropped unless idle stacks are requested
+_IDLE_LEAVES = {
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"), ("queue.py", "get"),
+    ("selectors.py", "select"), ("thread.py", "_worker"),
+}
+_APP_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+class ProfilerBusy(Exception):
+    """Raised when a profiling run is requested while another is in progress"""
+
+def _frame_label(code, lineno: int) -> str:
+    filename = code.co_filename
+    if filename.startswith(_APP_DIR):
+        filename = filename[len(_APP_DIR):]
+    elif "site-packages" + os.sep in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    # ';' separates frames in the collapsed format
+    return f"{code.co_name} ({filename}:{lineno})".replace(";", ":")
+
+class StackSampler:
+    """Samples the Python stack of every thread at a fixed interval and counts identical stacks"""
+
+    def __init__(self, interval: float = 0.01, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._labels: Dict[tuple, str] = {}
+
+    def _label(self, code, lineno: int) -> str:
+        key = (code, lineno)
+        label = self._labels.get(key)
+        if label is None:
+            label = self._labels[key] = _frame_label(code, lineno)
+        return label
+
+    def _idle(self, frame) -> bool:
+        return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE_LEAVES
+
+    def sample_once(self, thread_names: Dict[int, str]):
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own or (not self.include_idle and self._idle(frame)):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code, frame.f_lineno))
+                frame = frame.f_back
+            stack.append(thread_names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def run(self, seconds: float):
+        deadline = time.monotonic() + seconds
+        next_sample = time.monotonic()
+        while next_sample < deadline:
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            self.sample_once(thread_names)
+            next_sample += self.interval
+            delay = next_sample - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Fell behind (GIL contention); skip missed ticks rather than burst
+                next_sample = time.monotonic()
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed format: 'thread;outer;...;leaf count' per line"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+_profile_lock = threading.Lock()
+
+def profile_process(seconds: float, interval: float = 0.01, include_idle: bool = False) -> StackSampler:
+    """Sample all threads of this process for up to PROFILER_MAX_SECONDS; one run at a time"""
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profiling run is already in progress")
+    try:
+        sampler = StackSampler(interval, include_idle)
+        sampler.run(min(seconds, PROFILER_MAX_SECONDS))
+        return sampler
+    finally:
+        _profile_lock.release()
+
+# --- Memory ------------------------------------------------------------------------------
+
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+def _object_types() -> Counter:
+    """Live GC-tracked objects by type name (sessions, lists, dicts, ...)"""
+    return Counter(type(obj).__name__ for obj in gc.get_objects())
+
+class MemoryTracker:
+    """tracemalloc baseline and diffs; tracing slows allocation, so it runs only between start() and stop()"""
+
+    def __init__(self):
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._baseline_types: Optional[Counter] = None
+        self._started_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing() and self._baseline is not None
+
+    def start(self, frames: int = 1) -> dict:
+        """Begin tracing (if not already) and take the baseline diffs are measured against"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            gc.collect()
+            self._baseline = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+            self._baseline_types = _object_types()
+            self._started_at = time.time()
+            return self.status()
+
+    def stop(self) -> dict:
+        with self._lock:
+            tracemalloc.stop()
+            self._baseline = self._baseline_types = self._started_at = None
+            return self.status()
+
+    def status(self) -> dict:
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        return {
+            "tracing": self.tracing,
+            "frames": tracemalloc.get_traceback_limit() if tracemalloc.is_tracing() else 0,
+            "seconds_since_baseline": round(time.time() - self._started_at, 1) if self._started_at else None,
+            "traced_bytes": current,
+            "peak_traced_bytes": peak,
+        }
+
+    def diff(self, limit: int = 25, group_by: str = "lineno") -> dict:
+        """Allocation growth since the baseline, by source line (or file / traceback), largest first"""
+        with self._lock:
+            if not self.tracing:
+                raise RuntimeError("Memory tracing is not started")
+            gc.collect()
+            # Counted first, so the diff's own result objects don't show up as growth
+            types = _object_types()
+            snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+            stats = snapshot.compare_to(self._baseline, group_by)
+            type_growth = Counter(types)
+            type_growth.subtract(self._baseline_types)
+
+        return {
+            **self.status(),
+            "size_diff_bytes": sum(stat.size_diff for stat in stats),
+            "allocations": [
+                {
+                    "location": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+                    "size_diff_bytes": stat.size_diff,
+                    "size_bytes": stat.size,
+                    "count_diff": stat.count_diff,
+                    "count": stat.count,
+                }
+                for stat in stats[:limit]
+            ],
+            "object_growth": [
+                {"type": name, "count_diff": diff, "count": types[name]}
+                for name, diff in type_growth.most_common(limit) if diff > 0
+            ],
+        }
+
+memory_tracker = MemoryTracker()
+
+def top_functions(stacks: Counter, limit: int = 20) -> List[dict]:
+    """Leaf-frame totals of a sampler's stacks, for a quick look without a flamegraph"""
+    leaves: Counter = Counter()
+    for stack, count in stacks.items():
+        leaves[stack.rsplit(";", 1)[-1]] += count
+    total = sum(leaves.values()) or 1
+    return [
+        {"frame": frame, "samples": count, "percent": round(100 * count / total, 1)}
+        for frame, count in leaves.most_common(limit)
+    ]
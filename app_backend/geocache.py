@@ -0,0 +1,167 @@
+"""
+Reverse-geocoding cache keyed by geohash cell, with an in-memory LRU and optional SQLite tier
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Geocode cache configuration
+GEOCODE_CACHE_PRECISION = int(os.getenv("GEOCODE_CACHE_PRECISION", 7))  # ~150m cells
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", 10000))
+GEOCODE_CACHE_TTL_SECONDS = int(os.getenv("GEOCODE_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+GEOCODE_CACHE_DB = os.getenv("GEOCODE_CACHE_DB", "")  # e.g. ./geocode_cache.db, empty disables
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def encode_geohash(latitude: float, longitude: float, precision: int = GEOCODE_CACHE_PRECISION) -> str:
+    """Encode coordinates as a geohash string of the given length"""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_lo = mid
+            else:
+                bits <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_lo = mid
+            else:
+                bits <<= 1
+                lat_hi = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(chars)
+
+class GeocodeCache:
+    """Thread-safe LRU + TTL cache of addresses, optionally backed by a SQLite file"""
+
+    def __init__(self, max_size: int = GEOCODE_CACHE_SIZE, ttl_seconds: int = GEOCODE_CACHE_TTL_SECONDS,
+                 precision: int = GEOCODE_CACHE_PRECISION, db_path: str = GEOCODE_CACHE_DB):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.precision = precision
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS geocode_cache ("
+                "cell TEXT PRIMARY KEY, address TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def key(self, latitude: float, longitude: float) -> str:
+        return encode_geohash(latitude, longitude, self.precision)
+
+    def get(self, latitude: float, longitude: float) -> Optional[str]:
+        """Return the cached address for the cell containing the point, if fresh"""
+        cell = self.key(latitude, longitude)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(cell)
+            if entry is not None:
+                address, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(cell)
+                    self.hits += 1
+                    return address
+                del self._entries[cell]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT address, expires_at FROM geocode_cache WHERE cell = ?", (cell,)
+                ).fetchone()
+                if row and row[1] > now:
+                    self._store(cell, row[0], row[1])
+                    self.hits += 1
+                    self.persistent_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, latitude: float, longitude: float, address: str):
+        """Cache an address for the cell containing the point"""
+        cell = self.key(latitude, longitude)
+        expires_at = time.time() + self.ttl_seconds
+
+        with self._lock:
+            self._store(cell, address, expires_at)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO geocode_cache (cell, address, expires_at) VALUES (?, ?, ?)",
+                    (cell, address, expires_at)
+                )
+                self._conn.commit()
+
+    def _store(self, cell: str, address: str, expires_at: float):
+        self._entries[cell] = (address, expires_at)
+        self._entries.move_to_end(cell)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def purge_expired(self) -> int:
+        """Drop expired entries from both tiers"""
+        now = time.time()
+        with self._lock:
+            expired = [cell for cell, (_, expires_at) in self._entries.items() if expires_at <= now]
+            for cell in expired:
+                del self._entries[cell]
+            removed = len(expired)
+            if self._conn is not None:
+                removed += self._conn.execute(
+                    "DELETE FROM geocode_cache WHERE expires_at <= ?", (now,)
+                ).rowcount
+                self._conn.commit()
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM geocode_cache")
+                self._conn.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "precision": self.precision,
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "persistent": self._conn is not None,
+        }
+
+geocode_cache = GeocodeCache()
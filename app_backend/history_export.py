@@ -0,0 +1,174 @@
+"""
+Location-history export - streams an alert's trajectory as NDJSON, GeoJSON or GPX
+without loading it into memory, and reads/writes compressed trajectory archives
+"""
+import gzip
+import os
+from datetime import datetime
+from types import SimpleNamespace
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional
+from xml.sax.saxutils import escape
+
+import orjson
+from sqlalchemy import select
+from starlette.concurrency import iterate_in_threadpool
+
+from database import AsyncSessionLocal, LocationArchive, LocationUpdate
+
+# Rows fetched from the cursor (and written to the client) per chunk
+LOCATION_EXPORT_CHUNK_SIZE = int(os.getenv("LOCATION_EXPORT_CHUNK_SIZE", 1000))
+# Archived alert trajectories are stored here as gzipped NDJSON, one file per alert
+LOCATION_ARCHIVE_DIR = os.getenv("LOCATION_ARCHIVE_DIR", "./archive")
+
+LOCATION_COLUMNS = (
+    LocationUpdate.latitude, LocationUpdate.longitude, LocationUpdate.address, LocationUpdate.timestamp,
+    LocationUpdate.accuracy, LocationUpdate.speed, LocationUpdate.heading
+)
+
+def _point(row) -> dict:
+    return {
+        "latitude": row.latitude,
+        "longitude": row.longitude,
+        "address": row.address,
+        "timestamp": row.timestamp,
+        "accuracy": row.accuracy,
+        "speed": row.speed,
+        "heading": row.heading
+    }
+
+def ndjson_rows(rows) -> bytes:
+    return b"".join(orjson.dumps(_point(row)) + b"\n" for row in rows)
+
+def _geojson_rows(rows) -> bytes:
+    return b",".join(
+        orjson.dumps({
+            "type": "Feature",
+            # GeoJSON positions are [longitude, latitude]
+            "geometry": {"type": "Point", "coordinates": [row.longitude, row.latitude]},
+            "properties": {
+                "timestamp": row.timestamp,
+                "address": row.address,
+                "accuracy": row.accuracy,
+                "speed": row.speed,
+                "heading": row.heading
+            }
+        })
+        for row in rows
+    )
+
+def _gpx_time(timestamp: datetime) -> str:
+    # Stored timestamps are naive UTC
+    return timestamp.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+def _gpx_rows(rows) -> bytes:
+    parts = []
+    for row in rows:
+        parts.append(f'<trkpt lat="{row.latitude}" lon="{row.longitude}"><time>{_gpx_time(row.timestamp)}</time>')
+        if row.address:
+            parts.append(f"<desc>{escape(row.address)}</desc>")
+        parts.append("</trkpt>\n")
+    return "".join(parts).encode()
+
+class ExportFormat:
+    """How one export format frames its rows: head, per-chunk encoder, chunk separator and tail"""
+
+    def __init__(self, media_type: str, extension: str, head: Callable[[int], bytes],
+                 rows: Callable[[list], bytes], separator: bytes, tail: bytes):
+        self.media_type = media_type
+        self.extension = extension
+        self.head = head
+        self.rows = rows
+        self.separator = separator
+        self.tail = tail
+
+EXPORT_FORMATS: Dict[str, ExportFormat] = {
+    "ndjson": ExportFormat("application/x-ndjson", "ndjson", lambda alert_id: b"", ndjson_rows, b"", b""),
+    "geojson": ExportFormat(
+        "application/geo+json", "geojson",
+        lambda alert_id: b'{"type":"FeatureCollection","features":[',
+        _geojson_rows, b",", b"]}\n"
+    ),
+    "gpx": ExportFormat(
+        "application/gpx+xml", "gpx",
+        lambda alert_id: (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<gpx version="1.1" creator="SAFE-VOICE" xmlns="http://www.topografix.com/GPX/1/1">\n'
+            f"<trk><name>{escape(f'Alert {alert_id}')}</name><trkseg>\n"
+        ).encode(),
+        _gpx_rows, b"", b"</trkseg></trk></gpx>\n"
+    ),
+}
+
+async def export_location_history(alert_id: int, export_format: str,
+                                   chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Yield an alert's location history in time order, one encoded chunk per cursor batch.
+
+    Uses its own session so the connection is held only while the export is
+    being read, and is released if the client goes away mid-stream.
+    """
+    fmt = EXPORT_FORMATS[export_format]
+    chunk_size = chunk_size or LOCATION_EXPORT_CHUNK_SIZE
+    query = (
+        select(*LOCATION_COLUMNS)
+        .where(LocationUpdate.alert_id == alert_id)
+        .order_by(LocationUpdate.timestamp.asc(), LocationUpdate.id.asc())
+        .execution_options(yield_per=chunk_size)
+    )
+
+    yield fmt.head(alert_id)
+    first = True
+    async with AsyncSessionLocal() as db:
+        archive = await db.get(LocationArchive, alert_id)
+        if archive is None:
+            result = await db.stream(query)
+            async for rows in result.partitions():
+                chunk = fmt.rows(rows)
+                yield chunk if first else fmt.separator + chunk
+                first = False
+    if archive is not None:
+        async for points in iterate_in_threadpool(read_archive(archive.path, chunk_size)):
+            chunk = fmt.rows([_archived_row(point) for point in points])
+            yield chunk if first else fmt.separator + chunk
+            first = False
+    yield fmt.tail
+
+def export_filename(alert_id: int, export_format: str) -> str:
+    return f"alert-{alert_id}-location-history.{EXPORT_FORMATS[export_format].extension}"
+
+def archive_path(alert_id: int) -> str:
+    """Archive file of an alert, relative to LOCATION_ARCHIVE_DIR"""
+    return os.path.join("alerts", f"{alert_id // 1000:05d}", f"{alert_id}.ndjson.gz")
+
+def write_archive(relative_path: str, partitions: Iterable[list]) -> int:
+    """Write row batches to a gzipped NDJSON archive, replacing it atomically; returns the point count"""
+    path = os.path.join(LOCATION_ARCHIVE_DIR, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    points = 0
+    with open(temp_path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as archive:
+            for rows in partitions:
+                archive.write(ndjson_rows(rows))
+                points += len(rows)
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(temp_path, path)
+    return points
+
+def read_archive(relative_path: str, chunk_size: int = LOCATION_EXPORT_CHUNK_SIZE) -> Iterator[List[dict]]:
+    """Yield an archive's points (location_history entries) in batches of chunk_size"""
+    with gzip.open(os.path.join(LOCATION_ARCHIVE_DIR, relative_path), "rb") as archive:
+        batch = []
+        for line in archive:
+            batch.append(orjson.loads(line))
+            if len(batch) >= chunk_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+def load_archive(relative_path: str) -> List[dict]:
+    return [point for batch in read_archive(relative_path) for point in batch]
+
+def _archived_row(point: dict) -> SimpleNamespace:
+    return SimpleNamespace(**{**point, "timestamp": datetime.fromisoformat(point["timestamp"])})
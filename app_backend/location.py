@@ -2,19 +2,50 @@
 Location tracking and Google Maps integration utilities
 """
 import os
+from math import radians, sin, cos, sqrt, atan2
+from typing import Dict, Optional
+
+import numpy as np
 import requests
-from typing import Optional, Tuple
+
+from geocache import geocode_cache
+from metrics import observe_provider
+from offline_geocoder import offline_reverse_geocode
 
 # Google Maps API configuration
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY", "")
+GOOGLE_GEOCODE_URL = os.getenv("GOOGLE_GEOCODE_URL", "https://maps.googleapis.com/maps/api/geocode/json")
+
+EARTH_RADIUS_KM = 6371
+
+# Reverse geocoding backend: google, offline, or fallback (google, then offline)
+GEOCODER_MODE = os.getenv("GEOCODER_MODE", "fallback")
 
+@observe_provider("geocoder")
 def get_address_from_coordinates(latitude: float, longitude: float) -> Optional[str]:
     """Reverse geocode coordinates to get human-readable address"""
-    if not GOOGLE_MAPS_API_KEY:
-        return None
+    if GEOCODER_MODE == "offline":
+        return offline_reverse_geocode(latitude, longitude)
+    
+    address = None
+    if GOOGLE_MAPS_API_KEY:
+        address = geocode_cache.get(latitude, longitude)
+        if address is not None:
+            return address
+        
+        address = google_reverse_geocode(latitude, longitude)
+        if address is not None:
+            geocode_cache.set(latitude, longitude, address)
     
+    if address is None and GEOCODER_MODE == "fallback":
+        address = offline_reverse_geocode(latitude, longitude)
+    return address
+
+@observe_provider("google_geocoding")
+def google_reverse_geocode(latitude: float, longitude: float) -> Optional[str]:
+    """Reverse geocode coordinates with the Google Geocoding API (uncached)"""
     try:
-        url = "https://maps.googleapis.com/maps/api/geocode/json"
+        url = GOOGLE_GEOCODE_URL
         params = {
             "latlng": f"{latitude},{longitude}",
             "key": GOOGLE_MAPS_API_KEY
@@ -41,9 +72,7 @@ def generate_google_maps_embed_url(latitude: float, longitude: float) -> str:
 
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """Calculate distance between two coordinates in kilometers using Haversine formula"""
-    from math import radians, sin, cos, sqrt, atan2
-    
-    R = 6371  # Earth's radius in kilometers
+    R = EARTH_RADIUS_KM
     
     lat1_rad = radians(lat1)
     lat2_rad = radians(lat2)
@@ -54,3 +83,39 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     c = 2 * atan2(sqrt(a), sqrt(1 - a))
     
     return R * c
+
+def _haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Haversine distance in kilometers between broadcastable arrays of degrees"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def distances_from(latitude: float, longitude: float, latitudes, longitudes) -> np.ndarray:
+    """Distances in kilometers from one point to each of many points"""
+    return _haversine_km(latitude, longitude, latitudes, longitudes)
+
+def pairwise_distances(latitudes_a, longitudes_a, latitudes_b, longitudes_b) -> np.ndarray:
+    """Distance matrix in kilometers: element [i, j] is from point i of A to point j of B"""
+    return _haversine_km(
+        np.asarray(latitudes_a, dtype=np.float64)[:, None], np.asarray(longitudes_a, dtype=np.float64)[:, None],
+        np.asarray(latitudes_b, dtype=np.float64)[None, :], np.asarray(longitudes_b, dtype=np.float64)[None, :]
+    )
+
+def path_metrics(latitudes, longitudes, timestamps) -> Dict[str, np.ndarray]:
+    """Cumulative length and per-segment timing along a trajectory, with points in time order.
+
+    Returns ``cumulative_km`` (one entry per point, starting at 0),
+    ``segment_seconds`` and ``speed_mps`` (one entry per segment; speed is
+    NaN where no time elapsed). ``timestamps`` may be datetimes or datetime64.
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    lengths_km = _haversine_km(latitudes[:-1], longitudes[:-1], latitudes[1:], longitudes[1:])
+    seconds = np.diff(np.asarray(timestamps, dtype="datetime64[us]")).astype(np.float64) / 1e6
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speeds = np.where(seconds > 0, lengths_km * 1000 / seconds, np.nan)
+    return {
+        "cumulative_km": np.concatenate(([0.0], np.cumsum(lengths_km))),
+        "segment_seconds": seconds,
+        "speed_mps": speeds,
+    }
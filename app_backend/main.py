@@ -1,6 +1,17 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from database import init_db
+from database import async_engine, async_read_engine, engine, init_db
+from metrics import (
+    CONTENT_TYPE, METRICS_ENABLED, Counter, Gauge, MetricsMiddleware, instrument_engine,
+    record_threadpool_usage, registry
+)
+from query_profiler import QUERY_PROFILING_ENABLED, QueryProfilerMiddleware, profile_engine
+from outbox import refresh_queue_depth, start_workers, stop_workers
+from retention import start_retention_job, stop_retention_job
+from principal_cache import principal_cache
+from geocache import geocode_cache
+from spatial_index import active_alert_index, rebuild_active_alert_index
+from streaming import alert_stream_hub
 
 # Create FastAPI app
 app = FastAPI(
@@ -18,12 +29,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if QUERY_PROFILING_ENABLED:
+    app.add_middleware(QueryProfilerMiddleware)
+    for _engine in (engine, async_engine, async_read_engine):
+        if _engine is not None:
+            profile_engine(_engine)
+
+if METRICS_ENABLED:
+    # Outermost, so request timings include the other middleware
+    app.add_middleware(MetricsMiddleware)
+    for _name, _engine in (("sync", engine), ("async", async_engine), ("async_read", async_read_engine)):
+        if _engine is not None:
+            instrument_engine(_engine, _name)
+
 # Create database on startup
 @app.on_event("startup")
 def startup_event():
     init_db()
+    print(f"[SOS] Indexed {rebuild_active_alert_index()} active alerts")
+    start_workers()
+    start_retention_job()
     print("🚀 SAFE-VOICE Backend Server Started")
 
+@app.on_event("shutdown")
+def shutdown_event():
+    stop_retention_job()
+    stop_workers()
+
 @app.get("/")
 def read_root():
     return {
@@ -36,21 +68,58 @@ def read_root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/caches")
+def cache_stats():
+    """Hit rates and sizes of the in-process caches"""
+    return {
+        "principal": principal_cache.stats(),
+        "geocode": geocode_cache.stats(),
+        "active_alert_index": active_alert_index.stats()
+    }
+
+_CACHES = {"principal": principal_cache, "geocode": geocode_cache}
+
+def _cache_stat(stat: str):
+    return lambda: [((name,), cache.stats()[stat]) for name, cache in _CACHES.items()]
+
+registry.register(Counter("cache_hits_total", "In-process cache hits.", ("cache",), collect=_cache_stat("hits")))
+registry.register(Counter("cache_misses_total", "In-process cache misses.", ("cache",), collect=_cache_stat("misses")))
+registry.register(Counter("cache_evictions_total", "In-process cache evictions.", ("cache",),
+                          collect=_cache_stat("evictions")))
+registry.register(Gauge("cache_entries", "Entries held by each in-process cache.", ("cache",),
+                        collect=_cache_stat("size")))
+registry.register(Gauge("active_alerts_indexed", "Alerts in the nearby-alert index.",
+                        collect=lambda: [((), len(active_alert_index))]))
+registry.register(Gauge("alert_stream_subscribers", "Open live alert streams.",
+                        collect=lambda: [((), alert_stream_hub.stats()["subscribers"])]))
+
+if METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus text exposition of the in-process metrics"""
+        record_threadpool_usage()
+        try:
+            await refresh_queue_depth()
+        except Exception as e:
+            print(f"[METRICS] Could not count outbox entries: {e}")
+        return Response(registry.render(), media_type=CONTENT_TYPE)
+
 # Import and include routers
 try:
-    from routers import auth, profile, contacts, sos, location
+    from routers import auth, profile, contacts, sos, location, debug
 except ImportError:
     # Fallback for direct execution
     import sys
     import os
     sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-    from routers import auth, profile, contacts, sos, location
+    from routers import auth, profile, contacts, sos, location, debug
 
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(profile.router, prefix="/profile", tags=["User Profile"])
 app.include_router(contacts.router, prefix="/contacts", tags=["Trusted Contacts"])
 app.include_router(sos.router, prefix="/sos", tags=["SOS Alerts"])
 app.include_router(location.router, prefix="/location", tags=["Location Tracking"])
+app.include_router(debug.router, prefix="/debug", tags=["Debug"], include_in_schema=False)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,326 @@
+"""
+In-process metrics registry, served in the Prometheus text format at /metrics
+
+Request-path recording is a dict lookup, a bisect and a few additions under a lock.
+Gauges that describe other components (queues, caches) are read only when scraped.
+"""
+import functools
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Histogram upper bounds, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+NOTIFICATION_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        """A fresh per-label-set value holder"""
+
+    @abstractmethod
+    def samples(self) -> Iterable[str]:
+        """Exposition lines for every label set"""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+class Counter(_Metric):
+    """A value only ever added to, or with collect=fn, values read from fn() -> [(labelvalues, value)] at scrape time"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 collect: Optional[Callable[[], Iterable[Tuple[Sequence, float]]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def samples(self):
+        if self.collect is not None:
+            values = self.collect()
+        else:
+            values = [(labels, child.value) for labels, child in list(self._children.items())]
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum", "_lock")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        # One slot per bucket plus +Inf; cumulated when rendered
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.upper_bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # A failing collector (e.g. the database is down) must not hide the other metrics
+                print(f"[METRICS] Could not collect {metric.name}: {e}")
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Time to handle an HTTP request, by route template and status code.",
+    ("method", "route", "status")
+))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "SQL statement execution time, by engine and statement type.",
+    ("engine", "operation"), QUERY_BUCKETS
+))
+db_query_errors = registry.register(Counter(
+    "db_query_errors_total", "SQL statements that raised, by engine.", ("engine",)
+))
+provider_request_duration = registry.register(Histogram(
+    "provider_request_duration_seconds",
+    "Calls to external providers (SMS, email, reverse geocoding), by provider and outcome.",
+    ("provider", "outcome")
+))
+background_tasks_in_flight = registry.register(Gauge(
+    "background_tasks_in_flight", "Post-response background tasks running, by task.", ("task",)
+))
+threadpool_threads = registry.register(Gauge(
+    "threadpool_threads", "Worker threads of the request thread pool (run_in_threadpool), by state.", ("state",)
+))
+first_notification_latency = registry.register(Histogram(
+    "sos_trigger_to_first_notification_seconds",
+    "Time from an SOS alert being queued to its first delivered contact notification.",
+    buckets=NOTIFICATION_BUCKETS
+))
+last_notification_latency = registry.register(Histogram(
+    "sos_trigger_to_last_notification_seconds",
+    "Time from an SOS alert being queued to its last delivered contact notification, once all are settled.",
+    buckets=NOTIFICATION_BUCKETS
+))
+
+# --- Recording helpers ------------------------------------------------------------------
+
+class MetricsMiddleware:
+    """Times each HTTP request and labels it with the matched route template, not the raw path"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            http_request_duration.labels(
+                scope["method"], route.path if route is not None else "<unmatched>", status_code
+            ).observe(time.perf_counter() - start)
+
+_OPERATIONS = {"SELECT": "select", "INSERT": "insert", "UPDATE": "update", "DELETE": "delete"}
+
+def instrument_engine(engine, name: str):
+    """Record the duration and type of every statement an engine (sync or async) executes"""
+    target = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(target, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    @event.listens_for(target, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is not None:
+            operation = _OPERATIONS.get(statement[:7].lstrip()[:6].upper(), "other")
+            db_query_duration.labels(name, operation).observe(time.perf_counter() - started)
+
+    @event.listens_for(target, "handle_error")
+    def _error(exception_context):
+        db_query_errors.labels(name).inc()
+
+def observe_provider(provider: str):
+    """Decorator timing a provider call; a truthy result counts as success, falsy as failure"""
+    def decorate(fn):
+        if not METRICS_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = fn(*args, **kwargs)
+                outcome = "success" if result else "failure"
+                return result
+            finally:
+                provider_request_duration.labels(provider, outcome).observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+def tracked_task(name: str, fn):
+    """Wrap a coroutine function for BackgroundTasks so background_tasks_in_flight counts it while it runs.
+
+    Counting starts when the task starts, not when it is scheduled, because
+    tasks of a failed or abandoned response never run.
+    """
+    gauge = background_tasks_in_flight.labels(name)
+
+    @functools.wraps(fn)
+    async def run(*args, **kwargs):
+        gauge.inc()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            gauge.dec()
+    return run
+
+_notified_alerts: "OrderedDict[int, None]" = OrderedDict()
+_notified_lock = threading.Lock()
+_NOTIFIED_ALERTS_MAX = 10000
+
+def observe_first_notification(alert_id: int, seconds: float):
+    """Record trigger-to-delivery time, once per alert (tracked for the most recent alerts)"""
+    with _notified_lock:
+        if alert_id in _notified_alerts:
+            return
+        _notified_alerts[alert_id] = None
+        if len(_notified_alerts) > _NOTIFIED_ALERTS_MAX:
+            _notified_alerts.popitem(last=False)
+    first_notification_latency.observe(seconds)
+
+def observe_last_notification(seconds: float):
+    """Record trigger-to-last-delivery time; the outbox reports each alert once"""
+    last_notification_latency.observe(seconds)
+
+def record_threadpool_usage():
+    """Snapshot the thread pool behind run_in_threadpool; must be called on the event loop"""
+    import anyio.to_thread
+
+    statistics = anyio.to_thread.current_default_thread_limiter().statistics()
+    threadpool_threads.labels("busy").set(statistics.borrowed_tokens)
+    threadpool_threads.labels("limit").set(statistics.total_tokens)
+    threadpool_threads.labels("waiting").set(statistics.tasks_waiting)
@@ -0,0 +1,68 @@
+"""
+Versioned schema migrations for existing databases
+"""
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+import database
+
+def _create_indexes(*indexes: Tuple[str, str, Tuple[str, ...]]) -> Callable[[Connection], None]:
+    """Create (name, table, columns) indexes as spelled out here, independent of later model edits"""
+    def migrate(conn: Connection):
+        for name, table, columns in indexes:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+    return migrate
+
+# (version, description, migrate) - append only; never edit an applied migration
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Composite indexes for hot alert, location, contact and outbox queries", _create_indexes(
+        ("ix_alerts_user_created", "alerts", ("user_id", "created_at", "id")),
+        ("ix_location_updates_alert_timestamp", "location_updates", ("alert_id", "timestamp", "id")),
+        ("ix_location_updates_user_timestamp", "location_updates", ("user_id", "timestamp", "id")),
+        ("ix_contacts_user_phone", "contacts", ("user_id", "phone")),
+        ("ix_notification_outbox_status_due", "notification_outbox", ("status", "next_attempt_at")),
+    )),
+    (2, "Outbox index for per-alert delivery reports", _create_indexes(
+        ("ix_notification_outbox_alert_type", "notification_outbox", ("alert_id", "recipient_type")),
+    )),
+]
+
+def _ensure_version_table(conn: Connection):
+    if not inspect(conn).has_table("schema_migrations"):
+        conn.execute(text(
+            "CREATE TABLE schema_migrations ("
+            "version INTEGER PRIMARY KEY, description VARCHAR(255) NOT NULL, applied_at TIMESTAMP NOT NULL)"
+        ))
+
+def current_version(engine: Engine) -> int:
+    """Highest applied migration version (0 for an unversioned database)"""
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")).scalar()
+
+def run_migrations(engine: Engine) -> List[int]:
+    """Apply pending migrations in order, each in its own transaction"""
+    applied = []
+    version = current_version(engine)
+
+    for migration_version, description, migrate in MIGRATIONS:
+        if migration_version <= version:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {"v": migration_version, "d": description, "t": datetime.utcnow()}
+            )
+        applied.append(migration_version)
+
+    return applied
+
+if __name__ == "__main__":
+    database.Base.metadata.create_all(bind=database.engine)
+    applied = run_migrations(database.engine)
+    print(f"Schema version {current_version(database.engine)}"
+          + (f" (applied {', '.join(str(v) for v in applied)})" if applied else " (up to date)"))
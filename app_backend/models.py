@@ -1,8 +1,10 @@
-from pydantic import BaseModel, EmailStr, Field, validator
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field, computed_field, validator
+from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
 
+from location import generate_google_maps_link
+
 # Request/Response Models
 
 class SeverityLevel(str, Enum):
@@ -89,6 +91,25 @@ class LocationUpdate(BaseModel):
     speed: Optional[float] = None
     heading: Optional[float] = None
 
+class LocationFix(LocationUpdate):
+    timestamp: Optional[datetime] = None  # When the fix was taken; defaults to receipt time
+
+class LocationBatch(BaseModel):
+    fixes: List[Dict[str, Any]] = Field(..., min_length=1)
+
+class LocationBatchItemResult(BaseModel):
+    index: int
+    status: str  # accepted, merged, rejected
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class LocationBatchResponse(BaseModel):
+    accepted: int
+    # Stored by moving the current stop point rather than as a new point
+    merged: int
+    rejected: int
+    results: List[LocationBatchItemResult]
+
 class LocationResponse(BaseModel):
     id: int
     latitude: float
@@ -118,10 +139,14 @@ class AlertResponse(BaseModel):
     triggered_by: str
     created_at: datetime
     resolved_at: Optional[datetime]
-    google_maps_link: str
     
     class Config:
         from_attributes = True
+    
+    @computed_field
+    @property
+    def google_maps_link(self) -> str:
+        return generate_google_maps_link(self.latitude, self.longitude)
 
 class AlertUpdate(BaseModel):
     status: Optional[AlertStatus] = None
@@ -130,7 +155,30 @@ class AlertUpdate(BaseModel):
 
 class AlertListResponse(BaseModel):
     alerts: List[AlertResponse]
-    total: int
+    total: Optional[int] = None  # Only computed when include_total=true
+    next_cursor: Optional[str] = None
+
+class NearbyAlert(BaseModel):
+    id: int
+    latitude: float
+    longitude: float
+    distance_km: float
+    status: str
+    severity: str
+    created_at: datetime
+    incident_id: int
+
+class Incident(BaseModel):
+    id: int  # Id of the incident's first alert
+    alert_ids: List[int]
+    latitude: float  # Centroid of the grouped alerts
+    longitude: float
+    first_triggered_at: datetime
+    last_triggered_at: datetime
+
+class NearbyAlertsResponse(BaseModel):
+    alerts: List[NearbyAlert]
+    incidents: List[Incident]
 
 # Notification Models
 class NotificationResponse(BaseModel):
@@ -3,21 +3,23 @@ Notification system for sending alerts to contacts and authorities
 """
 import os
 import requests
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime
+from typing import Optional
 
-from database import Contact, Alert, Notification, User
-from location import generate_google_maps_link, get_address_from_coordinates
+from database import Alert, User
+from location import generate_google_maps_link
+from metrics import observe_provider
 
 # SMS/Email service configuration
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID", "")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN", "")
 TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER", "")
+TWILIO_API_URL = os.getenv("TWILIO_API_URL", "https://api.twilio.com")
 
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY", "")
+SENDGRID_API_URL = os.getenv("SENDGRID_API_URL", "https://api.sendgrid.com/v3/mail/send")
 FROM_EMAIL = os.getenv("FROM_EMAIL", "noreply@safevoice.app")
 
+@observe_provider("sms")
 def send_sms(phone: str, message: str) -> bool:
     """Send SMS using Twilio"""
     if not all([TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER]):
@@ -25,7 +27,7 @@ def send_sms(phone: str, message: str) -> bool:
         return False
     
     try:
-        url = f"https://api.twilio.com/2010-04-01/Accounts/{TWILIO_ACCOUNT_SID}/Messages.json"
+        url = f"{TWILIO_API_URL}/2010-04-01/Accounts/{TWILIO_ACCOUNT_SID}/Messages.json"
         data = {
             "From": TWILIO_PHONE_NUMBER,
             "To": phone,
@@ -42,6 +44,7 @@ def send_sms(phone: str, message: str) -> bool:
         print(f"Error sending SMS: {e}")
         return False
 
+@observe_provider("email")
 def send_email(email: str, subject: str, message: str) -> bool:
     """Send email using SendGrid"""
     if not SENDGRID_API_KEY:
@@ -49,7 +52,7 @@ def send_email(email: str, subject: str, message: str) -> bool:
         return False
     
     try:
-        url = "https://api.sendgrid.com/v3/mail/send"
+        url = SENDGRID_API_URL
         headers = {
             "Authorization": f"Bearer {SENDGRID_API_KEY}",
             "Content-Type": "application/json"
@@ -71,6 +74,13 @@ def send_email(email: str, subject: str, message: str) -> bool:
         print(f"Error sending email: {e}")
         return False
 
+def send_authority_alert(authority_phone: str, message: str) -> bool:
+    """Send an alert to emergency services"""
+    # In production, this would call the actual emergency services API
+    # For now, we log it
+    print(f"[AUTHORITY ALERT] Would send to {authority_phone}: {message}")
+    return True
+
 def create_alert_message(user: User, alert: Alert, maps_link: str) -> str:
     """Create alert message for contacts"""
     address = alert.address or f"{alert.latitude}, {alert.longitude}"
@@ -97,72 +107,31 @@ Stay safe!"""
     
     return message
 
-def notify_trusted_contacts(
-    db: Session,
-    user: User,
-    alert: Alert,
-    contacts: Optional[List[Contact]] = None
-) -> List[Notification]:
-    """Notify all trusted contacts about an emergency alert"""
-    if contacts is None:
-        contacts = db.query(Contact).filter(Contact.user_id == user.id).all()
-    
-    if not contacts:
-        return []
-    
-    maps_link = generate_google_maps_link(alert.latitude, alert.longitude)
-    message = create_alert_message(user, alert, maps_link)
-    
-    notifications = []
-    
-    for contact in contacts:
-        # Send SMS
-        if contact.phone:
-            sms_sent = send_sms(contact.phone, message)
-            notification = Notification(
-                alert_id=alert.id,
-                contact_id=contact.id,
-                recipient_type="contact",
-                recipient_phone=contact.phone,
-                message=message,
-                status="sent" if sms_sent else "failed"
-            )
-            db.add(notification)
-            notifications.append(notification)
-        
-        # Send Email
-        if contact.email:
-            email_subject = f"🚨 Emergency Alert: {user.name} needs help!"
-            email_sent = send_email(contact.email, email_subject, message)
-            notification = Notification(
-                alert_id=alert.id,
-                contact_id=contact.id,
-                recipient_type="contact",
-                recipient_email=contact.email,
-                message=message,
-                status="sent" if email_sent else "failed"
-            )
-            db.add(notification)
-            notifications.append(notification)
-    
-    db.commit()
-    return notifications
-
-def notify_authorities(
-    db: Session,
-    user: User,
-    alert: Alert,
-    authority_type: str = "police_112"
-) -> Notification:
-    """Notify authorities (police, emergency services)"""
+class DispatchJob:
+    """A single message to send to one recipient over one channel"""
+
+    def __init__(self, channel: str, address: str, message: str,
+                 subject: Optional[str] = None):
+        self.channel = channel  # sms, email, authority
+        self.address = address
+        self.message = message
+        self.subject = subject
+
+    def send(self) -> bool:
+        if self.channel == "sms":
+            return send_sms(self.address, self.message)
+        if self.channel == "email":
+            return send_email(self.address, self.subject or "", self.message)
+        if self.channel == "authority":
+            return send_authority_alert(self.address, self.message)
+        raise ValueError(f"Unknown channel: {self.channel}")
+
+def create_authority_message(user: User, alert: Alert) -> str:
+    """Create alert message for authorities"""
     maps_link = generate_google_maps_link(alert.latitude, alert.longitude)
     address = alert.address or f"{alert.latitude}, {alert.longitude}"
     
-    if authority_type == "police_112":
-        # Emergency number 112 (European emergency number)
-        # In production, this would integrate with actual emergency services API
-        authority_phone = "112"  # This would be configured per region
-        message = f"""EMERGENCY ALERT - HIGH PRIORITY
+    return f"""EMERGENCY ALERT - HIGH PRIORITY
 
 User: {user.name}
 Phone: {user.phone}
@@ -173,20 +142,11 @@ Severity: {alert.severity.upper()}
 Time: {alert.created_at.strftime('%Y-%m-%d %H:%M:%S')}
 
 IMMEDIATE RESPONSE REQUIRED"""
-        
-        # In production, this would call the actual emergency services API
-        # For now, we log it
-        print(f"[AUTHORITY ALERT] Would send to {authority_phone}: {message}")
-        
-        notification = Notification(
-            alert_id=alert.id,
-            recipient_type="authority",
-            recipient_phone=authority_phone,
-            message=message,
-            status="sent"
-        )
-        db.add(notification)
-        db.commit()
-        return notification
-    
+
+def get_authority_phone(authority_type: str) -> Optional[str]:
+    """Resolve the number to contact for an authority type"""
+    if authority_type == "police_112":
+        # Emergency number 112 (European emergency number)
+        # In production, this would integrate with actual emergency services API
+        return "112"  # This would be configured per region
     return None
@@ -0,0 +1,152 @@
+"""
+Offline reverse geocoder - nearest-place lookups against a local places dataset
+"""
+import csv
+import os
+import threading
+from array import array
+from math import asin, cos, radians, sin, sqrt
+from typing import List, Optional, Tuple
+
+# Places dataset: CSV with name, latitude, longitude and optional admin1, country columns
+OFFLINE_GEOCODER_PLACES = os.getenv("OFFLINE_GEOCODER_PLACES", "")
+# Places further away than this are reported as "near" rather than "in"
+OFFLINE_GEOCODER_NEAR_KM = float(os.getenv("OFFLINE_GEOCODER_NEAR_KM", 5))
+
+EARTH_RADIUS_KM = 6371
+
+def _to_xyz(latitude: float, longitude: float) -> Tuple[float, float, float]:
+    lat = radians(latitude)
+    lon = radians(longitude)
+    cos_lat = cos(lat)
+    return cos_lat * cos(lon), cos_lat * sin(lon), sin(lat)
+
+class PlaceIndex:
+    """Implicit KD-tree over places projected onto the unit sphere.
+
+    Points are stored in flat ``array('d')`` columns laid out in tree order, so
+    the median of every ``[lo, hi)`` range is its node and no per-node objects
+    are allocated. Euclidean (chord) distance on the unit sphere is monotonic
+    in great-circle distance, so the nearest point is exact.
+    """
+
+    def __init__(self, places: List[Tuple[float, float, str]]):
+        coords = [_to_xyz(lat, lon) for lat, lon, _ in places]
+        order = list(range(len(places)))
+        self._build(order, coords, 0, len(order), 0)
+
+        self.xs = array("d", (coords[i][0] for i in order))
+        self.ys = array("d", (coords[i][1] for i in order))
+        self.zs = array("d", (coords[i][2] for i in order))
+        self.labels = [places[i][2] for i in order]
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @staticmethod
+    def _build(order: List[int], coords, lo: int, hi: int, axis: int):
+        stack = [(lo, hi, axis)]
+        while stack:
+            lo, hi, axis = stack.pop()
+            if hi - lo <= 1:
+                continue
+            order[lo:hi] = sorted(order[lo:hi], key=lambda i: coords[i][axis])
+            mid = (lo + hi) >> 1
+            next_axis = (axis + 1) % 3
+            stack.append((lo, mid, next_axis))
+            stack.append((mid + 1, hi, next_axis))
+
+    def nearest(self, latitude: float, longitude: float) -> Optional[Tuple[str, float]]:
+        """Return (label, distance_km) of the closest place"""
+        if not self.labels:
+            return None
+
+        query = _to_xyz(latitude, longitude)
+        qx, qy, qz = query
+        xs, ys, zs = self.xs, self.ys, self.zs
+        columns = (xs, ys, zs)
+        best_index = -1
+        best_d2 = float("inf")
+
+        stack = [(0, len(self.labels), 0, 0.0)]
+        while stack:
+            lo, hi, axis, plane_d2 = stack.pop()
+            if lo >= hi or plane_d2 >= best_d2:
+                continue
+
+            mid = (lo + hi) >> 1
+            dx = xs[mid] - qx
+            dy = ys[mid] - qy
+            dz = zs[mid] - qz
+            d2 = dx * dx + dy * dy + dz * dz
+            if d2 < best_d2:
+                best_d2 = d2
+                best_index = mid
+
+            diff = query[axis] - columns[axis][mid]
+            next_axis = (axis + 1) % 3
+            if diff < 0:
+                near, far = (lo, mid), (mid + 1, hi)
+            else:
+                near, far = (mid + 1, hi), (lo, mid)
+            # Far side is pushed first so the near side is searched first
+            stack.append((far[0], far[1], next_axis, diff * diff))
+            stack.append((near[0], near[1], next_axis, 0.0))
+
+        chord = sqrt(best_d2)
+        distance_km = 2 * EARTH_RADIUS_KM * asin(min(1.0, chord / 2))
+        return self.labels[best_index], distance_km
+
+def load_places_csv(path: str) -> List[Tuple[float, float, str]]:
+    """Load (latitude, longitude, label) tuples from a places CSV"""
+    places = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                latitude = float(row["latitude"])
+                longitude = float(row["longitude"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            parts = [row.get("name"), row.get("admin1"), row.get("country")]
+            label = ", ".join(p.strip() for p in parts if p and p.strip())
+            if label:
+                places.append((latitude, longitude, label))
+    return places
+
+_index: Optional[PlaceIndex] = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+def get_place_index() -> Optional[PlaceIndex]:
+    """Lazily load the configured places dataset.
+
+    Lookups run in the request thread pool, so callers arriving while the
+    first load is in progress wait for it instead of seeing no index.
+    """
+    global _index, _index_loaded
+    if not _index_loaded:
+        with _index_lock:
+            if not _index_loaded:
+                if OFFLINE_GEOCODER_PLACES:
+                    try:
+                        _index = PlaceIndex(load_places_csv(OFFLINE_GEOCODER_PLACES))
+                        print(f"[GEOCODER] Loaded {len(_index)} offline places")
+                    except Exception as e:
+                        print(f"Error loading offline places: {e}")
+                _index_loaded = True
+    return _index
+
+def offline_reverse_geocode(latitude: float, longitude: float) -> Optional[str]:
+    """Reverse geocode coordinates against the local places index"""
+    index = get_place_index()
+    if index is None:
+        return None
+
+    result = index.nearest(latitude, longitude)
+    if result is None:
+        return None
+
+    label, distance_km = result
+    if distance_km > OFFLINE_GEOCODER_NEAR_KM:
+        return f"Near {label} ({distance_km:.1f} km)"
+    return label
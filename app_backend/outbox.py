@@ -0,0 +1,424 @@
+"""
+Durable notification outbox - persists outgoing messages and drains them with a worker pool
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import (
+    SessionLocal, async_engine, async_read_engine, Alert, Contact, Notification, NotificationOutbox, User
+)
+from location import generate_google_maps_link
+from metrics import Gauge, observe_first_notification, observe_last_notification, registry
+from notify import (
+    DispatchJob, create_alert_message, create_authority_message, get_authority_phone
+)
+
+# Outbox worker configuration
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", 4))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 5))
+OUTBOX_BACKOFF_BASE_SECONDS = float(os.getenv("OUTBOX_BACKOFF_BASE_SECONDS", 2))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", 300))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", 60))
+OUTBOX_POLL_INTERVAL_SECONDS = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", 1))
+
+# Max provider calls in flight per channel across all workers
+CHANNEL_CONCURRENCY = {
+    "sms": int(os.getenv("OUTBOX_SMS_CONCURRENCY", 4)),
+    "email": int(os.getenv("OUTBOX_EMAIL_CONCURRENCY", 4)),
+    "authority": int(os.getenv("OUTBOX_AUTHORITY_CONCURRENCY", 2)),
+}
+
+class _Wakeup:
+    """Wakes every idle worker; a wakeup that arrives while a worker is busy is not lost"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def notify(self):
+        with self._condition:
+            self._generation += 1
+            self._condition.notify_all()
+
+    def wait(self, seen: int, timeout: float):
+        """Sleep unless notify() was called since the caller read generation `seen`"""
+        with self._condition:
+            if self._generation == seen:
+                self._condition.wait(timeout)
+
+_wakeup = _Wakeup()
+
+def _outbox_entry(alert: Alert, recipient_type: str, channel: str, recipient: str,
+                  message: str, subject: Optional[str] = None,
+                  contact_id: Optional[int] = None) -> NotificationOutbox:
+    return NotificationOutbox(
+        alert_id=alert.id,
+        contact_id=contact_id,
+        recipient_type=recipient_type,
+        channel=channel,
+        recipient=recipient,
+        subject=subject,
+        message=message,
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.utcnow()
+    )
+
+async def add_alert_notifications(
+    db: AsyncSession,
+    user: User,
+    alert: Alert,
+    notify_contacts: bool = True,
+    authority_type: Optional[str] = None
+) -> List[NotificationOutbox]:
+    """Add the messages for an alert to the caller's transaction.
+
+    Nothing is committed here: the caller commits the entries together
+    with the alert write they announce, so an alert is never stored
+    without its notifications, then calls wake_workers().
+    """
+    if alert.id is None:
+        await db.flush()
+    entries = []
+
+    if notify_contacts:
+        contacts = (await db.scalars(select(Contact).where(Contact.user_id == user.id))).all()
+        if contacts:
+            maps_link = generate_google_maps_link(alert.latitude, alert.longitude)
+            message = create_alert_message(user, alert, maps_link)
+            email_subject = f"🚨 Emergency Alert: {user.name} needs help!"
+            for contact in contacts:
+                if contact.phone:
+                    entries.append(_outbox_entry(
+                        alert, "contact", "sms", contact.phone, message, contact_id=contact.id
+                    ))
+                if contact.email:
+                    entries.append(_outbox_entry(
+                        alert, "contact", "email", contact.email, message, email_subject, contact.id
+                    ))
+
+    if authority_type:
+        authority_phone = get_authority_phone(authority_type)
+        if authority_phone:
+            entries.append(_outbox_entry(
+                alert, "authority", "authority", authority_phone,
+                create_authority_message(user, alert)
+            ))
+
+    db.add_all(entries)
+    return entries
+
+async def add_sos_notifications(db: AsyncSession, user: User, alert: Alert) -> List[NotificationOutbox]:
+    """Add contact notifications, plus authorities for high/critical alerts"""
+    authority_type = "police_112" if alert.severity in ["high", "critical"] else None
+    return await add_alert_notifications(db, user, alert, authority_type=authority_type)
+
+def wake_workers():
+    """Let idle workers pick up new entries without waiting for the next poll"""
+    _wakeup.notify()
+
+def backoff_delay(attempts: int) -> timedelta:
+    """Exponential backoff delay before the next delivery attempt"""
+    seconds = min(OUTBOX_BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)), OUTBOX_BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=seconds)
+
+def recover_stale_entries(db: Session) -> int:
+    """Return entries left in_progress by a crashed worker to the pending queue"""
+    cutoff = datetime.utcnow() - timedelta(seconds=OUTBOX_LEASE_SECONDS)
+    result = db.execute(
+        update(NotificationOutbox)
+        .where(
+            NotificationOutbox.status == "in_progress",
+            or_(NotificationOutbox.locked_at.is_(None), NotificationOutbox.locked_at < cutoff)
+        )
+        .values(status="pending", locked_at=None, next_attempt_at=datetime.utcnow())
+    )
+    db.commit()
+    return result.rowcount
+
+def claim_next_entry(db: Session, channels: List[str]) -> Optional[NotificationOutbox]:
+    """Atomically lease the oldest due entry on one of the given channels"""
+    now = datetime.utcnow()
+    lease_cutoff = now - timedelta(seconds=OUTBOX_LEASE_SECONDS)
+    candidates = db.query(NotificationOutbox.id, NotificationOutbox.status, NotificationOutbox.locked_at).filter(
+        NotificationOutbox.channel.in_(channels),
+        or_(
+            (NotificationOutbox.status == "pending") & (NotificationOutbox.next_attempt_at <= now),
+            (NotificationOutbox.status == "in_progress") & (NotificationOutbox.locked_at < lease_cutoff)
+        )
+    ).order_by(NotificationOutbox.next_attempt_at.asc()).limit(10).all()
+
+    for entry_id, entry_status, locked_at in candidates:
+        if _take_lease(db, entry_id, entry_status, locked_at, now):
+            return db.query(NotificationOutbox).filter(NotificationOutbox.id == entry_id).first()
+
+    return None
+
+def _take_lease(db: Session, entry_id: int, seen_status: str,
+                seen_locked_at: Optional[datetime], now: datetime) -> bool:
+    """Lease an entry if it is still as the caller read it.
+
+    Matching the observed locked_at as well as the status means that when
+    several workers find the same expired lease, only one can reclaim it.
+    """
+    result = db.execute(
+        update(NotificationOutbox)
+        .where(
+            NotificationOutbox.id == entry_id,
+            NotificationOutbox.status == seen_status,
+            NotificationOutbox.locked_at.is_(None) if seen_locked_at is None
+            else NotificationOutbox.locked_at == seen_locked_at
+        )
+        .values(status="in_progress", locked_at=now)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+def complete_entry(db: Session, entry: NotificationOutbox, sent: bool, error: Optional[str] = None) -> bool:
+    """Record a delivery attempt, scheduling a retry or writing the final Notification.
+
+    The write only applies while this worker still holds the lease it
+    claimed (same locked_at). If the lease expired and the entry was
+    reclaimed, the result is dropped so the entry gets exactly one outcome
+    and one Notification. Returns whether the result was recorded.
+    """
+    now = datetime.utcnow()
+    attempts = (entry.attempts or 0) + 1
+    retry = not sent and attempts < OUTBOX_MAX_ATTEMPTS
+
+    if retry:
+        values = {
+            "status": "pending",
+            "last_error": (error or "delivery failed")[:255],
+            "next_attempt_at": now + backoff_delay(attempts)
+        }
+    else:
+        values = {"status": "sent" if sent else "failed", "completed_at": now}
+        if error:
+            values["last_error"] = error[:255]
+
+    result = db.execute(
+        update(NotificationOutbox)
+        .where(
+            NotificationOutbox.id == entry.id,
+            NotificationOutbox.status == "in_progress",
+            NotificationOutbox.locked_at == entry.locked_at
+        )
+        .values(attempts=attempts, locked_at=None, **values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.rollback()
+        print(f"[OUTBOX] Lease on entry {entry.id} was lost before completion; dropping its result")
+        return False
+    
+    if not retry:
+        db.add(Notification(
+            alert_id=entry.alert_id,
+            contact_id=entry.contact_id,
+            recipient_type=entry.recipient_type,
+            recipient_phone=entry.recipient if entry.channel in ("sms", "authority") else None,
+            recipient_email=entry.recipient if entry.channel == "email" else None,
+            message=entry.message,
+            sent_at=now,
+            status=values["status"]
+        ))
+    entry_id, alert_id, created_at, recipient_type = entry.id, entry.alert_id, entry.created_at, entry.recipient_type
+    db.commit()
+    
+    if sent and recipient_type == "contact":
+        # Entries are committed with the alert, so this is trigger-to-delivery time
+        observe_first_notification(alert_id, (now - created_at).total_seconds())
+    if not retry and recipient_type == "contact":
+        report_alert_delivery(db, alert_id, entry_id)
+    return True
+
+def _fmt_ms(value: Optional[float]) -> str:
+    return f"{value:.0f}ms" if value is not None else "n/a"
+
+def report_alert_delivery(db: Session, alert_id: int, entry_id: int) -> Optional[dict]:
+    """Report first/last delivery times once an alert's contact messages are all settled.
+
+    Only the worker whose entry settled last (latest completed_at, then id)
+    reports, so an alert is reported once even when workers in several
+    processes finish together. Returns the report, or None if it isn't
+    this entry's to make.
+    """
+    entries = db.query(
+        NotificationOutbox.id, NotificationOutbox.status,
+        NotificationOutbox.created_at, NotificationOutbox.completed_at
+    ).filter(
+        NotificationOutbox.alert_id == alert_id,
+        NotificationOutbox.recipient_type == "contact"
+    ).all()
+    db.rollback()
+    if not entries or any(e.status in ("pending", "in_progress") for e in entries):
+        return None
+    if max(entries, key=lambda e: (e.completed_at, e.id)).id != entry_id:
+        return None
+
+    queued_at = min(e.created_at for e in entries)
+    delivered = sorted((e.completed_at - queued_at).total_seconds() * 1000 for e in entries if e.status == "sent")
+    report = {
+        "delivered": len(delivered),
+        "total": len(entries),
+        "first_delivery_ms": delivered[0] if delivered else None,
+        "last_delivery_ms": delivered[-1] if delivered else None,
+    }
+    if delivered:
+        observe_last_notification(delivered[-1] / 1000)
+    print(
+        f"[OUTBOX] Alert {alert_id}: {report['delivered']}/{report['total']} contact messages delivered "
+        f"(first: {_fmt_ms(report['first_delivery_ms'])}, last: {_fmt_ms(report['last_delivery_ms'])})"
+    )
+    return report
+
+class NotificationWorkerPool:
+    """Threads that drain the outbox with per-channel concurrency limits"""
+
+    def __init__(self, workers: int = OUTBOX_WORKERS,
+                 channel_concurrency: Optional[Dict[str, int]] = None):
+        self.workers = workers
+        self.channel_concurrency = channel_concurrency or dict(CHANNEL_CONCURRENCY)
+        self._slots = {
+            channel: threading.BoundedSemaphore(limit)
+            for channel, limit in self.channel_concurrency.items()
+        }
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        db = SessionLocal()
+        try:
+            recovered = recover_stale_entries(db)
+        finally:
+            db.close()
+        if recovered:
+            print(f"[OUTBOX] Recovered {recovered} interrupted notification(s)")
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"outbox-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"[OUTBOX] Started {self.workers} notification worker(s)")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        _wakeup.notify()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _free_channels(self) -> List[str]:
+        """Acquire a slot on every channel that has capacity; caller releases unused ones"""
+        return [channel for channel, slot in self._slots.items() if slot.acquire(blocking=False)]
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Read before looking for work, so an enqueue during the search still wakes us
+            seen = _wakeup.generation
+            worked = False
+            channels = self._free_channels()
+            try:
+                if channels:
+                    worked = self._process_one(channels)
+            except Exception as e:
+                print(f"[OUTBOX] Worker error: {e}")
+            finally:
+                for channel in channels:
+                    self._slots[channel].release()
+
+            if not worked:
+                _wakeup.wait(seen, OUTBOX_POLL_INTERVAL_SECONDS)
+
+    def _process_one(self, channels: List[str]) -> bool:
+        db = SessionLocal()
+        try:
+            entry = claim_next_entry(db, channels)
+            if entry is None:
+                return False
+
+            # Hand back the slots for channels this entry doesn't use
+            for channel in channels:
+                if channel != entry.channel:
+                    self._slots[channel].release()
+            channels[:] = [entry.channel]
+
+            job = DispatchJob(entry.channel, entry.recipient, entry.message, entry.subject)
+            error = None
+            try:
+                sent = job.send()
+            except Exception as e:
+                sent = False
+                error = str(e)
+            complete_entry(db, entry, sent, error)
+            return True
+        finally:
+            db.close()
+
+_pool: Optional[NotificationWorkerPool] = None
+
+outbox_entries = registry.register(Gauge(
+    "notification_outbox_entries", "Outbox messages waiting for or undergoing delivery, by channel and status.",
+    ("channel", "status")
+))
+
+async def refresh_queue_depth():
+    """Update notification_outbox_entries before a scrape.
+
+    Counted in the database because the workers may run in another process.
+    The count goes through the reader pool when there is one, so scrapes
+    never queue behind (or block) writes on the single writer connection.
+    """
+    counts = {
+        (channel, entry_status): 0 for channel in CHANNEL_CONCURRENCY for entry_status in ("pending", "in_progress")
+    }
+    async with (async_read_engine or async_engine).connect() as conn:
+        rows = await conn.execute(
+            select(NotificationOutbox.channel, NotificationOutbox.status, func.count())
+            .where(NotificationOutbox.status.in_(["pending", "in_progress"]))
+            .group_by(NotificationOutbox.channel, NotificationOutbox.status)
+        )
+        for channel, entry_status, count in rows:
+            counts[(channel, entry_status)] = count
+    for labels, count in counts.items():
+        outbox_entries.labels(*labels).set(count)
+
+def start_workers(workers: int = OUTBOX_WORKERS) -> Optional[NotificationWorkerPool]:
+    """Start the process-wide worker pool (no-op when workers is 0)"""
+    global _pool
+    if workers <= 0 or _pool is not None:
+        return _pool
+    _pool = NotificationWorkerPool(workers)
+    _pool.start()
+    return _pool
+
+def stop_workers():
+    """Stop the process-wide worker pool"""
+    global _pool
+    if _pool is not None:
+        _pool.stop()
+        _pool = None
+
+if __name__ == "__main__":
+    # Run workers as a standalone process so sending scales separately from the API
+    import time
+    from database import init_db
+
+    init_db()
+    start_workers(max(OUTBOX_WORKERS, 1))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop_workers()
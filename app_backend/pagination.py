@@ -0,0 +1,60 @@
+"""
+Keyset (cursor) pagination helpers for newest-first listings
+"""
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import Select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Hard upper bound on page size for list endpoints
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 100))
+
+def clamp_limit(limit: int) -> int:
+    """Keep a requested page size between 1 and MAX_PAGE_SIZE"""
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    """Opaque cursor pointing just past a row"""
+    raw = json.dumps([sort_value.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor from encode_cursor; raises ValueError if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+async def paginate_desc(db: AsyncSession, query: Select, sort_column, id_column, limit: int,
+                        cursor: Optional[str] = None, offset: int = 0):
+    """Return (rows, next_cursor) for one newest-first page.
+
+    Rows are ordered by ``(sort_column, id_column)`` descending and the
+    cursor seeks past the last row seen, so every page costs the same
+    regardless of how deep it is. ``offset`` is only honoured without a
+    cursor, for older clients.
+    """
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        # The redundant <= bound gives the planner an index range to seek into
+        query = query.where(
+            sort_column <= sort_value,
+            or_(sort_column < sort_value, id_column < row_id)
+        )
+
+    query = query.order_by(sort_column.desc(), id_column.desc())
+    if offset and not cursor:
+        query = query.offset(offset)
+    rows = (await db.scalars(query.limit(limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
@@ -0,0 +1,149 @@
+"""
+Authenticated-principal cache: verified bearer token -> user snapshot, so steady-state
+requests resolve their identity without a database read
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from database import User
+
+# Principal cache configuration (TTL 0 disables the cache)
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", 60))
+
+_COLUMNS = [column.key for column in inspect(User).column_attrs]
+
+class PrincipalCache:
+    """Thread-safe LRU + TTL cache of users keyed by verified token.
+
+    Entries never outlive their token's ``exp``. Any committed change to a
+    user row made through the ORM in this process invalidates that user's
+    entries (see the session hooks below); other processes see the change
+    once their entries expire.
+    """
+
+    def __init__(self, max_size: int = PRINCIPAL_CACHE_SIZE, ttl_seconds: float = PRINCIPAL_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def get(self, token: str) -> Optional[User]:
+        """Return a detached copy of the cached user for a token, if fresh"""
+        if not self.enabled:
+            return None
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[2] <= now:
+                self._remove(token)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+
+        # A fresh instance per request, so handlers can't leak edits into the cache
+        user = User(**entry[1])
+        make_transient_to_detached(user)
+        return user
+
+    def generation(self, user_id: int) -> int:
+        """Invalidation counter for a user; read it before loading the user from the database"""
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def set(self, token: str, user: User, token_expires_at: Optional[float], generation: int):
+        """Cache a user loaded for a verified token, unless it was invalidated since `generation`"""
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        values = {key: getattr(user, key) for key in _COLUMNS}
+
+        with self._lock:
+            if self._generations.get(user.id, 0) != generation:
+                return
+            self._remove(token)
+            self._entries[token] = (user.id, values, expires_at)
+            self._tokens_by_user.setdefault(user.id, set()).add(token)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached token for a user"""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            tokens = self._tokens_by_user.pop(user_id, set())
+            for token in tokens:
+                self._entries.pop(token, None)
+            self.invalidations += len(tokens)
+
+    def _remove(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry is not None:
+            tokens = self._tokens_by_user.get(entry[0])
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._tokens_by_user[entry[0]]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+            self._generations.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+principal_cache = PrincipalCache()
+
+# Invalidate on commit rather than flush, so a concurrent miss can't re-cache the old row
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    changed = session.info.setdefault("principal_cache_users", set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            changed.add(obj.id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop("principal_cache_users", ()):
+        principal_cache.invalidate_user(user_id)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_changed_users(session, previous_transaction):
+    session.info.pop("principal_cache_users", None)
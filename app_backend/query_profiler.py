@@ -0,0 +1,207 @@
+"""
+Per-request SQL profiler - counts and times every statement a request runs, flags
+identical statements repeated within one request (N+1 patterns) and logs slow requests
+"""
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Deque, Dict, List, Optional
+
+from sqlalchemy import event
+
+QUERY_PROFILING_ENABLED = os.getenv("QUERY_PROFILING_ENABLED", "false").lower() == "true"
+# Requests slower than this are logged with their statement breakdown
+QUERY_PROFILE_SLOW_MS = float(os.getenv("QUERY_PROFILE_SLOW_MS", 500))
+# An identical statement run this many times in one request is flagged as an N+1 pattern
+QUERY_PROFILE_REPEAT_THRESHOLD = int(os.getenv("QUERY_PROFILE_REPEAT_THRESHOLD", 2))
+# Add X-Query-Count / X-Query-Time-Ms / X-Query-Repeats to every response
+QUERY_PROFILE_HEADERS = os.getenv("QUERY_PROFILE_HEADERS", "true").lower() == "true"
+# Flagged request profiles kept for GET /debug/query-profiles
+QUERY_PROFILE_KEEP = int(os.getenv("QUERY_PROFILE_KEEP", 100))
+
+_LOGGED_STATEMENTS = 10
+_STATEMENT_CHARS = 300
+# Expanded IN lists differ only in their number of placeholders
+_IN_LIST = re.compile(r"\((?:\?|%s|\$\d+)(?:,\s*(?:\?|%s|\$\d+))*\)")
+
+def normalize_statement(statement: str) -> str:
+    return _IN_LIST.sub("(?...)", " ".join(statement.split()))
+
+class RequestProfile:
+    """Statements one request executed, grouped by normalized SQL"""
+    __slots__ = ("method", "route", "status", "queries", "query_seconds", "seconds", "statements", "streaming")
+
+    def __init__(self, method: str, route: str):
+        self.method = method
+        self.route = route
+        self.status = 500
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.seconds = 0.0
+        # normalized statement -> [executions, seconds]
+        self.statements: Dict[str, List] = {}
+        self.streaming = False
+
+    def record(self, statement: str, seconds: float):
+        self.queries += 1
+        self.query_seconds += seconds
+        entry = self.statements.get(statement)
+        if entry is None:
+            self.statements[statement] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    @property
+    def repeats(self) -> int:
+        """Executions of a statement already run earlier in this request"""
+        return self.queries - len(self.statements)
+
+    def repeated_statements(self, threshold: int = QUERY_PROFILE_REPEAT_THRESHOLD) -> List[str]:
+        return [statement for statement, (count, _) in self.statements.items() if count >= threshold]
+
+    @property
+    def slow(self) -> bool:
+        # Live streams are open for as long as the client listens
+        return not self.streaming and self.seconds * 1000 >= QUERY_PROFILE_SLOW_MS
+
+    def breakdown(self, limit: Optional[int] = None) -> List[dict]:
+        ordered = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)
+        return [
+            {"statement": statement[:_STATEMENT_CHARS], "count": count, "ms": round(seconds * 1000, 2)}
+            for statement, (count, seconds) in ordered[:limit]
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            "method": self.method,
+            "route": self.route,
+            "status": self.status,
+            "ms": round(self.seconds * 1000, 1),
+            "queries": self.queries,
+            "query_ms": round(self.query_seconds * 1000, 1),
+            "repeats": self.repeats,
+            "repeated_statements": len(self.repeated_statements()),
+            "statements": self.breakdown()
+        }
+
+class ProfileStore:
+    """Recent flagged profiles plus per-route totals, for finding redundant round trips"""
+
+    def __init__(self, keep: int = QUERY_PROFILE_KEEP):
+        self._recent: Deque[dict] = deque(maxlen=keep)
+        self._routes: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile, flagged: bool):
+        key = f"{profile.method} {profile.route}"
+        with self._lock:
+            route = self._routes.get(key)
+            if route is None:
+                route = self._routes[key] = {"requests": 0, "queries": 0, "max_queries": 0, "repeats": 0, "flagged": 0}
+            route["requests"] += 1
+            route["queries"] += profile.queries
+            route["max_queries"] = max(route["max_queries"], profile.queries)
+            route["repeats"] += profile.repeats
+            if flagged:
+                route["flagged"] += 1
+                self._recent.append(profile.to_dict())
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            routes = {
+                key: {**route, "queries_per_request": round(route["queries"] / route["requests"], 2)}
+                for key, route in self._routes.items()
+            }
+            return {
+                "slow_ms": QUERY_PROFILE_SLOW_MS,
+                "repeat_threshold": QUERY_PROFILE_REPEAT_THRESHOLD,
+                "routes": dict(sorted(routes.items(), key=lambda item: item[1]["repeats"], reverse=True)),
+                "recent": list(reversed(self._recent))
+            }
+
+    def clear(self):
+        with self._lock:
+            self._recent.clear()
+            self._routes.clear()
+
+profile_store = ProfileStore()
+
+# Async sessions run statements in greenlets and sync routes in threads that both inherit this
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("query_profile", default=None)
+
+def current_profile() -> Optional[RequestProfile]:
+    return _current_profile.get()
+
+def profile_engine(engine):
+    """Attribute every statement an engine (sync or async) executes to the current request's profile"""
+    target = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(target, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and _current_profile.get() is not None:
+            context._profile_started = time.perf_counter()
+
+    @event.listens_for(target, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_profile_started", None)
+        profile = _current_profile.get()
+        if started is not None and profile is not None:
+            profile.record(normalize_statement(statement), time.perf_counter() - started)
+
+def log_profile(profile: RequestProfile):
+    repeated = profile.repeated_statements()
+    print(
+        f"[QUERY PROFILE] {profile.method} {profile.route} {profile.status} {profile.seconds * 1000:.1f}ms, "
+        f"{profile.queries} queries in {profile.query_seconds * 1000:.1f}ms, "
+        f"{len(repeated)} statements repeated {QUERY_PROFILE_REPEAT_THRESHOLD}+ times"
+    )
+    for item in profile.breakdown(_LOGGED_STATEMENTS):
+        flag = " N+1" if item["count"] >= QUERY_PROFILE_REPEAT_THRESHOLD else ""
+        print(f"[QUERY PROFILE]   {item['count']:>4}x {item['ms']:>9.2f}ms{flag}  {item['statement']}")
+
+class QueryProfilerMiddleware:
+    """Profiles each HTTP request's SQL; flagged (slow or N+1) requests are logged and kept"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        token = _current_profile.set(profile)
+        start = time.perf_counter()
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                headers = list(message.get("headers", []))
+                profile.streaming = (b"content-type", b"text/event-stream") in [
+                    (name.lower(), value.split(b";")[0]) for name, value in headers
+                ]
+                if QUERY_PROFILE_HEADERS:
+                    # Statements run so far; a streamed body or background tasks may add more
+                    headers += [
+                        (b"x-query-count", str(profile.queries).encode()),
+                        (b"x-query-time-ms", f"{profile.query_seconds * 1000:.1f}".encode()),
+                        (b"x-query-repeats", str(profile.repeats).encode()),
+                    ]
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            _current_profile.reset(token)
+            profile.seconds = time.perf_counter() - start
+            route = scope.get("route")
+            profile.route = route.path if route is not None else "<unmatched>"
+            flagged = profile.slow or bool(profile.repeated_statements())
+            profile_store.add(profile, flagged)
+            if flagged:
+                log_profile(profile)
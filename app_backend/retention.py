@@ -0,0 +1,236 @@
+"""
+Location retention - downsamples old tracking points and moves closed-alert trajectories
+into compressed archives, deleting from location_updates in small, paced batches
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, exists, func, select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, Alert, AlertStatus, LocationArchive, LocationUpdate, RetentionState, User
+from history_export import LOCATION_COLUMNS, archive_path, write_archive
+
+# Tracking points (not part of an alert) older than this are thinned to the last fix per user per bucket
+LOCATION_DOWNSAMPLE_AFTER_DAYS = float(os.getenv("LOCATION_DOWNSAMPLE_AFTER_DAYS", 30))
+LOCATION_DOWNSAMPLE_BUCKET_SECONDS = int(os.getenv("LOCATION_DOWNSAMPLE_BUCKET_SECONDS", 600))
+# Trajectories of alerts resolved or cancelled longer ago than this move to archive files
+ALERT_ARCHIVE_AFTER_DAYS = float(os.getenv("ALERT_ARCHIVE_AFTER_DAYS", 90))
+# Rows deleted per transaction, and the overall delete rate, so live writes keep getting the lock
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", 500))
+RETENTION_MAX_ROWS_PER_SECOND = float(os.getenv("RETENTION_MAX_ROWS_PER_SECOND", 5000))
+# Run the job in a background thread of the API process every N seconds (0 = run `python retention.py` instead)
+RETENTION_INTERVAL_SECONDS = float(os.getenv("RETENTION_INTERVAL_SECONDS", 0))
+
+CLOSED_STATUSES = [AlertStatus.RESOLVED.value, AlertStatus.CANCELLED.value]
+_DOWNSAMPLE_WATERMARK = "location_downsampled_until"
+_EPOCH = datetime(1970, 1, 1)
+
+class Pacer:
+    """Holds a job to at most max_rows_per_second, sleeping between batches; stops early once stop is set"""
+
+    def __init__(self, max_rows_per_second: float = RETENTION_MAX_ROWS_PER_SECOND,
+                 stop: Optional[threading.Event] = None):
+        self.seconds_per_row = 1 / max_rows_per_second if max_rows_per_second > 0 else 0.0
+        self.stop = stop or threading.Event()
+        self._next = time.monotonic()
+
+    @property
+    def stopped(self) -> bool:
+        return self.stop.is_set()
+
+    def wait(self, rows: int):
+        self._next = max(self._next, time.monotonic()) + rows * self.seconds_per_row
+        delay = self._next - time.monotonic()
+        if delay > 0:
+            self.stop.wait(delay)
+
+def _delete_points(db: Session, ids: List[int], pacer: Pacer, batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    """Delete location points by id, one short transaction per batch"""
+    deleted = 0
+    for start in range(0, len(ids), batch_size):
+        if pacer.stopped:
+            break
+        batch = ids[start:start + batch_size]
+        db.execute(delete(LocationUpdate).where(LocationUpdate.id.in_(batch)))
+        db.commit()
+        deleted += len(batch)
+        pacer.wait(len(batch))
+    return deleted
+
+def _bucket_start(timestamp: datetime, bucket_seconds: int) -> datetime:
+    seconds = int((timestamp - _EPOCH).total_seconds())
+    return _EPOCH + timedelta(seconds=seconds - seconds % bucket_seconds)
+
+def downsample_tracking_points(db: Session, pacer: Pacer, now: Optional[datetime] = None,
+                               bucket_seconds: int = LOCATION_DOWNSAMPLE_BUCKET_SECONDS) -> int:
+    """Keep only the last tracking fix per user per bucket for points older than the cutoff.
+
+    Work resumes from a watermark, so each run only reads points that have
+    crossed the cutoff since the previous complete run. Returns points deleted.
+    """
+    now = now or datetime.utcnow()
+    cutoff = _bucket_start(now - timedelta(days=LOCATION_DOWNSAMPLE_AFTER_DAYS), bucket_seconds)
+    state = db.get(RetentionState, _DOWNSAMPLE_WATERMARK)
+    since = state.value if state is not None else None
+    if since is not None and since >= cutoff:
+        db.commit()
+        return 0
+
+    user_ids = db.scalars(select(User.id).order_by(User.id)).all()
+    db.commit()
+
+    deleted = 0
+    for user_id in user_ids:
+        query = select(LocationUpdate.id, LocationUpdate.timestamp).where(
+            LocationUpdate.user_id == user_id,
+            LocationUpdate.alert_id.is_(None),
+            LocationUpdate.timestamp < cutoff
+        )
+        if since is not None:
+            query = query.where(LocationUpdate.timestamp >= since)
+
+        doomed = []
+        bucket = kept_id = None
+        for point_id, timestamp in db.execute(
+            query.order_by(LocationUpdate.timestamp, LocationUpdate.id).execution_options(yield_per=5000)
+        ):
+            point_bucket = _bucket_start(timestamp, bucket_seconds)
+            if point_bucket == bucket:
+                doomed.append(kept_id)
+            bucket, kept_id = point_bucket, point_id
+        db.commit()
+
+        deleted += _delete_points(db, doomed, pacer)
+        if pacer.stopped:
+            return deleted
+
+    if state is None:
+        state = RetentionState(name=_DOWNSAMPLE_WATERMARK)
+        db.add(state)
+    state.value = cutoff
+    db.commit()
+    return deleted
+
+def archive_closed_alerts(db: Session, pacer: Pacer, now: Optional[datetime] = None,
+                          alerts_per_round: int = 100) -> Tuple[int, int]:
+    """Move trajectories of long-closed alerts into archive files; returns (alerts, points) archived.
+
+    The archive file is written and recorded before any point is deleted, so
+    an interrupted run leaves either the full trajectory in location_updates
+    or a complete archive; the next run finishes deleting leftover points.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=ALERT_ARCHIVE_AFTER_DAYS)
+    has_points = exists().where(LocationUpdate.alert_id == Alert.id)
+    archived_alerts = archived_points = 0
+    after_id = 0
+
+    while not pacer.stopped:
+        alert_ids = db.scalars(
+            select(Alert.id).where(
+                Alert.id > after_id,
+                Alert.status.in_(CLOSED_STATUSES),
+                func.coalesce(Alert.resolved_at, Alert.created_at) < cutoff,
+                has_points
+            ).order_by(Alert.id).limit(alerts_per_round)
+        ).all()
+        db.commit()
+        if not alert_ids:
+            break
+
+        for alert_id in alert_ids:
+            if db.get(LocationArchive, alert_id) is None:
+                path = archive_path(alert_id)
+                points = write_archive(path, db.execute(
+                    select(*LOCATION_COLUMNS)
+                    .where(LocationUpdate.alert_id == alert_id)
+                    .order_by(LocationUpdate.timestamp, LocationUpdate.id)
+                    .execution_options(yield_per=1000)
+                ).partitions())
+                db.add(LocationArchive(alert_id=alert_id, path=path, points=points))
+                archived_alerts += 1
+                archived_points += points
+            db.commit()
+
+            ids = db.scalars(select(LocationUpdate.id).where(LocationUpdate.alert_id == alert_id)).all()
+            db.commit()
+            _delete_points(db, ids, pacer)
+            if pacer.stopped:
+                break
+        after_id = alert_ids[-1]
+
+    return archived_alerts, archived_points
+
+def run_retention(stop: Optional[threading.Event] = None, now: Optional[datetime] = None,
+                  max_rows_per_second: float = RETENTION_MAX_ROWS_PER_SECOND) -> dict:
+    """One pass of the retention job: archive closed alerts, then downsample tracking points"""
+    pacer = Pacer(max_rows_per_second, stop)
+    started = time.monotonic()
+    db = SessionLocal()
+    try:
+        alerts, archived_points = archive_closed_alerts(db, pacer, now)
+        downsampled = downsample_tracking_points(db, pacer, now)
+    finally:
+        db.close()
+    return {
+        "archived_alerts": alerts,
+        "archived_points": archived_points,
+        "downsampled_points": downsampled,
+        "seconds": round(time.monotonic() - started, 1),
+        "completed": not pacer.stopped,
+    }
+
+class RetentionJob:
+    """Background thread running the retention job every interval_seconds"""
+
+    def __init__(self, interval_seconds: float = RETENTION_INTERVAL_SECONDS):
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+        print(f"[RETENTION] Running every {self.interval_seconds:.0f}s")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                result = run_retention(self._stop)
+                print(f"[RETENTION] {result}")
+            except Exception as e:
+                print(f"[RETENTION] Job error: {e}")
+            self._stop.wait(self.interval_seconds)
+
+_job: Optional[RetentionJob] = None
+
+def start_retention_job(interval_seconds: float = RETENTION_INTERVAL_SECONDS) -> Optional[RetentionJob]:
+    """Start the process-wide retention thread (no-op when the interval is 0)"""
+    global _job
+    if interval_seconds <= 0 or _job is not None:
+        return _job
+    _job = RetentionJob(interval_seconds)
+    _job.start()
+    return _job
+
+def stop_retention_job():
+    global _job
+    if _job is not None:
+        _job.stop()
+        _job = None
+
+if __name__ == "__main__":
+    # One pass from cron or a separate process, so the API doesn't have to host the job
+    from database import init_db
+
+    init_db()
+    print(f"[RETENTION] {run_retention()}")
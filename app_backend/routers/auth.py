@@ -1,22 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 
-from database import get_db, User
+from database import get_async_db, User
 from models import UserRegister, UserLogin, TokenResponse, UserProfile
 from auth import (
-    authenticate_user, create_access_token, get_password_hash,
+    authenticate_user, create_access_token, get_password_hash_async,
     ACCESS_TOKEN_EXPIRE_MINUTES, get_current_user
 )
 
 router = APIRouter()
 
 @router.post("/register", response_model=TokenResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserRegister, db: Session = Depends(get_db)):
+async def register(user_data: UserRegister, db: AsyncSession = Depends(get_async_db)):
     """Register a new user"""
-    existing_user = db.query(User).filter(
+    # Hash before touching the database so no connection is held while bcrypt runs
+    hashed_password = await get_password_hash_async(user_data.password)
+    
+    existing_user = await db.scalar(select(User).where(
         (User.phone == user_data.phone) | (User.email == user_data.email)
-    ).first()
+    ).limit(1))
     
     if existing_user:
         raise HTTPException(
@@ -24,7 +28,6 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
             detail="Phone number or email already registered"
         )
     
-    hashed_password = get_password_hash(user_data.password)
     new_user = User(
         name=user_data.name,
         phone=user_data.phone,
@@ -35,8 +38,7 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -52,9 +54,9 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
     )
 
 @router.post("/login", response_model=TokenResponse)
-async def login(credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(credentials: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """Login and get access token"""
-    user = authenticate_user(db, credentials.phone, credentials.password)
+    user = await authenticate_user(db, credentials.phone, credentials.password)
     
     if not user:
         raise HTTPException(
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from database import get_db, User, Contact
+from database import get_async_db, User, Contact
 from models import ContactCreate, ContactResponse, ContactUpdate
 from auth import get_current_user
+from counters import record_contact_added, record_contact_removed
 
 router = APIRouter()
 
@@ -12,13 +14,13 @@ router = APIRouter()
 async def create_contact(
     contact_data: ContactCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Add a trusted contact"""
-    existing_contact = db.query(Contact).filter(
+    existing_contact = await db.scalar(select(Contact).where(
         Contact.user_id == current_user.id,
         Contact.phone == contact_data.phone
-    ).first()
+    ))
     
     if existing_contact:
         raise HTTPException(
@@ -27,10 +29,10 @@ async def create_contact(
         )
     
     if contact_data.is_primary:
-        db.query(Contact).filter(
+        await db.execute(update(Contact).where(
             Contact.user_id == current_user.id,
             Contact.is_primary == True
-        ).update({"is_primary": False})
+        ).values(is_primary=False))
     
     new_contact = Contact(
         user_id=current_user.id,
@@ -42,37 +44,37 @@ async def create_contact(
     )
     
     db.add(new_contact)
-    db.commit()
-    db.refresh(new_contact)
+    await record_contact_added(db, current_user.id)
+    await db.commit()
     
     return new_contact
 
 @router.get("/", response_model=List[ContactResponse])
 async def get_contacts(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all trusted contacts"""
-    contacts = db.query(Contact).filter(Contact.user_id == current_user.id).all()
+    contacts = (await db.scalars(select(Contact).where(Contact.user_id == current_user.id))).all()
     return contacts
 
 @router.post("/open/", response_model=ContactResponse, status_code=status.HTTP_201_CREATED)
 async def create_contact_open(
     contact_data: ContactCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Add a trusted contact without authentication, using the first user in DB (dev/demo use)"""
-    current_user = db.query(User).first()
+    current_user = await db.scalar(select(User).limit(1))
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No user found to attach contact"
         )
 
-    existing_contact = db.query(Contact).filter(
+    existing_contact = await db.scalar(select(Contact).where(
         Contact.user_id == current_user.id,
         Contact.phone == contact_data.phone
-    ).first()
+    ))
 
     if existing_contact:
         raise HTTPException(
@@ -81,10 +83,10 @@ async def create_contact_open(
         )
 
     if contact_data.is_primary:
-        db.query(Contact).filter(
+        await db.execute(update(Contact).where(
             Contact.user_id == current_user.id,
             Contact.is_primary == True
-        ).update({"is_primary": False})
+        ).values(is_primary=False))
 
     new_contact = Contact(
         user_id=current_user.id,
@@ -96,37 +98,37 @@ async def create_contact_open(
     )
 
     db.add(new_contact)
-    db.commit()
-    db.refresh(new_contact)
+    await record_contact_added(db, current_user.id)
+    await db.commit()
 
     return new_contact
 
 @router.get("/open/", response_model=List[ContactResponse])
 async def get_contacts_open(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all trusted contacts without authentication, using the first user in DB (dev/demo use)"""
-    current_user = db.query(User).first()
+    current_user = await db.scalar(select(User).limit(1))
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No user found to read contacts"
         )
 
-    contacts = db.query(Contact).filter(Contact.user_id == current_user.id).all()
+    contacts = (await db.scalars(select(Contact).where(Contact.user_id == current_user.id))).all()
     return contacts
 
 @router.get("/{contact_id}", response_model=ContactResponse)
 async def get_contact(
     contact_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific contact"""
-    contact = db.query(Contact).filter(
+    contact = await db.scalar(select(Contact).where(
         Contact.id == contact_id,
         Contact.user_id == current_user.id
-    ).first()
+    ))
     
     if not contact:
         raise HTTPException(
@@ -141,13 +143,13 @@ async def update_contact(
     contact_id: int,
     contact_update: ContactUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update a contact"""
-    contact = db.query(Contact).filter(
+    contact = await db.scalar(select(Contact).where(
         Contact.id == contact_id,
         Contact.user_id == current_user.id
-    ).first()
+    ))
     
     if not contact:
         raise HTTPException(
@@ -156,11 +158,11 @@ async def update_contact(
         )
     
     if contact_update.is_primary is True:
-        db.query(Contact).filter(
+        await db.execute(update(Contact).where(
             Contact.user_id == current_user.id,
             Contact.id != contact_id,
             Contact.is_primary == True
-        ).update({"is_primary": False})
+        ).values(is_primary=False))
     
     if contact_update.name:
         contact.name = contact_update.name
@@ -173,8 +175,7 @@ async def update_contact(
     if contact_update.is_primary is not None:
         contact.is_primary = contact_update.is_primary
     
-    db.commit()
-    db.refresh(contact)
+    await db.commit()
     
     return contact
 
@@ -182,13 +183,13 @@ async def update_contact(
 async def delete_contact(
     contact_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a contact"""
-    contact = db.query(Contact).filter(
+    contact = await db.scalar(select(Contact).where(
         Contact.id == contact_id,
         Contact.user_id == current_user.id
-    ).first()
+    ))
     
     if not contact:
         raise HTTPException(
@@ -196,35 +197,37 @@ async def delete_contact(
             detail="Contact not found"
         )
     
-    db.delete(contact)
-    db.commit()
+    await db.delete(contact)
+    await record_contact_removed(db, current_user.id)
+    await db.commit()
     
     return None
 
 @router.delete("/open/{contact_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_contact_open(
     contact_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a contact without authentication, using the first user in DB (dev/demo use)"""
-    current_user = db.query(User).first()
+    current_user = await db.scalar(select(User).limit(1))
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No user found to delete contact"
         )
 
-    contact = db.query(Contact).filter(
+    contact = await db.scalar(select(Contact).where(
         Contact.id == contact_id,
         Contact.user_id == current_user.id
-    ).first()
+    ))
 
     if not contact:
       # For dev/demo, return 204 even if contact is missing,
       # so frontend doesn't break if already removed.
       return None
 
-    db.delete(contact)
-    db.commit()
+    await db.delete(contact)
+    await record_contact_removed(db, current_user.id)
+    await db.commit()
 
     return None
@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from starlette.concurrency import run_in_threadpool
+
+from auth import require_debug_token
+from diagnostics import PROFILER_MAX_SECONDS, ProfilerBusy, memory_tracker, profile_process, top_functions
+from query_profiler import QUERY_PROFILING_ENABLED, profile_store
+
+router = APIRouter(dependencies=[Depends(require_debug_token)])
+
+def _require_query_profiling():
+    if not QUERY_PROFILING_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Query profiling is disabled"
+        )
+
+@router.get("/query-profiles", dependencies=[Depends(_require_query_profiling)])
+def get_query_profiles():
+    """Per-route statement counts and the most recent slow or N+1 requests of this process"""
+    return profile_store.snapshot()
+
+@router.delete("/query-profiles", status_code=status.HTTP_204_NO_CONTENT,
+               dependencies=[Depends(_require_query_profiling)])
+def clear_query_profiles():
+    """Reset the profiles, e.g. before reproducing a slow request"""
+    profile_store.clear()
+
+@router.get("/profile")
+async def sample_profile(
+    seconds: float = Query(10, gt=0, le=PROFILER_MAX_SECONDS),
+    interval_ms: float = Query(10, ge=1, le=1000),
+    idle: bool = False,
+    format: str = Query("collapsed", pattern="^(collapsed|top)$")
+):
+    """Sample every thread of this worker for `seconds` and return collapsed stacks or top leaf frames"""
+    try:
+        sampler = await run_in_threadpool(profile_process, seconds, interval_ms / 1000, idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    
+    if format == "top":
+        return {"samples": sampler.samples, "functions": top_functions(sampler.stacks)}
+    return Response(
+        sampler.collapsed(),
+        media_type="text/plain",
+        headers={"X-Profile-Samples": str(sampler.samples)}
+    )
+
+@router.get("/memory")
+def memory_status():
+    """Whether tracemalloc is tracing, and the traced and peak sizes"""
+    return memory_tracker.status()
+
+@router.post("/memory/start")
+def start_memory_tracing(frames: int = Query(1, ge=1, le=25)):
+    """Start tracemalloc and take the baseline snapshot (re-baselines if already tracing)"""
+    return memory_tracker.start(frames)
+
+@router.get("/memory/diff")
+def memory_diff(
+    limit: int = Query(25, ge=1, le=500),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$")
+):
+    """Allocation and object-count growth since the baseline, largest first"""
+    try:
+        return memory_tracker.diff(limit, group_by)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.post("/memory/stop")
+def stop_memory_tracing():
+    """Stop tracemalloc and drop the baseline"""
+    return memory_tracker.stop()
@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from typing import List
+from collections import Counter
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from database import get_db, User, LocationUpdate
-from models import LocationUpdate as LocationUpdateModel, LocationResponse
+from database import get_async_db, User, LocationUpdate
+from models import (
+    LocationUpdate as LocationUpdateModel, LocationResponse, LocationBatch, LocationBatchResponse
+)
 from auth import get_current_user
-from location import get_address_from_coordinates
+from tracking import insert_location_batch, record_location, LOCATION_BATCH_MAX_SIZE
+from trajectory import douglas_peucker
+from pagination import paginate_desc, clamp_limit
 
 router = APIRouter()
 
@@ -13,39 +19,69 @@ router = APIRouter()
 async def update_user_location(
     location_data: LocationUpdateModel,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update user's current location (for tracking)"""
-    address = get_address_from_coordinates(
-        location_data.latitude,
-        location_data.longitude
-    )
-    
-    location_update = LocationUpdate(
+    location_update = await record_location(
+        db,
         user_id=current_user.id,
         latitude=location_data.latitude,
         longitude=location_data.longitude,
-        address=address,
         accuracy=location_data.accuracy,
         speed=location_data.speed,
         heading=location_data.heading
     )
     
-    db.add(location_update)
-    db.commit()
-    db.refresh(location_update)
-    
     return location_update
 
+@router.post("/batch", response_model=LocationBatchResponse)
+async def update_user_location_batch(
+    batch: LocationBatch,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Upload a batch of buffered, timestamped location fixes"""
+    if len(batch.fixes) > LOCATION_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {LOCATION_BATCH_MAX_SIZE} fixes"
+        )
+    
+    results = await insert_location_batch(db, current_user.id, batch.fixes)
+    counts = Counter(result.status for result in results)
+    
+    return LocationBatchResponse(
+        accepted=counts["accepted"],
+        merged=counts["merged"],
+        rejected=counts["rejected"],
+        results=results
+    )
+
 @router.get("/history", response_model=List[LocationResponse])
 async def get_location_history(
+    response: Response,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    tolerance: Optional[float] = Query(None, gt=0, description="Simplification tolerance in meters"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get user's location history"""
-    locations = db.query(LocationUpdate).filter(
-        LocationUpdate.user_id == current_user.id
-    ).order_by(LocationUpdate.timestamp.desc()).limit(limit).all()
+    """Get user's location history, newest first; the X-Next-Cursor header pages further back"""
+    query = select(LocationUpdate).where(LocationUpdate.user_id == current_user.id)
+    try:
+        locations, next_cursor = await paginate_desc(
+            db, query, LocationUpdate.timestamp, LocationUpdate.id, clamp_limit(limit), cursor
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    
+    if tolerance:
+        locations = douglas_peucker(locations, tolerance)
     
     return locations
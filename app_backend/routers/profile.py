@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db, User
+from database import get_async_db, User
 from models import UserProfile, UserProfileUpdate, UserStats
 from auth import get_current_user
+from counters import get_user_counters
 from datetime import datetime
 
 router = APIRouter()
@@ -17,11 +19,14 @@ async def get_profile(current_user: User = Depends(get_current_user)):
 async def update_profile(
     profile_update: UserProfileUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update user profile"""
+    # The authenticated principal may be a cached snapshot; edit the session's copy
+    current_user = await db.get(User, current_user.id)
+    
     if profile_update.email and profile_update.email != current_user.email:
-        existing_user = db.query(User).filter(User.email == profile_update.email).first()
+        existing_user = await db.scalar(select(User).where(User.email == profile_update.email).limit(1))
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -36,33 +41,21 @@ async def update_profile(
         current_user.codeword = profile_update.codeword.lower().strip()
     
     current_user.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
     
     return current_user
 
 @router.get("/stats", response_model=UserStats)
 async def get_user_stats(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get user statistics"""
-    from database import Alert, Contact
-    
-    total_alerts = db.query(Alert).filter(Alert.user_id == current_user.id).count()
-    active_alerts = db.query(Alert).filter(
-        Alert.user_id == current_user.id,
-        Alert.status == "active"
-    ).count()
-    total_contacts = db.query(Contact).filter(Contact.user_id == current_user.id).count()
-    
-    last_alert = db.query(Alert).filter(
-        Alert.user_id == current_user.id
-    ).order_by(Alert.created_at.desc()).first()
+    counters = await get_user_counters(db, current_user.id)
     
     return UserStats(
-        total_alerts=total_alerts,
-        active_alerts=active_alerts,
-        total_contacts=total_contacts,
-        last_alert_at=last_alert.created_at if last_alert else None
+        total_alerts=counters.total_alerts,
+        active_alerts=counters.active_alerts,
+        total_contacts=counters.total_contacts,
+        last_alert_at=counters.last_alert_at
     )
@@ -1,45 +1,69 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
+from collections import Counter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, BackgroundTasks
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 
-from database import get_db, User, Alert, Contact
+from database import get_async_db, User, Alert, Contact
 from models import (
     AlertCreate, AlertResponse, AlertUpdate, AlertListResponse,
     LocationUpdate, LocationResponse, EscalationRequest, EscalationResponse,
-    VoiceCodeWordDetection
+    VoiceCodeWordDetection, LocationBatch, LocationBatchResponse,
+    NearbyAlert, Incident, NearbyAlertsResponse
 )
-from auth import get_current_user
+from auth import get_current_user, require_dispatcher_token
 from sos import (
-    create_sos_alert, update_alert_location, resolve_alert,
-    escalate_alert, get_alert_location_history
+    create_sos_alert, enrich_alert_address, update_alert_location, resolve_alert,
+    escalate_alert, get_alert_location_history, publish_alert_status
 )
-from notify import notify_trusted_contacts, notify_authorities
+from streaming import alert_stream_hub, format_event
+from history_export import EXPORT_FORMATS, export_filename, export_location_history
+from counters import record_alert_status_change
+from pagination import paginate_desc, clamp_limit
+from tracking import insert_location_batch, LOCATION_BATCH_MAX_SIZE
 from location import generate_google_maps_link
+from metrics import tracked_task
+from spatial_index import (
+    active_alert_index, group_incidents, NEARBY_MAX_RADIUS_KM, NEARBY_MAX_RESULTS
+)
 
 router = APIRouter()
 
-def process_alert_notifications(db: Session, user: User, alert: Alert):
-    """Background task to send notifications"""
-    # Notify trusted contacts
-    notify_trusted_contacts(db, user, alert)
-    
-    # Auto-escalate critical/high severity alerts to authorities
-    if alert.severity in ["high", "critical"]:
-        notify_authorities(db, user, alert, "police_112")
+# Alert rows come back from typed columns, so they are serialized straight to JSON
+# instead of being built into AlertResponse models and re-validated against response_model
+_ALERT_FIELDS = list(AlertResponse.model_fields)
+
+def alert_payload(alert: Alert) -> dict:
+    """An alert row in AlertResponse shape, including the computed google_maps_link"""
+    loaded = alert.__dict__
+    payload = {key: loaded[key] if key in loaded else getattr(alert, key) for key in _ALERT_FIELDS}
+    payload["google_maps_link"] = generate_google_maps_link(payload["latitude"], payload["longitude"])
+    return payload
+
+def alert_response(alert: Alert, status_code: int = status.HTTP_200_OK) -> ORJSONResponse:
+    return ORJSONResponse(alert_payload(alert), status_code=status_code)
+
+def alert_list_response(alerts: List[Alert], total: Optional[int], next_cursor: Optional[str]) -> ORJSONResponse:
+    return ORJSONResponse({
+        "alerts": [alert_payload(alert) for alert in alerts],
+        "total": total,
+        "next_cursor": next_cursor
+    })
 
 @router.post("/trigger", response_model=AlertResponse, status_code=status.HTTP_201_CREATED)
 async def trigger_sos(
     alert_data: AlertCreate,
     background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Trigger an SOS alert"""
-    # Create the alert
-    alert = create_sos_alert(
+    # Create the alert and queue its notifications for the outbox workers
+    alert = await create_sos_alert(
         db=db,
-        user_id=current_user.id,
+        user=current_user,
         latitude=alert_data.latitude,
         longitude=alert_data.longitude,
         severity=alert_data.severity.value,
@@ -47,25 +71,10 @@ async def trigger_sos(
         notes=alert_data.notes
     )
     
-    # Send notifications in background
-    background_tasks.add_task(process_alert_notifications, db, current_user, alert)
-    
-    # Add Google Maps link to response
-    response_data = AlertResponse(
-        id=alert.id,
-        user_id=alert.user_id,
-        latitude=alert.latitude,
-        longitude=alert.longitude,
-        address=alert.address,
-        status=alert.status,
-        severity=alert.severity,
-        triggered_by=alert.triggered_by,
-        created_at=alert.created_at,
-        resolved_at=alert.resolved_at,
-        google_maps_link=generate_google_maps_link(alert.latitude, alert.longitude)
-    )
+    # Back-fill the address after the response is sent
+    background_tasks.add_task(tracked_task("enrich_alert_address", enrich_alert_address), alert.id)
     
-    return response_data
+    return alert_response(alert, status.HTTP_201_CREATED)
 
 @router.post("/voice-trigger", response_model=AlertResponse, status_code=status.HTTP_201_CREATED)
 async def trigger_sos_by_voice(
@@ -73,7 +82,7 @@ async def trigger_sos_by_voice(
     alert_data: AlertCreate,
     background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Trigger SOS alert via voice code word detection"""
     # Verify code word matches user's codeword
@@ -93,10 +102,10 @@ async def trigger_sos_by_voice(
             detail="Voice detection confidence too low"
         )
     
-    # Create alert with voice trigger
-    alert = create_sos_alert(
+    # Create alert with voice trigger and queue its notifications
+    alert = await create_sos_alert(
         db=db,
-        user_id=current_user.id,
+        user=current_user,
         latitude=alert_data.latitude,
         longitude=alert_data.longitude,
         severity=alert_data.severity.value,
@@ -104,37 +113,23 @@ async def trigger_sos_by_voice(
         notes=f"Triggered by voice code word (confidence: {voice_data.confidence:.2f})"
     )
     
-    # Send notifications in background
-    background_tasks.add_task(process_alert_notifications, db, current_user, alert)
-    
-    response_data = AlertResponse(
-        id=alert.id,
-        user_id=alert.user_id,
-        latitude=alert.latitude,
-        longitude=alert.longitude,
-        address=alert.address,
-        status=alert.status,
-        severity=alert.severity,
-        triggered_by=alert.triggered_by,
-        created_at=alert.created_at,
-        resolved_at=alert.resolved_at,
-        google_maps_link=generate_google_maps_link(alert.latitude, alert.longitude)
-    )
+    # Back-fill the address after the response is sent
+    background_tasks.add_task(tracked_task("enrich_alert_address", enrich_alert_address), alert.id)
     
-    return response_data
+    return alert_response(alert, status.HTTP_201_CREATED)
 
 @router.post("/{alert_id}/location", response_model=LocationResponse)
 async def update_location(
     alert_id: int,
     location_data: LocationUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update location for an active alert"""
-    alert = db.query(Alert).filter(
+    alert = await db.scalar(select(Alert).where(
         Alert.id == alert_id,
         Alert.user_id == current_user.id
-    ).first()
+    ))
     
     if not alert:
         raise HTTPException(
@@ -148,7 +143,7 @@ async def update_location(
             detail="Alert is not active"
         )
     
-    location_update = update_alert_location(
+    location_update = await update_alert_location(
         db=db,
         alert_id=alert_id,
         latitude=location_data.latitude,
@@ -160,53 +155,132 @@ async def update_location(
     
     return location_update
 
+@router.post("/{alert_id}/location/batch", response_model=LocationBatchResponse)
+async def update_location_batch(
+    alert_id: int,
+    batch: LocationBatch,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Upload a batch of buffered location fixes for an active alert"""
+    if len(batch.fixes) > LOCATION_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {LOCATION_BATCH_MAX_SIZE} fixes"
+        )
+    
+    alert = await db.scalar(select(Alert).where(
+        Alert.id == alert_id,
+        Alert.user_id == current_user.id
+    ))
+    
+    if not alert:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Alert not found"
+        )
+    
+    if alert.status != "active":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Alert is not active"
+        )
+    
+    results = await insert_location_batch(db, current_user.id, batch.fixes, alert_id=alert_id)
+    counts = Counter(result.status for result in results)
+    
+    return LocationBatchResponse(
+        accepted=counts["accepted"],
+        merged=counts["merged"],
+        rejected=counts["rejected"],
+        results=results
+    )
+
 @router.get("/", response_model=AlertListResponse)
 async def get_alerts(
     status_filter: Optional[str] = None,
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all alerts for current user"""
-    query = db.query(Alert).filter(Alert.user_id == current_user.id)
+    """Get alerts for current user, newest first; pass next_cursor back as cursor for the next page"""
+    query = select(Alert).where(Alert.user_id == current_user.id)
     
     if status_filter:
-        query = query.filter(Alert.status == status_filter)
-    
-    total = query.count()
-    alerts = query.order_by(Alert.created_at.desc()).offset(offset).limit(limit).all()
-    
-    alert_responses = [
-        AlertResponse(
-            id=alert.id,
-            user_id=alert.user_id,
-            latitude=alert.latitude,
-            longitude=alert.longitude,
-            address=alert.address,
-            status=alert.status,
-            severity=alert.severity,
-            triggered_by=alert.triggered_by,
-            created_at=alert.created_at,
-            resolved_at=alert.resolved_at,
-            google_maps_link=generate_google_maps_link(alert.latitude, alert.longitude)
+        query = query.where(Alert.status == status_filter)
+    
+    total = await db.scalar(select(func.count()).select_from(query.subquery())) if include_total else None
+    try:
+        alerts, next_cursor = await paginate_desc(
+            db, query, Alert.created_at, Alert.id, clamp_limit(limit), cursor, offset
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return alert_list_response(alerts, total, next_cursor)
+
+@router.get("/nearby", response_model=NearbyAlertsResponse, dependencies=[Depends(require_dispatcher_token)])
+async def get_nearby_alerts(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(2.0, gt=0, le=NEARBY_MAX_RADIUS_KM),
+    limit: int = Query(50, ge=1, le=NEARBY_MAX_RESULTS)
+):
+    """Active and escalated alerts of all users near a point, nearest first, grouped into incidents.
+
+    Exposes other users' live locations, so it is for dispatch consoles
+    holding DISPATCHER_TOKEN, not for app users.
+    """
+    found = active_alert_index.nearby(latitude, longitude, radius_km, limit)
+    
+    incidents = []
+    incident_of = {}
+    for group in group_incidents([entry for entry, _ in found]):
+        incident_id = group[0].id
+        for entry in group:
+            incident_of[entry.id] = incident_id
+        incidents.append(Incident(
+            id=incident_id,
+            alert_ids=[entry.id for entry in group],
+            latitude=sum(entry.latitude for entry in group) / len(group),
+            longitude=sum(entry.longitude for entry in group) / len(group),
+            first_triggered_at=group[0].created_at,
+            last_triggered_at=group[-1].created_at
+        ))
+    
+    alerts = [
+        NearbyAlert(
+            id=entry.id,
+            latitude=entry.latitude,
+            longitude=entry.longitude,
+            distance_km=round(distance_km, 3),
+            status=entry.status,
+            severity=entry.severity,
+            created_at=entry.created_at,
+            incident_id=incident_of[entry.id]
         )
-        for alert in alerts
+        for entry, distance_km in found
     ]
     
-    return AlertListResponse(alerts=alert_responses, total=total)
+    return NearbyAlertsResponse(alerts=alerts, incidents=incidents)
 
 @router.get("/{alert_id}", response_model=AlertResponse)
 async def get_alert(
     alert_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific alert"""
-    alert = db.query(Alert).filter(
+    alert = await db.scalar(select(Alert).where(
         Alert.id == alert_id,
         Alert.user_id == current_user.id
-    ).first()
+    ))
     
     if not alert:
         raise HTTPException(
@@ -214,31 +288,69 @@ async def get_alert(
             detail="Alert not found"
         )
     
-    return AlertResponse(
-        id=alert.id,
-        user_id=alert.user_id,
-        latitude=alert.latitude,
-        longitude=alert.longitude,
-        address=alert.address,
-        status=alert.status,
-        severity=alert.severity,
-        triggered_by=alert.triggered_by,
-        created_at=alert.created_at,
-        resolved_at=alert.resolved_at,
-        google_maps_link=generate_google_maps_link(alert.latitude, alert.longitude)
-    )
+    return alert_response(alert)
 
 @router.get("/{alert_id}/location-history")
 async def get_location_history(
     alert_id: int,
+    tolerance: Optional[float] = Query(None, gt=0, description="Simplification tolerance in meters"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get location history for an alert"""
-    alert = db.query(Alert).filter(
+    alert = await db.scalar(select(Alert).where(
+        Alert.id == alert_id,
+        Alert.user_id == current_user.id
+    ))
+    
+    if not alert:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Alert not found"
+        )
+    
+    history, summary = await get_alert_location_history(db, alert_id, tolerance)
+    return {"alert_id": alert_id, "location_history": history, "total_points": len(history), "summary": summary}
+
+@router.get("/{alert_id}/location-history/export")
+async def export_location_history_endpoint(
+    alert_id: int,
+    export_format: str = Query("ndjson", alias="format", pattern=f"^({'|'.join(EXPORT_FORMATS)})$"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Stream an alert's full location history as NDJSON, GeoJSON or GPX"""
+    alert = await db.scalar(select(Alert).where(
+        Alert.id == alert_id,
+        Alert.user_id == current_user.id
+    ))
+    
+    if not alert:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Alert not found"
+        )
+    
+    # The export reads through its own session; don't hold this one for the whole download
+    await db.close()
+    return StreamingResponse(
+        export_location_history(alert_id, export_format),
+        media_type=EXPORT_FORMATS[export_format].media_type,
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(alert_id, export_format)}"'}
+    )
+
+@router.get("/{alert_id}/stream")
+async def stream_alert(
+    alert_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Stream new location points and status changes for an alert (Server-Sent Events)"""
+    alert = await db.scalar(select(Alert).where(
         Alert.id == alert_id,
         Alert.user_id == current_user.id
-    ).first()
+    ))
     
     if not alert:
         raise HTTPException(
@@ -246,44 +358,49 @@ async def get_location_history(
             detail="Alert not found"
         )
     
-    history = get_alert_location_history(db, alert_id)
-    return {"alert_id": alert_id, "location_history": history, "total_points": len(history)}
+    subscription = alert_stream_hub.subscribe(alert_id)
+    if subscription is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many live subscribers, try again later"
+        )
+    
+    initial = format_event("status", {"alert_id": alert.id, "status": alert.status, "severity": alert.severity})
+    # Hand the connection back to the pool; the stream itself never touches the database
+    await db.close()
+    if alert.status in ["resolved", "cancelled"]:
+        alert_stream_hub.unsubscribe(subscription)
+        return StreamingResponse(iter([initial]), media_type="text/event-stream")
+    
+    return StreamingResponse(
+        alert_stream_hub.stream(subscription, request.is_disconnected, initial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.put("/{alert_id}/resolve", response_model=AlertResponse)
 async def resolve_alert_endpoint(
     alert_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Mark an alert as resolved"""
-    alert = resolve_alert(db, alert_id, current_user.id)
-    
-    return AlertResponse(
-        id=alert.id,
-        user_id=alert.user_id,
-        latitude=alert.latitude,
-        longitude=alert.longitude,
-        address=alert.address,
-        status=alert.status,
-        severity=alert.severity,
-        triggered_by=alert.triggered_by,
-        created_at=alert.created_at,
-        resolved_at=alert.resolved_at,
-        google_maps_link=generate_google_maps_link(alert.latitude, alert.longitude)
-    )
+    alert = await resolve_alert(db, alert_id, current_user.id)
+    
+    return alert_response(alert)
 
 @router.put("/{alert_id}", response_model=AlertResponse)
 async def update_alert(
     alert_id: int,
     alert_update: AlertUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update an alert"""
-    alert = db.query(Alert).filter(
+    alert = await db.scalar(select(Alert).where(
         Alert.id == alert_id,
         Alert.user_id == current_user.id
-    ).first()
+    ))
     
     if not alert:
         raise HTTPException(
@@ -292,6 +409,7 @@ async def update_alert(
         )
     
     if alert_update.status:
+        await record_alert_status_change(db, alert.user_id, alert.status, alert_update.status.value)
         alert.status = alert_update.status.value
         if alert_update.status.value == "resolved":
             alert.resolved_at = datetime.utcnow()
@@ -302,36 +420,24 @@ async def update_alert(
     if alert_update.notes:
         alert.notes = alert_update.notes
     
-    db.commit()
-    db.refresh(alert)
-    
-    return AlertResponse(
-        id=alert.id,
-        user_id=alert.user_id,
-        latitude=alert.latitude,
-        longitude=alert.longitude,
-        address=alert.address,
-        status=alert.status,
-        severity=alert.severity,
-        triggered_by=alert.triggered_by,
-        created_at=alert.created_at,
-        resolved_at=alert.resolved_at,
-        google_maps_link=generate_google_maps_link(alert.latitude, alert.longitude)
-    )
+    await db.commit()
+    active_alert_index.update(alert)
+    publish_alert_status(alert)
+    
+    return alert_response(alert)
 
 @router.post("/{alert_id}/escalate", response_model=EscalationResponse)
 async def escalate_alert_endpoint(
     alert_id: int,
     escalation_data: EscalationRequest,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Escalate an alert to authorities"""
-    alert = db.query(Alert).filter(
+    alert = await db.scalar(select(Alert).where(
         Alert.id == alert_id,
         Alert.user_id == current_user.id
-    ).first()
+    ))
     
     if not alert:
         raise HTTPException(
@@ -339,16 +445,14 @@ async def escalate_alert_endpoint(
             detail="Alert not found"
         )
     
-    escalation = escalate_alert(
+    escalation = await escalate_alert(
         db=db,
+        user=current_user,
         alert_id=alert_id,
         escalated_to=escalation_data.escalated_to,
         severity=escalation_data.severity.value
     )
     
-    # Notify authorities in background
-    background_tasks.add_task(notify_authorities, db, current_user, alert, escalation_data.escalated_to)
-    
     return EscalationResponse(
         id=escalation.id,
         alert_id=escalation.alert_id,
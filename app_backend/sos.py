@@ -1,58 +1,99 @@
 """
 SOS Alert System - Core emergency alert functionality
 """
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Tuple
 
-from database import Alert, LocationUpdate, EmergencyEscalation, SeverityLevel, AlertStatus
+from database import (
+    AsyncSessionLocal, Alert, LocationUpdate, LocationArchive, EmergencyEscalation, AlertStatus, User
+)
 from location import get_address_from_coordinates
-from notify import notify_trusted_contacts, notify_authorities
+from tracking import record_location, location_to_dict
+from trajectory import douglas_peucker, trajectory_summary
+from streaming import alert_stream_hub
+from counters import record_alert_created, record_alert_status_change
+from spatial_index import active_alert_index
+from history_export import load_archive
+from outbox import add_alert_notifications, add_sos_notifications, wake_workers
 
-def create_sos_alert(
-    db: Session,
-    user_id: int,
+async def create_sos_alert(
+    db: AsyncSession,
+    user: User,
     latitude: float,
     longitude: float,
     severity: str = "medium",
     triggered_by: str = "voice",
     notes: Optional[str] = None
 ) -> Alert:
-    """Create a new SOS alert"""
-    # Get address from coordinates
-    address = get_address_from_coordinates(latitude, longitude)
+    """Create a new SOS alert.
+
+    The alert, its first location point and its outbox notifications are
+    written in a single transaction without reverse geocoding; call
+    enrich_alert_address afterwards to back-fill the address.
+    """
+    now = datetime.utcnow()
     
-    # Create alert
     alert = Alert(
-        user_id=user_id,
+        user_id=user.id,
         latitude=latitude,
         longitude=longitude,
-        address=address,
         severity=severity,
         triggered_by=triggered_by,
         status=AlertStatus.ACTIVE.value,
+        created_at=now,
         notes=notes
     )
     
-    db.add(alert)
-    db.commit()
-    db.refresh(alert)
-    
-    # Create initial location update
-    location_update = LocationUpdate(
-        user_id=user_id,
-        alert_id=alert.id,
+    # Create initial location update in the same transaction
+    alert.location_updates.append(LocationUpdate(
+        user_id=user.id,
         latitude=latitude,
         longitude=longitude,
-        address=address
-    )
-    db.add(location_update)
-    db.commit()
+        timestamp=now
+    ))
+    
+    db.add(alert)
+    await record_alert_created(db, alert)
+    await add_sos_notifications(db, user, alert)
+    await db.commit()
+    wake_workers()
+    active_alert_index.update(alert)
     
     return alert
 
-def update_alert_location(
-    db: Session,
+async def enrich_alert_address(alert_id: int):
+    """Deferred stage: reverse geocode a new alert and back-fill its address"""
+    async with AsyncSessionLocal() as db:
+        try:
+            alert = await db.get(Alert, alert_id)
+            if not alert or alert.address:
+                return
+            
+            # The geocoder is a blocking HTTP client: give the connection back
+            # to the pool and keep the call off the event loop
+            await db.commit()
+            address = await run_in_threadpool(get_address_from_coordinates, alert.latitude, alert.longitude)
+            if not address:
+                return
+            
+            alert.address = address
+            await db.execute(
+                update(LocationUpdate).where(
+                    LocationUpdate.alert_id == alert_id,
+                    LocationUpdate.latitude == alert.latitude,
+                    LocationUpdate.longitude == alert.longitude,
+                    LocationUpdate.address.is_(None)
+                ).values(address=address)
+            )
+            await db.commit()
+        except Exception as e:
+            print(f"Error enriching alert {alert_id} address: {e}")
+
+async def update_alert_location(
+    db: AsyncSession,
     alert_id: int,
     latitude: float,
     longitude: float,
@@ -61,62 +102,76 @@ def update_alert_location(
     heading: Optional[float] = None
 ) -> LocationUpdate:
     """Update location for an active alert"""
-    alert = db.query(Alert).filter(Alert.id == alert_id).first()
+    alert = await db.get(Alert, alert_id)
     if not alert:
         raise ValueError("Alert not found")
     
     if alert.status != AlertStatus.ACTIVE.value:
         raise ValueError("Alert is not active")
     
-    address = get_address_from_coordinates(latitude, longitude)
-    
-    location_update = LocationUpdate(
+    location_update = await record_location(
+        db,
         user_id=alert.user_id,
         alert_id=alert_id,
         latitude=latitude,
         longitude=longitude,
-        address=address,
         accuracy=accuracy,
         speed=speed,
         heading=heading
     )
     
-    db.add(location_update)
-    db.commit()
-    db.refresh(location_update)
+    alert_stream_hub.publish(alert_id, "location", location_to_dict(location_update))
+    active_alert_index.move(alert_id, location_update.latitude, location_update.longitude, location_update.timestamp)
     
     return location_update
 
-def resolve_alert(
-    db: Session,
+def publish_alert_status(alert: Alert):
+    """Push an alert's status to live subscribers, ending their streams once it is over"""
+    data = {
+        "alert_id": alert.id,
+        "status": alert.status,
+        "severity": alert.severity,
+        "resolved_at": alert.resolved_at.isoformat() if alert.resolved_at else None,
+        "escalated_at": alert.escalated_at.isoformat() if alert.escalated_at else None
+    }
+    if alert.status in [AlertStatus.RESOLVED.value, AlertStatus.CANCELLED.value]:
+        alert_stream_hub.close(alert.id, "status", data)
+    else:
+        alert_stream_hub.publish(alert.id, "status", data)
+
+async def resolve_alert(
+    db: AsyncSession,
     alert_id: int,
     user_id: int
 ) -> Alert:
     """Mark an alert as resolved"""
-    alert = db.query(Alert).filter(
+    alert = await db.scalar(select(Alert).where(
         Alert.id == alert_id,
         Alert.user_id == user_id
-    ).first()
+    ))
     
     if not alert:
         raise ValueError("Alert not found")
     
+    await record_alert_status_change(db, alert.user_id, alert.status, AlertStatus.RESOLVED.value)
     alert.status = AlertStatus.RESOLVED.value
     alert.resolved_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(alert)
+    await db.commit()
+    active_alert_index.update(alert)
+    publish_alert_status(alert)
     
     return alert
 
-def escalate_alert(
-    db: Session,
+async def escalate_alert(
+    db: AsyncSession,
+    user: User,
     alert_id: int,
     escalated_to: str = "police_112",
     severity: str = "critical"
 ) -> EmergencyEscalation:
-    """Escalate an alert to authorities"""
-    alert = db.query(Alert).filter(Alert.id == alert_id).first()
+    """Escalate an alert to authorities, queueing their notification in the same transaction"""
+    alert = await db.get(Alert, alert_id)
     if not alert:
         raise ValueError("Alert not found")
     
@@ -139,32 +194,41 @@ def escalate_alert(
     
     # Update alert status
     if alert.status != AlertStatus.ESCALATED.value:
+        await record_alert_status_change(db, alert.user_id, alert.status, AlertStatus.ESCALATED.value)
         alert.status = AlertStatus.ESCALATED.value
         alert.escalated_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(escalation)
+    await add_alert_notifications(db, user, alert, notify_contacts=False, authority_type=escalated_to)
+    await db.commit()
+    wake_workers()
+    active_alert_index.update(alert)
+    publish_alert_status(alert)
     
     return escalation
 
-def get_alert_location_history(
-    db: Session,
-    alert_id: int
-) -> list:
-    """Get location history for an alert"""
-    location_updates = db.query(LocationUpdate).filter(
-        LocationUpdate.alert_id == alert_id
-    ).order_by(LocationUpdate.timestamp.asc()).all()
-    
-    return [
-        {
-            "latitude": loc.latitude,
-            "longitude": loc.longitude,
-            "address": loc.address,
-            "timestamp": loc.timestamp.isoformat(),
-            "accuracy": loc.accuracy,
-            "speed": loc.speed,
-            "heading": loc.heading
-        }
-        for loc in location_updates
-    ]
+async def get_alert_location_history(
+    db: AsyncSession,
+    alert_id: int,
+    tolerance_m: Optional[float] = None
+) -> Tuple[list, dict]:
+    """Get location history for an alert, optionally simplified to a tolerance in meters,
+    and a trajectory summary computed over the full history"""
+    archive = await db.get(LocationArchive, alert_id)
+    if archive is not None:
+        # Archived by the retention job: points are already location_history entries
+        await db.commit()
+        points = await run_in_threadpool(load_archive, archive.path)
+        summary = trajectory_summary(points)
+        return (douglas_peucker(points, tolerance_m) if tolerance_m else points), summary
+    
+    location_updates = (await db.scalars(
+        select(LocationUpdate)
+        .where(LocationUpdate.alert_id == alert_id)
+        .order_by(LocationUpdate.timestamp.asc())
+    )).all()
+    
+    summary = trajectory_summary(location_updates)
+    if tolerance_m:
+        location_updates = douglas_peucker(location_updates, tolerance_m)
+    
+    return [location_to_dict(loc) for loc in location_updates], summary
@@ -0,0 +1,274 @@
+"""
+In-memory spatial index of active alerts - nearby-alert queries and space-time incident grouping
+"""
+import os
+import threading
+from math import asin, cos, floor, pi, radians, sin, sqrt
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from database import SessionLocal, Alert, AlertStatus, LocationUpdate
+
+# Grid cell edge; queries visit the cells overlapping the search circle
+ALERT_INDEX_CELL_KM = float(os.getenv("ALERT_INDEX_CELL_KM", 1.0))
+NEARBY_MAX_RADIUS_KM = float(os.getenv("NEARBY_MAX_RADIUS_KM", 25))
+NEARBY_MAX_RESULTS = int(os.getenv("NEARBY_MAX_RESULTS", 200))
+# Alerts closer than this in space and in trigger time are grouped as one incident
+INCIDENT_RADIUS_KM = float(os.getenv("INCIDENT_RADIUS_KM", 0.5))
+INCIDENT_WINDOW_SECONDS = float(os.getenv("INCIDENT_WINDOW_SECONDS", 900))
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE = 111.195
+
+# Alerts in these states are still ongoing and stay in the index
+INDEXED_STATUSES = {AlertStatus.ACTIVE.value, AlertStatus.ESCALATED.value}
+
+class IndexedAlert:
+    """Current position and summary of one indexed alert"""
+
+    __slots__ = ("id", "user_id", "latitude", "longitude", "cos_lat", "cell",
+                 "status", "severity", "created_at", "updated_at")
+
+    def __init__(self, id: int, user_id: int, latitude: float, longitude: float,
+                 status: str, severity: str, created_at, updated_at):
+        self.id = id
+        self.user_id = user_id
+        self.status = status
+        self.severity = severity
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.latitude = latitude
+        self.longitude = longitude
+        self.cos_lat = cos(radians(latitude))
+        self.cell = None
+
+class ActiveAlertIndex:
+    """Thread-safe uniform lat/lon grid of alert positions.
+
+    Cells are ``cell_km`` tall and ``cell_km`` wide at the equator (narrower
+    towards the poles), keyed by (row, column) in a dict so only populated
+    cells take memory. A radius query checks the cells overlapping the
+    circle's bounding box, or every populated cell when that is fewer, and
+    filters candidates by haversine distance.
+    """
+
+    def __init__(self, cell_km: float = ALERT_INDEX_CELL_KM):
+        self.cell_deg = cell_km / KM_PER_DEGREE
+        self.rows = int(180 / self.cell_deg) + 1
+        self.columns = int(360 / self.cell_deg) + 1
+        self._alerts: Dict[int, IndexedAlert] = {}
+        self._cells: Dict[Tuple[int, int], Set[int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+    def _cell_of(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        row = min(int((latitude + 90) / self.cell_deg), self.rows - 1)
+        column = int((longitude + 180) / self.cell_deg) % self.columns
+        return row, column
+
+    def _place(self, entry: IndexedAlert):
+        cell = self._cell_of(entry.latitude, entry.longitude)
+        if cell == entry.cell:
+            return
+        if entry.cell is not None:
+            self._discard_from_cell(entry)
+        entry.cell = cell
+        self._cells.setdefault(cell, set()).add(entry.id)
+
+    def _discard_from_cell(self, entry: IndexedAlert):
+        members = self._cells.get(entry.cell)
+        if members is not None:
+            members.discard(entry.id)
+            if not members:
+                del self._cells[entry.cell]
+
+    def update(self, alert: Alert):
+        """Index, refresh or drop an alert after its row was committed.
+
+        A new alert is placed at its trigger point; for an alert already in
+        the index only status and severity are refreshed, so its tracked
+        position (see ``move``) is kept.
+        """
+        with self._lock:
+            entry = self._alerts.get(alert.id)
+            if alert.status not in INDEXED_STATUSES:
+                if entry is not None:
+                    self._discard_from_cell(entry)
+                    del self._alerts[alert.id]
+                return
+            if entry is None:
+                entry = IndexedAlert(alert.id, alert.user_id, alert.latitude, alert.longitude,
+                                     alert.status, alert.severity, alert.created_at, alert.created_at)
+                self._alerts[alert.id] = entry
+                self._place(entry)
+            else:
+                entry.status = alert.status
+                entry.severity = alert.severity
+
+    def move(self, alert_id: int, latitude: float, longitude: float, at):
+        """Record a new position for an indexed alert; fixes older than the current one are ignored"""
+        with self._lock:
+            entry = self._alerts.get(alert_id)
+            if entry is None or at < entry.updated_at:
+                return
+            entry.latitude = latitude
+            entry.longitude = longitude
+            entry.cos_lat = cos(radians(latitude))
+            entry.updated_at = at
+            self._place(entry)
+
+    def remove(self, alert_id: int):
+        with self._lock:
+            entry = self._alerts.pop(alert_id, None)
+            if entry is not None:
+                self._discard_from_cell(entry)
+
+    def replace(self, entries: List[IndexedAlert]):
+        """Swap in a freshly loaded set of alerts"""
+        alerts = {}
+        cells: Dict[Tuple[int, int], Set[int]] = {}
+        for entry in entries:
+            entry.cell = self._cell_of(entry.latitude, entry.longitude)
+            alerts[entry.id] = entry
+            cells.setdefault(entry.cell, set()).add(entry.id)
+        with self._lock:
+            self._alerts = alerts
+            self._cells = cells
+
+    def nearby(self, latitude: float, longitude: float, radius_km: float,
+               limit: Optional[int] = None) -> List[Tuple[IndexedAlert, float]]:
+        """Alerts within radius_km of a point as (alert, distance_km), nearest first"""
+        lat_span = radius_km / KM_PER_DEGREE
+        # Longitude span at the band edge closest to a pole, where degrees are shortest
+        edge_cos = cos(radians(min(90.0, abs(latitude) + lat_span)))
+        lon_span = radius_km / (KM_PER_DEGREE * edge_cos) if edge_cos > 1e-9 else 360.0
+
+        row_lo = max(0, floor((latitude - lat_span + 90) / self.cell_deg))
+        row_hi = min(self.rows - 1, floor((latitude + lat_span + 90) / self.cell_deg))
+        if lon_span >= 180:
+            column_lo, column_hi = 0, self.columns - 1
+        else:
+            column_lo = floor((longitude - lon_span + 180) / self.cell_deg)
+            column_hi = floor((longitude + lon_span + 180) / self.cell_deg)
+        box_cells = (row_hi - row_lo + 1) * (column_hi - column_lo + 1)
+
+        lat1 = radians(latitude)
+        cos_lat1 = cos(lat1)
+        # Compare haversine terms instead of distances to skip asin/sqrt per candidate
+        max_h = sin(min(radius_km / EARTH_RADIUS_KM, pi) / 2) ** 2
+        found = []
+
+        with self._lock:
+            if box_cells >= len(self._cells):
+                candidate_sets = [
+                    members for (row, column), members in self._cells.items()
+                    if row_lo <= row <= row_hi
+                ]
+            else:
+                cells = self._cells
+                columns = self.columns
+                candidate_sets = []
+                for row in range(row_lo, row_hi + 1):
+                    for column in range(column_lo, column_hi + 1):
+                        members = cells.get((row, column % columns))
+                        if members:
+                            candidate_sets.append(members)
+
+            alerts = self._alerts
+            seen = set()
+            for members in candidate_sets:
+                for alert_id in members:
+                    if alert_id in seen:
+                        continue
+                    seen.add(alert_id)
+                    entry = alerts[alert_id]
+                    d_lat = radians(entry.latitude) - lat1
+                    d_lon = radians(entry.longitude - longitude)
+                    h = sin(d_lat / 2) ** 2 + cos_lat1 * entry.cos_lat * sin(d_lon / 2) ** 2
+                    if h <= max_h:
+                        found.append((h, entry))
+
+        found.sort(key=lambda item: item[0])
+        if limit is not None:
+            found = found[:limit]
+        return [(entry, 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(h)))) for h, entry in found]
+
+    def stats(self) -> dict:
+        return {
+            "alerts": len(self._alerts),
+            "cells": len(self._cells),
+            "cell_km": ALERT_INDEX_CELL_KM,
+        }
+
+def _distance_km(a: IndexedAlert, b: IndexedAlert) -> float:
+    d_lat = radians(b.latitude - a.latitude)
+    d_lon = radians(b.longitude - a.longitude)
+    h = sin(d_lat / 2) ** 2 + a.cos_lat * b.cos_lat * sin(d_lon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(h)))
+
+def group_incidents(alerts: List[IndexedAlert], radius_km: float = INCIDENT_RADIUS_KM,
+                    window_seconds: float = INCIDENT_WINDOW_SECONDS) -> List[List[IndexedAlert]]:
+    """Group alerts into incidents: single-linkage over pairs triggered within
+    radius_km and window_seconds of each other. Each group is ordered by
+    trigger time; groups are ordered by their first alert."""
+    ordered = sorted(alerts, key=lambda alert: alert.created_at)
+    parent = list(range(len(ordered)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Sweep in trigger order so only alerts inside the time window are compared
+    for i, alert in enumerate(ordered):
+        for j in range(i + 1, len(ordered)):
+            other = ordered[j]
+            if (other.created_at - alert.created_at).total_seconds() > window_seconds:
+                break
+            if _distance_km(alert, other) <= radius_km:
+                parent[find(j)] = find(i)
+
+    groups: Dict[int, List[IndexedAlert]] = {}
+    for i, alert in enumerate(ordered):
+        groups.setdefault(find(i), []).append(alert)
+    return list(groups.values())
+
+active_alert_index = ActiveAlertIndex()
+
+def rebuild_active_alert_index(index: ActiveAlertIndex = active_alert_index) -> int:
+    """Load ongoing alerts at their latest tracked position; returns how many were indexed"""
+    latest_point = select(LocationUpdate.id).where(
+        LocationUpdate.alert_id == Alert.id
+    ).order_by(LocationUpdate.timestamp.desc(), LocationUpdate.id.desc()).limit(1).correlate(Alert).scalar_subquery()
+
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(
+                Alert.id, Alert.user_id, Alert.latitude, Alert.longitude,
+                Alert.status, Alert.severity, Alert.created_at,
+                LocationUpdate.latitude.label("tracked_latitude"),
+                LocationUpdate.longitude.label("tracked_longitude"),
+                LocationUpdate.timestamp.label("tracked_at")
+            )
+            .outerjoin(LocationUpdate, LocationUpdate.id == latest_point)
+            .where(Alert.status.in_(INDEXED_STATUSES))
+        ).all()
+    finally:
+        db.close()
+
+    entries = []
+    for row in rows:
+        if row.tracked_at is not None and row.tracked_at >= row.created_at:
+            latitude, longitude, updated_at = row.tracked_latitude, row.tracked_longitude, row.tracked_at
+        else:
+            latitude, longitude, updated_at = row.latitude, row.longitude, row.created_at
+        entries.append(IndexedAlert(row.id, row.user_id, latitude, longitude,
+                                    row.status, row.severity, row.created_at, updated_at))
+
+    index.replace(entries)
+    return len(entries)
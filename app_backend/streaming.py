@@ -0,0 +1,153 @@
+"""
+Live alert streaming - in-process pub/sub hub feeding Server-Sent Events subscribers
+"""
+import asyncio
+import json
+import os
+import threading
+from typing import Dict, Optional, Set
+
+# Events buffered per subscriber before it is evicted as a slow consumer
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", 256))
+# Max concurrent subscribers per worker process
+STREAM_MAX_SUBSCRIBERS = int(os.getenv("STREAM_MAX_SUBSCRIBERS", 10000))
+STREAM_KEEPALIVE_SECONDS = float(os.getenv("STREAM_KEEPALIVE_SECONDS", 15))
+
+def format_event(event: str, data: dict) -> str:
+    """Encode an SSE frame"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+class Subscription:
+    """One subscriber's bounded event queue, owned by the event loop it was created on"""
+
+    def __init__(self, alert_id: int, loop: asyncio.AbstractEventLoop, max_queue: int):
+        self.alert_id = alert_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(max_queue)
+        self.evicted = False
+        self.closed = False
+
+    @property
+    def finished(self) -> bool:
+        return self.evicted or self.closed
+
+class AlertStreamHub:
+    """Fans out alert events to subscribers; a subscriber whose queue fills is evicted"""
+
+    def __init__(self, max_queue: int = STREAM_QUEUE_SIZE, max_subscribers: int = STREAM_MAX_SUBSCRIBERS):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+        self.published = 0
+        self.evictions = 0
+
+    def subscribe(self, alert_id: int) -> Optional[Subscription]:
+        """Register a subscriber on the running loop; None when the worker is at capacity"""
+        sub = Subscription(alert_id, asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                return None
+            self._subscribers.setdefault(alert_id, set()).add(sub)
+            self._count += 1
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._subscribers.get(sub.alert_id)
+            if subs and sub in subs:
+                subs.discard(sub)
+                self._count -= 1
+                if not subs:
+                    del self._subscribers[sub.alert_id]
+
+    def publish(self, alert_id: int, event: str, data: dict):
+        """Send an event to every subscriber of an alert; safe to call from any thread"""
+        with self._lock:
+            subs = list(self._subscribers.get(alert_id, ()))
+        if not subs:
+            return
+
+        frame = format_event(event, data)
+        self.published += 1
+        for sub in subs:
+            self._deliver(sub, frame)
+
+    def close(self, alert_id: int, event: Optional[str] = None, data: Optional[dict] = None):
+        """Send a final event and end every stream for an alert"""
+        with self._lock:
+            subs = self._subscribers.pop(alert_id, set())
+            self._count -= len(subs)
+
+        frame = format_event(event, data or {}) if event else None
+        for sub in subs:
+            if frame:
+                self._deliver(sub, frame)
+            self._deliver(sub, None)
+
+    def _deliver(self, sub: Subscription, frame: Optional[str]):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is sub.loop:
+            self._offer(sub, frame)
+        else:
+            try:
+                sub.loop.call_soon_threadsafe(self._offer, sub, frame)
+            except RuntimeError:
+                # Subscriber's loop has already shut down
+                self.unsubscribe(sub)
+
+    def _offer(self, sub: Subscription, frame: Optional[str]):
+        if sub.finished:
+            return
+        if frame is None:
+            sub.closed = True
+            try:
+                sub.queue.put_nowait(None)
+            except asyncio.QueueFull:
+                pass
+            return
+        try:
+            sub.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            sub.evicted = True
+            self.evictions += 1
+            self.unsubscribe(sub)
+
+    async def stream(self, sub: Subscription, is_disconnected, initial: Optional[str] = None):
+        """Async iterator of SSE frames for a subscriber, with keepalives"""
+        try:
+            if initial:
+                yield initial
+            while True:
+                if sub.finished and sub.queue.empty():
+                    if sub.evicted:
+                        yield format_event("evicted", {"reason": "slow consumer"})
+                    break
+                try:
+                    frame = await asyncio.wait_for(sub.queue.get(), STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                if frame is None:
+                    break
+                yield frame
+        finally:
+            self.unsubscribe(sub)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "alerts": len(self._subscribers),
+                "subscribers": self._count,
+                "published": self.published,
+                "evictions": self.evictions,
+            }
+
+alert_stream_hub = AlertStreamHub()
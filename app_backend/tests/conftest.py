@@ -0,0 +1,72 @@
+"""
+Shared fixtures: one throwaway SQLite database per test session, emptied before each test
+"""
+import os
+import tempfile
+
+# Settings are read when modules are imported, so point them at scratch locations first
+_tmpdir = tempfile.mkdtemp(prefix="safevoice-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/test.db"
+os.environ["LOCATION_ARCHIVE_DIR"] = os.path.join(_tmpdir, "archive")
+os.environ["OUTBOX_WORKERS"] = "0"
+os.environ["GOOGLE_MAPS_API_KEY"] = ""
+os.environ["TWILIO_ACCOUNT_SID"] = ""
+os.environ["SENDGRID_API_KEY"] = ""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from database import Base, SessionLocal, engine, init_db
+from geocache import geocode_cache
+from principal_cache import principal_cache
+from spatial_index import active_alert_index
+
+PASSWORD = "secret123"
+
+init_db()
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Empty every table and in-process cache so each test starts from scratch"""
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    principal_cache.clear()
+    geocode_cache.clear()
+    active_alert_index.replace([])
+    yield
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def client():
+    from main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def register(client):
+    """Register a user through the API and return (user_id, auth headers from /auth/login)"""
+    count = 0
+
+    def make(name: str = "Test User"):
+        nonlocal count
+        count += 1
+        phone = f"+1555000{count:04d}"
+        response = client.post("/auth/register", json={
+            "name": name, "phone": phone, "email": f"user{count}@example.com",
+            "password": PASSWORD, "codeword": "helpme"
+        })
+        assert response.status_code == 201, response.text
+        login = client.post("/auth/login", json={"phone": phone, "password": PASSWORD})
+        assert login.status_code == 200, login.text
+        return response.json()["user_id"], {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    return make
@@ -0,0 +1,102 @@
+"""
+Profile stats counters - kept in step with alert and contact writes, and rebuilt on demand
+"""
+from datetime import datetime
+
+from counters import reconcile_user_counters
+from database import Alert, Contact, UserCounters
+
+def stats(client, headers):
+    response = client.get("/profile/stats", headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def trigger(client, headers):
+    response = client.post("/sos/trigger", json={"latitude": 28.6, "longitude": 77.2}, headers=headers)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def add_contact(client, headers, phone):
+    response = client.post("/contacts/", json={"name": "Friend", "phone": phone}, headers=headers)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+def test_new_user_has_empty_stats(client, register):
+    _, headers = register()
+    assert stats(client, headers) == {
+        "total_alerts": 0, "active_alerts": 0, "total_contacts": 0, "last_alert_at": None
+    }
+
+def test_counters_follow_alert_lifecycle(client, register):
+    _, headers = register()
+    first = trigger(client, headers)
+    second = trigger(client, headers)
+
+    current = stats(client, headers)
+    assert current["total_alerts"] == 2
+    assert current["active_alerts"] == 2
+    assert datetime.fromisoformat(current["last_alert_at"]) == datetime.fromisoformat(second["created_at"])
+
+    assert client.put(f"/sos/{first['id']}/resolve", headers=headers).status_code == 200
+    assert stats(client, headers)["active_alerts"] == 1
+
+    # Reopening counts as active again; a no-op status update changes nothing
+    assert client.put(f"/sos/{first['id']}", json={"status": "active"}, headers=headers).status_code == 200
+    assert client.put(f"/sos/{first['id']}", json={"status": "active"}, headers=headers).status_code == 200
+    current = stats(client, headers)
+    assert current["total_alerts"] == 2
+    assert current["active_alerts"] == 2
+
+def test_counters_follow_contacts(client, register):
+    _, headers = register()
+    first = add_contact(client, headers, "+15550001111")
+    add_contact(client, headers, "+15550002222")
+    assert stats(client, headers)["total_contacts"] == 2
+
+    assert client.delete(f"/contacts/{first['id']}", headers=headers).status_code == 204
+    assert stats(client, headers)["total_contacts"] == 1
+
+def test_counters_are_per_user(client, register):
+    _, headers = register()
+    _, other_headers = register()
+    trigger(client, headers)
+    add_contact(client, headers, "+15550001111")
+
+    assert stats(client, other_headers)["total_alerts"] == 0
+    assert stats(client, other_headers)["total_contacts"] == 0
+
+def test_missing_counters_are_built_from_existing_rows(client, register, db):
+    user_id, headers = register()
+    db.add_all([
+        Alert(user_id=user_id, latitude=28.6, longitude=77.2, status="active"),
+        Alert(user_id=user_id, latitude=28.6, longitude=77.2, status="resolved"),
+        Contact(user_id=user_id, name="Friend", phone="+15550001111"),
+    ])
+    db.commit()
+    db.query(UserCounters).filter(UserCounters.user_id == user_id).delete()
+    db.commit()
+
+    current = stats(client, headers)
+    assert (current["total_alerts"], current["active_alerts"], current["total_contacts"]) == (2, 1, 1)
+    assert db.get(UserCounters, user_id) is not None
+
+def test_reconcile_repairs_drifted_counters(client, register, db):
+    user_id, headers = register()
+    other_id, _ = register()
+    trigger(client, headers)
+    add_contact(client, headers, "+15550001111")
+    stats(client, headers)
+
+    db.query(UserCounters).filter(UserCounters.user_id == user_id).update(
+        {"total_alerts": 40, "active_alerts": -3, "total_contacts": 9}
+    )
+    db.commit()
+
+    assert reconcile_user_counters(db, [user_id]) == 1
+    current = stats(client, headers)
+    assert (current["total_alerts"], current["active_alerts"], current["total_contacts"]) == (1, 1, 1)
+    assert current["last_alert_at"] is not None
+
+    # A full run also creates counters for users that never had any
+    assert reconcile_user_counters(db) == 2
+    assert db.get(UserCounters, other_id).total_alerts == 0
@@ -0,0 +1,110 @@
+"""
+Offline reverse geocoder - KD-tree nearest lookups and the lazily loaded places index
+"""
+import math
+import random
+import threading
+import time
+
+import pytest
+
+import offline_geocoder
+
+@pytest.fixture
+def places_csv(tmp_path, monkeypatch):
+    path = tmp_path / "places.csv"
+    path.write_text(
+        "name,latitude,longitude,admin1,country\n"
+        "New Delhi,28.6139,77.2090,Delhi,IN\n"
+        "Mumbai,19.0760,72.8777,Maharashtra,IN\n"
+        "Kolkata,22.5726,88.3639,West Bengal,IN\n",
+        encoding="utf-8"
+    )
+    monkeypatch.setattr(offline_geocoder, "OFFLINE_GEOCODER_PLACES", str(path))
+    monkeypatch.setattr(offline_geocoder, "_index", None)
+    monkeypatch.setattr(offline_geocoder, "_index_loaded", False)
+    return path
+
+def test_concurrent_first_lookups_wait_for_the_index(places_csv, monkeypatch):
+    real_load = offline_geocoder.load_places_csv
+    loads = []
+
+    def slow_load(path):
+        loads.append(path)
+        time.sleep(0.2)
+        return real_load(path)
+
+    monkeypatch.setattr(offline_geocoder, "load_places_csv", slow_load)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(offline_geocoder.offline_reverse_geocode(28.61, 77.21)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ["New Delhi, Delhi, IN"] * 8
+    assert len(loads) == 1
+
+def test_unreadable_dataset_is_tried_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(offline_geocoder, "OFFLINE_GEOCODER_PLACES", str(tmp_path / "missing.csv"))
+    monkeypatch.setattr(offline_geocoder, "_index", None)
+    monkeypatch.setattr(offline_geocoder, "_index_loaded", False)
+
+    assert offline_geocoder.offline_reverse_geocode(28.61, 77.21) is None
+    assert offline_geocoder._index_loaded is True
+
+def brute_force_nearest(places, latitude, longitude):
+    """Closest place by haversine distance, checking every place"""
+    def distance_km(place):
+        lat1, lon1, lat2, lon2 = map(math.radians, (latitude, longitude, place[0], place[1]))
+        a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        return 2 * offline_geocoder.EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+    best = min(places, key=distance_km)
+    return best[2], distance_km(best)
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(4)
+    places = [(rng.uniform(-90, 90), rng.uniform(-180, 180), f"place {i}") for i in range(2000)]
+    # Clusters and the poles and date line stress pruning across axis boundaries
+    places += [(28.6 + rng.gauss(0, 0.05), 77.2 + rng.gauss(0, 0.05), f"delhi {i}") for i in range(300)]
+    places += [(89.99, 10.0, "north pole"), (-89.99, -170.0, "south pole"), (0.0, 179.999, "date line east")]
+    index = offline_geocoder.PlaceIndex(places)
+    assert len(index) == len(places)
+
+    queries = [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(500)]
+    queries += [(28.6, 77.2), (90.0, 0.0), (-90.0, 0.0), (0.0, -179.999), (0.0, 180.0)]
+    for latitude, longitude in queries:
+        label, distance = index.nearest(latitude, longitude)
+        expected_label, expected_distance = brute_force_nearest(places, latitude, longitude)
+        assert label == expected_label
+        assert distance == pytest.approx(expected_distance, abs=1e-6)
+
+def test_nearest_wraps_across_the_date_line():
+    index = offline_geocoder.PlaceIndex([(0.0, 179.9, "east"), (0.0, 170.0, "far east"), (0.0, -170.0, "far west")])
+    label, distance = index.nearest(0.0, -179.9)
+    assert label == "east"
+    assert distance == pytest.approx(22.2, abs=0.1)
+
+def test_empty_and_single_place_indexes():
+    assert offline_geocoder.PlaceIndex([]).nearest(0, 0) is None
+    label, distance = offline_geocoder.PlaceIndex([(10.0, 20.0, "only")]).nearest(10.0, 20.0)
+    assert (label, distance) == ("only", pytest.approx(0.0, abs=1e-6))
+
+def test_far_places_are_reported_as_near(places_csv):
+    assert offline_geocoder.offline_reverse_geocode(28.6139, 77.2090) == "New Delhi, Delhi, IN"
+    # About 100 km east of New Delhi
+    assert offline_geocoder.offline_reverse_geocode(28.6139, 78.23).startswith("Near New Delhi, Delhi, IN (")
+
+def test_places_csv_skips_rows_without_coordinates_or_name(tmp_path):
+    path = tmp_path / "places.csv"
+    path.write_text(
+        "name,latitude,longitude,country\n"
+        "Good,1.5,2.5,XX\n"
+        "Bad latitude,north,2.5,XX\n"
+        ",3.0,4.0,\n",
+        encoding="utf-8"
+    )
+    assert offline_geocoder.load_places_csv(str(path)) == [(1.5, 2.5, "Good, XX")]
@@ -0,0 +1,289 @@
+"""
+Notification outbox - claiming, leases, retries and the worker wakeup
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import Alert, Notification, NotificationOutbox, SessionLocal, User
+from outbox import (
+    OUTBOX_BACKOFF_BASE_SECONDS, OUTBOX_BACKOFF_MAX_SECONDS, OUTBOX_LEASE_SECONDS, OUTBOX_MAX_ATTEMPTS,
+    _Wakeup, _take_lease, backoff_delay, claim_next_entry, complete_entry, recover_stale_entries
+)
+
+@pytest.fixture
+def alert(db):
+    user = User(name="Outbox", phone="+15550009999", email="outbox@example.com",
+                password_hash="x", codeword="helpme")
+    db.add(user)
+    db.flush()
+    alert = Alert(user_id=user.id, latitude=28.6, longitude=77.2, severity="medium")
+    db.add(alert)
+    db.commit()
+    return alert
+
+def add_entry(db, alert, channel="sms", due_in=timedelta(seconds=-1), attempts=0):
+    entry = NotificationOutbox(
+        alert_id=alert.id, recipient_type="contact", channel=channel,
+        recipient="+15550000001", message="help", status="pending", attempts=attempts,
+        next_attempt_at=datetime.utcnow() + due_in
+    )
+    db.add(entry)
+    db.commit()
+    return entry.id
+
+def load(entry_id):
+    session = SessionLocal()
+    try:
+        return session.get(NotificationOutbox, entry_id)
+    finally:
+        session.close()
+
+def notification_count():
+    session = SessionLocal()
+    try:
+        return session.query(Notification).count()
+    finally:
+        session.close()
+
+def expire_lease(entry_id):
+    """Backdate a lease from a separate session, as if its worker had stalled"""
+    session = SessionLocal()
+    try:
+        session.query(NotificationOutbox).filter(NotificationOutbox.id == entry_id).update(
+            {"locked_at": datetime.utcnow() - timedelta(seconds=OUTBOX_LEASE_SECONDS + 5)}
+        )
+        session.commit()
+    finally:
+        session.close()
+
+def test_backoff_delay_doubles_up_to_the_cap():
+    assert backoff_delay(1) == timedelta(seconds=OUTBOX_BACKOFF_BASE_SECONDS)
+    assert backoff_delay(2) == timedelta(seconds=OUTBOX_BACKOFF_BASE_SECONDS * 2)
+    assert backoff_delay(3) == timedelta(seconds=OUTBOX_BACKOFF_BASE_SECONDS * 4)
+    assert backoff_delay(50) == timedelta(seconds=OUTBOX_BACKOFF_MAX_SECONDS)
+
+def test_claim_takes_due_entries_on_the_requested_channels(db, alert):
+    add_entry(db, alert, due_in=timedelta(minutes=5))
+    email = add_entry(db, alert, channel="email")
+    due = add_entry(db, alert)
+
+    assert claim_next_entry(db, ["authority"]) is None
+    entry = claim_next_entry(db, ["sms"])
+    assert entry.id == due
+    assert entry.status == "in_progress" and entry.locked_at is not None
+    # Leased and not-yet-due entries are left alone
+    assert claim_next_entry(db, ["sms"]) is None
+    assert claim_next_entry(db, ["sms", "email"]).id == email
+
+def test_failed_attempt_is_rescheduled_with_backoff(db, alert):
+    entry_id = add_entry(db, alert)
+    entry = claim_next_entry(db, ["sms"])
+
+    assert complete_entry(db, entry, sent=False, error="provider timeout") is True
+
+    stored = load(entry_id)
+    assert stored.status == "pending"
+    assert stored.attempts == 1
+    assert stored.locked_at is None
+    assert stored.last_error == "provider timeout"
+    assert stored.next_attempt_at > datetime.utcnow()
+    assert notification_count() == 0
+
+def test_last_failed_attempt_marks_the_entry_failed(db, alert):
+    entry_id = add_entry(db, alert, attempts=OUTBOX_MAX_ATTEMPTS - 1)
+    entry = claim_next_entry(db, ["sms"])
+
+    assert complete_entry(db, entry, sent=False) is True
+
+    stored = load(entry_id)
+    assert stored.status == "failed"
+    assert stored.attempts == OUTBOX_MAX_ATTEMPTS
+    assert stored.completed_at is not None
+    assert notification_count() == 1
+
+def test_successful_attempt_writes_one_notification(db, alert):
+    entry_id = add_entry(db, alert)
+    entry = claim_next_entry(db, ["sms"])
+
+    assert complete_entry(db, entry, sent=True) is True
+
+    assert load(entry_id).status == "sent"
+    session = SessionLocal()
+    try:
+        notification = session.query(Notification).one()
+        assert notification.status == "sent"
+        assert notification.recipient_phone == "+15550000001"
+    finally:
+        session.close()
+
+def test_expired_lease_is_reclaimed_and_the_stale_result_dropped(alert, db):
+    entry_id = add_entry(db, alert)
+    slow_db, fast_db = SessionLocal(), SessionLocal()
+    try:
+        slow = claim_next_entry(slow_db, ["sms"])
+        expire_lease(entry_id)
+        fast = claim_next_entry(fast_db, ["sms"])
+        assert fast is not None and fast.id == entry_id
+
+        assert complete_entry(fast_db, fast, sent=True) is True
+        # The first worker finally returns; its lease is gone, so its outcome is discarded
+        assert complete_entry(slow_db, slow, sent=False, error="late") is False
+    finally:
+        slow_db.close()
+        fast_db.close()
+
+    stored = load(entry_id)
+    assert stored.status == "sent"
+    assert stored.attempts == 1
+    assert notification_count() == 1
+
+def test_expired_lease_is_reclaimed_by_only_one_worker(db, alert):
+    entry_id = add_entry(db, alert)
+    claim_next_entry(db, ["sms"])
+    expire_lease(entry_id)
+    # What both workers saw when they looked for work
+    stale = db.query(NotificationOutbox).filter(NotificationOutbox.id == entry_id).one()
+    seen = (stale.status, stale.locked_at)
+
+    first_db, second_db = SessionLocal(), SessionLocal()
+    try:
+        won = [
+            _take_lease(first_db, entry_id, *seen, datetime.utcnow()),
+            _take_lease(second_db, entry_id, *seen, datetime.utcnow()),
+        ]
+    finally:
+        first_db.close()
+        second_db.close()
+
+    assert won == [True, False]
+    assert load(entry_id).locked_at > seen[1]
+
+def test_recover_stale_entries_requeues_only_expired_leases(db, alert):
+    stale = add_entry(db, alert)
+    claim_next_entry(db, ["sms"])
+    add_entry(db, alert)
+    live = claim_next_entry(db, ["sms"]).id
+    expire_lease(stale)
+
+    assert recover_stale_entries(db) == 1
+    assert load(stale).status == "pending"
+    assert load(stale).locked_at is None
+    assert load(live).status == "in_progress"
+
+def test_wakeup_sent_while_busy_is_not_lost():
+    wakeup = _Wakeup()
+    seen = wakeup.generation
+    # Another thread enqueues while this worker is still looking for work
+    wakeup.notify()
+    started = time.monotonic()
+    wakeup.wait(seen, timeout=5)
+    assert time.monotonic() - started < 1
+
+def test_wakeup_reaches_every_idle_worker():
+    wakeup = _Wakeup()
+    seen = wakeup.generation
+    woken = []
+    threads = [
+        threading.Thread(target=lambda: (wakeup.wait(seen, timeout=5), woken.append(1)))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    wakeup.notify()
+    for thread in threads:
+        thread.join(2)
+    assert len(woken) == 3
+
+def test_sos_trigger_enqueues_contact_and_authority_messages(client, register):
+    _, headers = register()
+    client.post("/contacts/", json={
+        "name": "Friend", "phone": "+15550001111", "email": "friend@example.com"
+    }, headers=headers)
+
+    response = client.post("/sos/trigger", json={
+        "latitude": 28.6, "longitude": 77.2, "severity": "high"
+    }, headers=headers)
+    assert response.status_code in (200, 201), response.text
+
+    session = SessionLocal()
+    try:
+        entries = session.query(NotificationOutbox).filter(
+            NotificationOutbox.alert_id == response.json()["id"]
+        ).all()
+    finally:
+        session.close()
+    assert sorted((e.channel, e.recipient) for e in entries) == [
+        ("authority", "112"), ("email", "friend@example.com"), ("sms", "+15550001111")
+    ]
+    assert all(e.status == "pending" and e.attempts == 0 for e in entries)
+
+def test_trigger_stores_no_alert_if_its_notifications_cannot_be_queued(client, register, monkeypatch):
+    import sos
+
+    _, headers = register()
+    client.post("/contacts/", json={"name": "Friend", "phone": "+15550001111"}, headers=headers)
+    real_add = sos.add_sos_notifications
+
+    async def fail_after_adding(db, user, alert):
+        await real_add(db, user, alert)
+        raise RuntimeError("crashed before commit")
+
+    monkeypatch.setattr(sos, "add_sos_notifications", fail_after_adding)
+    with pytest.raises(RuntimeError):
+        client.post("/sos/trigger", json={"latitude": 28.6, "longitude": 77.2}, headers=headers)
+
+    session = SessionLocal()
+    try:
+        assert session.query(Alert).count() == 0
+        assert session.query(NotificationOutbox).count() == 0
+    finally:
+        session.close()
+
+def test_escalation_queues_the_authority_message(client, register):
+    _, headers = register()
+    alert = client.post("/sos/trigger", json={"latitude": 28.6, "longitude": 77.2}, headers=headers).json()
+
+    response = client.post(f"/sos/{alert['id']}/escalate", json={"alert_id": alert["id"]}, headers=headers)
+    assert response.status_code == 200, response.text
+
+    session = SessionLocal()
+    try:
+        entries = session.query(NotificationOutbox).filter(NotificationOutbox.channel == "authority").all()
+    finally:
+        session.close()
+    assert [(e.alert_id, e.recipient) for e in entries] == [(alert["id"], "112")]
+
+def test_delivery_is_reported_once_when_the_last_contact_message_settles(db, alert, monkeypatch):
+    import outbox
+
+    observed = []
+    monkeypatch.setattr(outbox, "observe_last_notification", observed.append)
+    sms = add_entry(db, alert)
+    email = add_entry(db, alert, channel="email", attempts=OUTBOX_MAX_ATTEMPTS - 1)
+    db.add(NotificationOutbox(
+        alert_id=alert.id, recipient_type="authority", channel="authority", recipient="112",
+        message="help", status="pending", attempts=0, next_attempt_at=datetime.utcnow()
+    ))
+    db.commit()
+
+    first = claim_next_entry(db, ["sms"])
+    second = claim_next_entry(db, ["email"])
+    assert complete_entry(db, first, sent=True) is True
+    # The email is still in flight
+    assert observed == []
+    assert outbox.report_alert_delivery(db, alert.id, sms) is None
+
+    # The email gives up; the pending authority message doesn't hold up the contact report
+    assert complete_entry(db, second, sent=False, error="bounced") is True
+    assert len(observed) == 1
+
+    report = outbox.report_alert_delivery(db, alert.id, email)
+    assert report["delivered"] == 1 and report["total"] == 2
+    assert report["first_delivery_ms"] == report["last_delivery_ms"]
+    assert observed[0] * 1000 == report["last_delivery_ms"]
+    # Only the entry that settled last reports
+    assert outbox.report_alert_delivery(db, alert.id, sms) is None
@@ -0,0 +1,117 @@
+"""
+Keyset pagination - cursor encoding and paging through the alert and location listings
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import Alert, LocationUpdate
+from pagination import MAX_PAGE_SIZE, clamp_limit, decode_cursor, encode_cursor
+
+def test_cursor_round_trip():
+    moment = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    cursor = encode_cursor(moment, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (moment, 42)
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", encode_cursor(datetime(2024, 1, 1), 1)[:-3], "WzFd"])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+def test_clamp_limit():
+    assert clamp_limit(0) == 1
+    assert clamp_limit(-5) == 1
+    assert clamp_limit(10) == 10
+    assert clamp_limit(MAX_PAGE_SIZE + 1) == MAX_PAGE_SIZE
+
+def add_alerts(db, user_id, count):
+    """Alerts in pairs sharing a created_at, so pages have to break ties on id"""
+    base = datetime.utcnow() - timedelta(hours=1)
+    alerts = [
+        Alert(user_id=user_id, latitude=28.6, longitude=77.2, status="resolved",
+              created_at=base + timedelta(seconds=i // 2))
+        for i in range(count)
+    ]
+    db.add_all(alerts)
+    db.commit()
+    return [alert.id for alert in sorted(alerts, key=lambda a: (a.created_at, a.id), reverse=True)]
+
+def test_alert_pages_visit_every_alert_once_newest_first(client, register, db):
+    user_id, headers = register()
+    expected = add_alerts(db, user_id, 7)
+    other_id, _ = register()
+    add_alerts(db, other_id, 3)
+
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/sos/", params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        seen += [alert["id"] for alert in body["alerts"]]
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == expected
+    assert pages == 3
+
+def test_alert_page_filled_exactly_has_no_next_cursor(client, register, db):
+    user_id, headers = register()
+    add_alerts(db, user_id, 4)
+
+    first = client.get("/sos/", params={"limit": 2}, headers=headers).json()
+    second = client.get("/sos/", params={"limit": 2, "cursor": first["next_cursor"]}, headers=headers).json()
+    assert len(second["alerts"]) == 2
+    assert second["next_cursor"] is None
+
+def test_alert_list_total_and_status_filter(client, register, db):
+    user_id, headers = register()
+    add_alerts(db, user_id, 5)
+    client.post("/sos/trigger", json={"latitude": 28.6, "longitude": 77.2}, headers=headers)
+
+    body = client.get("/sos/", params={"status_filter": "active", "include_total": "true"}, headers=headers).json()
+    assert body["total"] == 1
+    assert [alert["status"] for alert in body["alerts"]] == ["active"]
+    assert client.get("/sos/", headers=headers).json()["total"] is None
+
+def test_offset_still_works_without_a_cursor(client, register, db):
+    user_id, headers = register()
+    expected = add_alerts(db, user_id, 5)
+
+    body = client.get("/sos/", params={"limit": 2, "offset": 2}, headers=headers).json()
+    assert [alert["id"] for alert in body["alerts"]] == expected[2:4]
+
+def test_invalid_cursor_is_a_bad_request(client, register):
+    _, headers = register()
+    assert client.get("/sos/", params={"cursor": "garbage"}, headers=headers).status_code == 400
+    assert client.get("/location/history", params={"cursor": "garbage"}, headers=headers).status_code == 400
+
+def test_location_history_pages_through_the_next_cursor_header(client, register, db):
+    user_id, headers = register()
+    base = datetime.utcnow() - timedelta(hours=1)
+    points = [
+        LocationUpdate(user_id=user_id, latitude=28.6 + i * 0.01, longitude=77.2,
+                       timestamp=base + timedelta(seconds=i // 3))
+        for i in range(8)
+    ]
+    db.add_all(points)
+    db.commit()
+    expected = [p.id for p in sorted(points, key=lambda p: (p.timestamp, p.id), reverse=True)]
+
+    seen = []
+    params = {"limit": 3}
+    while True:
+        response = client.get("/location/history", params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        seen += [point["id"] for point in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        params = {"limit": 3, "cursor": cursor}
+
+    assert seen == expected
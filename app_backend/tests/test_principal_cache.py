@@ -0,0 +1,115 @@
+"""
+Principal cache - changed, disabled or deleted users must stop authenticating from the cache
+"""
+import time
+
+from sqlalchemy import update
+
+import principal_cache as principal_cache_module
+from database import User
+from principal_cache import PrincipalCache, principal_cache
+
+def profile(client, headers):
+    return client.get("/profile/", headers=headers)
+
+def test_repeat_requests_are_served_from_the_cache(client, register):
+    _, headers = register()
+    assert profile(client, headers).status_code == 200
+    hits = principal_cache.stats()["hits"]
+
+    assert profile(client, headers).status_code == 200
+    assert principal_cache.stats()["hits"] == hits + 1
+
+def test_deactivated_user_is_rejected_on_the_next_request(client, register, db):
+    user_id, headers = register()
+    assert profile(client, headers).status_code == 200
+
+    user = db.get(User, user_id)
+    user.is_active = False
+    db.commit()
+
+    assert profile(client, headers).status_code == 403
+
+def test_deleted_user_gets_401_with_the_old_token(client, register, db):
+    user_id, headers = register()
+    assert profile(client, headers).status_code == 200
+
+    db.delete(db.get(User, user_id))
+    db.commit()
+
+    assert profile(client, headers).status_code == 401
+
+def test_profile_update_is_seen_by_the_next_request(client, register):
+    _, headers = register()
+    assert profile(client, headers).json()["name"] == "Test User"
+
+    response = client.put("/profile/", json={"name": "Renamed"}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert profile(client, headers).json()["name"] == "Renamed"
+
+def test_rolled_back_change_does_not_invalidate(client, register, db):
+    user_id, headers = register()
+    profile(client, headers)
+    invalidations = principal_cache.stats()["invalidations"]
+
+    db.get(User, user_id).name = "Never saved"
+    db.flush()
+    db.rollback()
+
+    assert principal_cache.stats()["invalidations"] == invalidations
+    assert profile(client, headers).json()["name"] == "Test User"
+
+def test_entries_expire_after_the_ttl(client, register, db, monkeypatch):
+    user_id, headers = register()
+    assert profile(client, headers).status_code == 200
+
+    # A Core UPDATE skips the ORM hooks, like a change made by another process
+    db.execute(update(User).where(User.id == user_id).values(is_active=False))
+    db.commit()
+    assert profile(client, headers).status_code == 200
+
+    now = time.time()
+    monkeypatch.setattr(principal_cache_module.time, "time", lambda: now + principal_cache.ttl_seconds + 1)
+    assert profile(client, headers).status_code == 403
+
+def test_entry_does_not_outlive_its_token():
+    cache = PrincipalCache(max_size=10, ttl_seconds=60)
+    user = User(id=1, name="A", phone="+1", email="a@example.com", password_hash="x", codeword="c", is_active=True)
+
+    cache.set("expired", user, time.time() - 1, cache.generation(1))
+    cache.set("live", user, time.time() + 30, cache.generation(1))
+    assert cache.get("expired") is None
+    assert cache.get("live").name == "A"
+
+def test_load_racing_an_invalidation_is_not_cached():
+    cache = PrincipalCache(max_size=10, ttl_seconds=60)
+    user = User(id=1, name="A", phone="+1", email="a@example.com", password_hash="x", codeword="c", is_active=True)
+
+    generation = cache.generation(1)
+    # The user changes while the request that read them is still in flight
+    cache.invalidate_user(1)
+    cache.set("token", user, None, generation)
+    assert cache.get("token") is None
+
+def test_cached_copy_is_not_shared_between_requests():
+    cache = PrincipalCache(max_size=10, ttl_seconds=60)
+    user = User(id=1, name="A", phone="+1", email="a@example.com", password_hash="x", codeword="c", is_active=True)
+    cache.set("token", user, None, cache.generation(1))
+
+    cache.get("token").name = "edited by a handler"
+    assert cache.get("token").name == "A"
+
+def test_lru_evicts_the_least_recently_used_token():
+    cache = PrincipalCache(max_size=2, ttl_seconds=60)
+    users = [
+        User(id=i, name=str(i), phone=f"+{i}", email=f"{i}@example.com", password_hash="x", codeword="c", is_active=True)
+        for i in range(3)
+    ]
+    cache.set("t0", users[0], None, 0)
+    cache.set("t1", users[1], None, 0)
+    cache.get("t0")
+    cache.set("t2", users[2], None, 0)
+
+    assert cache.get("t1") is None
+    assert cache.get("t0") is not None and cache.get("t2") is not None
+    assert cache.stats()["evictions"] == 1
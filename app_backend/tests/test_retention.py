@@ -0,0 +1,183 @@
+"""
+Location retention - archive-then-delete of closed alerts, downsampling and the resume watermark
+"""
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, insert, select
+
+import retention
+from database import Alert, LocationArchive, LocationUpdate, RetentionState, User
+from history_export import load_archive
+from retention import Pacer, archive_closed_alerts, downsample_tracking_points, run_retention
+
+NOW = datetime(2024, 6, 1, 12, 0, 0)
+BUCKET = 600
+
+@pytest.fixture
+def user_id(db):
+    user = User(name="Retention", phone="+15550008888", email="retention@example.com",
+                password_hash="x", codeword="helpme")
+    db.add(user)
+    db.commit()
+    return user.id
+
+def add_alert(db, user_id, status="resolved", closed_days_ago=100, points=30):
+    closed_at = NOW - timedelta(days=closed_days_ago)
+    alert = Alert(user_id=user_id, latitude=28.6, longitude=77.2, status=status,
+                  created_at=closed_at - timedelta(hours=1), resolved_at=closed_at if status == "resolved" else None)
+    db.add(alert)
+    db.flush()
+    db.execute(insert(LocationUpdate), [
+        {"user_id": user_id, "alert_id": alert.id, "latitude": 28.6 + i * 0.001, "longitude": 77.2,
+         "timestamp": alert.created_at + timedelta(seconds=i * 30)}
+        for i in range(points)
+    ])
+    db.commit()
+    return alert.id
+
+def add_tracking(db, user_id, start, minutes):
+    """One tracking fix a minute from start"""
+    db.execute(insert(LocationUpdate), [
+        {"user_id": user_id, "latitude": 1.0 + i * 1e-4, "longitude": 2.0, "timestamp": start + timedelta(minutes=i)}
+        for i in range(minutes)
+    ])
+    db.commit()
+
+def alert_points(db, alert_id):
+    return db.scalar(select(func.count(LocationUpdate.id)).where(LocationUpdate.alert_id == alert_id))
+
+def tracking_timestamps(db, before):
+    return db.scalars(
+        select(LocationUpdate.timestamp)
+        .where(LocationUpdate.alert_id.is_(None), LocationUpdate.timestamp < before)
+        .order_by(LocationUpdate.timestamp)
+    ).all()
+
+def unpaced():
+    return Pacer(max_rows_per_second=0)
+
+def test_only_long_closed_alerts_are_archived(db, user_id):
+    old = add_alert(db, user_id)
+    recent = add_alert(db, user_id, closed_days_ago=10)
+    active = add_alert(db, user_id, status="active", closed_days_ago=200)
+
+    assert archive_closed_alerts(db, unpaced(), NOW) == (1, 30)
+
+    assert alert_points(db, old) == 0
+    assert alert_points(db, recent) == 30
+    assert alert_points(db, active) == 30
+    archive = db.get(LocationArchive, old)
+    assert archive.points == 30
+    assert [p["latitude"] for p in load_archive(archive.path)] == pytest.approx([28.6 + i * 0.001 for i in range(30)])
+
+def test_history_reads_the_same_before_and_after_archiving(client, register, db):
+    user_id, headers = register()
+    alert = client.post("/sos/trigger", json={"latitude": 28.6, "longitude": 77.2}, headers=headers).json()
+    client.post(f"/sos/{alert['id']}/location/batch", json={"fixes": [
+        {"latitude": 28.6 + i * 0.01, "longitude": 77.2} for i in range(1, 20)
+    ]}, headers=headers)
+    client.put(f"/sos/{alert['id']}/resolve", headers=headers)
+    before = client.get(f"/sos/{alert['id']}/location-history", headers=headers).json()
+
+    result = run_retention(now=datetime.utcnow() + timedelta(days=365), max_rows_per_second=0)
+
+    assert result["archived_alerts"] == 1 and result["completed"]
+    assert alert_points(db, alert["id"]) == 0
+    assert client.get(f"/sos/{alert['id']}/location-history", headers=headers).json() == before
+
+def test_interrupted_archive_run_resumes_without_losing_points(db, user_id, monkeypatch):
+    alert_id = add_alert(db, user_id, points=40)
+    original = db.execute(
+        select(LocationUpdate.latitude, LocationUpdate.timestamp)
+        .where(LocationUpdate.alert_id == alert_id).order_by(LocationUpdate.timestamp)
+    ).all()
+    real_delete = retention._delete_points
+
+    def crash_midway(session, ids, pacer, batch_size=retention.RETENTION_BATCH_SIZE):
+        real_delete(session, ids[:15], pacer, batch_size)
+        raise RuntimeError("worker killed")
+
+    monkeypatch.setattr(retention, "_delete_points", crash_midway)
+    with pytest.raises(RuntimeError):
+        archive_closed_alerts(db, unpaced(), NOW)
+    db.rollback()
+    # The archive was written and recorded before anything was deleted
+    assert db.get(LocationArchive, alert_id).points == 40
+    assert alert_points(db, alert_id) == 25
+
+    monkeypatch.setattr(retention, "_delete_points", real_delete)
+    # The next run only finishes the deletes; it doesn't re-archive what is left
+    assert archive_closed_alerts(db, unpaced(), NOW) == (0, 0)
+    assert alert_points(db, alert_id) == 0
+    archived = load_archive(db.get(LocationArchive, alert_id).path)
+    assert [(p["latitude"], datetime.fromisoformat(p["timestamp"])) for p in archived] == [tuple(row) for row in original]
+
+def test_stopped_archive_run_leaves_later_alerts_for_the_next_run(db, user_id):
+    first = add_alert(db, user_id)
+    second = add_alert(db, user_id)
+    stop = threading.Event()
+    pacer = Pacer(max_rows_per_second=0, stop=stop)
+    real_wait = pacer.wait
+    pacer.wait = lambda rows: (real_wait(rows), stop.set())
+
+    assert archive_closed_alerts(db, pacer, NOW) == (1, 30)
+    assert alert_points(db, first) == 0 and alert_points(db, second) == 30
+
+    assert archive_closed_alerts(db, unpaced(), NOW) == (1, 30)
+    assert alert_points(db, second) == 0
+
+def test_downsampling_keeps_the_last_fix_per_bucket(db, user_id):
+    alert_id = add_alert(db, user_id, closed_days_ago=5)
+    old_start = datetime(2024, 4, 1, 0, 0, 0)
+    add_tracking(db, user_id, old_start, 24 * 60)
+    add_tracking(db, user_id, NOW - timedelta(minutes=60), 60)
+
+    deleted = downsample_tracking_points(db, unpaced(), NOW, bucket_seconds=BUCKET)
+
+    assert deleted == 24 * 60 - 24 * 6
+    kept = tracking_timestamps(db, NOW - timedelta(days=1))
+    assert len(kept) == 24 * 6
+    assert all(t.minute % 10 == 9 for t in kept)
+    # Recent tracking points and alert trajectories are left alone
+    assert len(tracking_timestamps(db, NOW + timedelta(hours=1))) - len(kept) == 60
+    assert alert_points(db, alert_id) == 30
+
+def test_watermark_limits_later_runs_to_newly_aged_points(db, user_id):
+    add_tracking(db, user_id, datetime(2024, 4, 1), 120)
+    assert downsample_tracking_points(db, unpaced(), NOW, bucket_seconds=BUCKET) == 120 - 12
+    watermark = db.get(RetentionState, "location_downsampled_until").value
+    db.commit()
+
+    # A run before any more points have aged is a no-op
+    assert downsample_tracking_points(db, unpaced(), NOW, bucket_seconds=BUCKET) == 0
+
+    # Points back-filled behind the watermark are not re-read
+    add_tracking(db, user_id, datetime(2024, 4, 2), 30)
+    # Points that age past the cutoff by the next run are thinned
+    add_tracking(db, user_id, watermark + timedelta(minutes=10), 30)
+    later = NOW + timedelta(days=1)
+    assert downsample_tracking_points(db, unpaced(), later, bucket_seconds=BUCKET) == 30 - 3
+    assert len(tracking_timestamps(db, datetime(2024, 4, 3))) == 12 + 30
+
+def test_stopped_downsample_keeps_its_watermark_and_finishes_next_time(db, user_id):
+    for i in range(3):
+        db.add(User(name=f"Other {i}", phone=f"+1555000777{i}", email=f"other{i}@example.com",
+                    password_hash="x", codeword="helpme"))
+    db.commit()
+    user_ids = db.scalars(select(User.id).order_by(User.id)).all()
+    for uid in user_ids:
+        add_tracking(db, uid, datetime(2024, 4, 1), 60)
+
+    stop = threading.Event()
+    pacer = Pacer(max_rows_per_second=0, stop=stop)
+    real_wait = pacer.wait
+    pacer.wait = lambda rows: (real_wait(rows), stop.set())
+    assert downsample_tracking_points(db, pacer, NOW, bucket_seconds=BUCKET) == 54
+    assert db.get(RetentionState, "location_downsampled_until") is None
+    db.commit()
+
+    assert downsample_tracking_points(db, unpaced(), NOW, bucket_seconds=BUCKET) == 54 * (len(user_ids) - 1)
+    assert len(tracking_timestamps(db, NOW)) == 6 * len(user_ids)
+    assert db.get(RetentionState, "location_downsampled_until").value is not None
@@ -0,0 +1,129 @@
+"""
+Active alert spatial index - radius queries against brute force, date-line wrap and incident grouping
+"""
+import math
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import auth
+from spatial_index import (
+    ActiveAlertIndex, IndexedAlert, active_alert_index, group_incidents, rebuild_active_alert_index
+)
+
+T0 = datetime(2024, 1, 1, 12, 0, 0)
+
+def indexed(alert_id, latitude, longitude, seconds=0, status="active"):
+    at = T0 + timedelta(seconds=seconds)
+    return IndexedAlert(alert_id, alert_id, latitude, longitude, status, "medium", at, at)
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371 * math.asin(min(1.0, math.sqrt(a)))
+
+def brute_force(entries, latitude, longitude, radius_km):
+    found = [(e.id, haversine_km(latitude, longitude, e.latitude, e.longitude)) for e in entries]
+    return sorted((item for item in found if item[1] <= radius_km), key=lambda item: item[1])
+
+@pytest.mark.parametrize("count, spread", [(20, 0.5), (3000, 0.5), (3000, 60)])
+def test_nearby_matches_brute_force(count, spread):
+    # Few alerts scan every populated cell; many dense alerts walk the query's bounding box
+    rng = random.Random(count + int(spread))
+    entries = [
+        indexed(i, max(-90, min(90, 28.6 + rng.uniform(-spread, spread))), 77.2 + rng.uniform(-spread, spread))
+        for i in range(count)
+    ]
+    index = ActiveAlertIndex(cell_km=1.0)
+    index.replace(entries)
+
+    for _ in range(30):
+        latitude, longitude = 28.6 + rng.uniform(-spread, spread), 77.2 + rng.uniform(-spread, spread)
+        radius = rng.choice([0.5, 2, 10, 25])
+        result = index.nearby(latitude, longitude, radius)
+        expected = brute_force(entries, latitude, longitude, radius)
+        assert sorted(entry.id for entry, _ in result) == sorted(alert_id for alert_id, _ in expected)
+        distances = [distance for _, distance in result]
+        assert distances == sorted(distances)
+        assert distances == pytest.approx(sorted(distance for _, distance in expected), abs=1e-6)
+
+def test_nearby_wraps_across_the_date_line():
+    index = ActiveAlertIndex(cell_km=1.0)
+    entries = [indexed(1, 0.0, 179.99), indexed(2, 0.0, -179.99), indexed(3, 0.0, 179.0)]
+    # Enough other cells that the query walks its bounding box instead of scanning every cell
+    entries += [indexed(1000 + i, -60 + i * 0.05, 10.0) for i in range(300)]
+    index.replace(entries)
+
+    for longitude in (180.0, -180.0, 179.995, -179.995):
+        assert {entry.id for entry, _ in index.nearby(0.0, longitude, 5)} == {1, 2}
+
+def test_nearby_near_a_pole_covers_every_longitude():
+    index = ActiveAlertIndex(cell_km=1.0)
+    entries = [indexed(i, 89.95, -180 + i * 30) for i in range(12)]
+    index.replace(entries)
+    assert len(index.nearby(89.99, 0.0, 20)) == 12
+
+def test_nearby_limit_keeps_the_nearest():
+    index = ActiveAlertIndex()
+    index.replace([indexed(i, 28.6 + i * 0.001, 77.2) for i in range(10)])
+    assert [entry.id for entry, _ in index.nearby(28.6, 77.2, 5, limit=3)] == [0, 1, 2]
+
+def test_update_and_move_keep_the_grid_in_step():
+    index = ActiveAlertIndex(cell_km=1.0)
+    alert = type("Alert", (), {"id": 1, "user_id": 1, "latitude": 28.6, "longitude": 77.2,
+                               "status": "active", "severity": "high", "created_at": T0})()
+    index.update(alert)
+    assert [entry.id for entry, _ in index.nearby(28.6, 77.2, 1)] == [1]
+
+    index.move(1, 28.7, 77.2, T0 + timedelta(minutes=1))
+    assert index.nearby(28.6, 77.2, 1) == []
+    assert [entry.id for entry, _ in index.nearby(28.7, 77.2, 1)] == [1]
+    # A late-arriving older fix doesn't move it back
+    index.move(1, 28.6, 77.2, T0 + timedelta(seconds=30))
+    assert index.nearby(28.6, 77.2, 1) == []
+
+    alert.status = "resolved"
+    index.update(alert)
+    assert len(index) == 0 and index.stats()["cells"] == 0
+
+def test_incidents_link_alerts_close_in_space_and_time():
+    a = indexed(1, 28.6, 77.2, seconds=0)
+    # 0.4 km north of a, 5 minutes later
+    b = indexed(2, 28.6 + 0.4 / 111.195, 77.2, seconds=300)
+    # 0.4 km north of b: too far from a, but linked through b
+    c = indexed(3, 28.6 + 0.8 / 111.195, 77.2, seconds=600)
+    # Same place as a, but after the window
+    d = indexed(4, 28.6, 77.2, seconds=2000)
+    # Same time as a, 5 km away
+    e = indexed(5, 28.645, 77.2, seconds=10)
+
+    groups = group_incidents([d, c, e, b, a], radius_km=0.5, window_seconds=900)
+    assert [[alert.id for alert in group] for group in groups] == [[1, 2, 3], [5], [4]]
+
+def test_nearby_endpoint_groups_incidents_for_dispatchers(client, register, monkeypatch):
+    monkeypatch.setattr(auth, "DISPATCHER_TOKEN", "dispatch-secret")
+    ids = []
+    for latitude in (28.6, 28.601, 28.7):
+        _, headers = register()
+        response = client.post("/sos/trigger", json={"latitude": latitude, "longitude": 77.2}, headers=headers)
+        ids.append(response.json()["id"])
+
+    params = {"latitude": 28.6, "longitude": 77.2, "radius_km": 5}
+    assert client.get("/sos/nearby", params=params).status_code == 403
+    body = client.get("/sos/nearby", params=params, headers={"X-Dispatcher-Token": "dispatch-secret"}).json()
+
+    assert [alert["id"] for alert in body["alerts"]] == ids[:2]
+    assert [incident["alert_ids"] for incident in body["incidents"]] == [ids[:2]]
+    assert {alert["incident_id"] for alert in body["alerts"]} == {ids[0]}
+
+def test_rebuild_places_alerts_at_their_latest_tracked_point(client, register):
+    _, headers = register()
+    alert = client.post("/sos/trigger", json={"latitude": 28.6, "longitude": 77.2}, headers=headers).json()
+    client.post(f"/sos/{alert['id']}/location", json={"latitude": 28.7, "longitude": 77.2}, headers=headers)
+    resolved = client.post("/sos/trigger", json={"latitude": 28.7, "longitude": 77.2}, headers=headers).json()
+    client.put(f"/sos/{resolved['id']}/resolve", headers=headers)
+
+    active_alert_index.replace([])
+    assert rebuild_active_alert_index() == 1
+    assert [entry.id for entry, _ in active_alert_index.nearby(28.7, 77.2, 1)] == [alert["id"]]
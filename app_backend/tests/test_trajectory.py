@@ -0,0 +1,138 @@
+"""
+Trajectory simplification - Douglas-Peucker tolerance, kept stops and stationary-point merging at ingest
+"""
+import random
+from datetime import datetime, timedelta
+from math import cos, radians
+
+import pytest
+
+from trajectory import (
+    LOCATION_STATIONARY_MAX_RADIUS_M, LOCATION_STATIONARY_MIN_RADIUS_M,
+    douglas_peucker, should_merge, stationary_radius
+)
+
+METERS_PER_DEGREE = 111_320.0
+# About 1 m north of the origin, in degrees
+ONE_METER = 1 / METERS_PER_DEGREE
+
+def point(latitude, longitude, seconds=0):
+    return {"latitude": latitude, "longitude": longitude,
+            "timestamp": datetime(2024, 1, 1) + timedelta(seconds=seconds)}
+
+def offset_m(points, index, segment_start, segment_end):
+    """Distance in meters from a point to the segment between two others, on a local plane"""
+    lat0 = points[0]["latitude"]
+    def xy(p):
+        return p["longitude"] * METERS_PER_DEGREE * cos(radians(lat0)), p["latitude"] * METERS_PER_DEGREE
+    (px, py), (ax, ay), (bx, by) = xy(points[index]), xy(points[segment_start]), xy(points[segment_end])
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    t = 0.0 if length_sq == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_sq))
+    return ((px - ax - t * dx) ** 2 + (py - ay - t * dy) ** 2) ** 0.5
+
+def random_walk(count, seed):
+    rng = random.Random(seed)
+    latitude, longitude = 28.6, 77.2
+    points = []
+    for i in range(count):
+        latitude += rng.gauss(0, 20) * ONE_METER
+        longitude += rng.gauss(0, 20) * ONE_METER
+        points.append(point(latitude, longitude, seconds=i * 5))
+    return points
+
+@pytest.mark.parametrize("tolerance", [1, 5, 25, 100])
+def test_dropped_points_stay_within_tolerance(tolerance):
+    points = random_walk(500, seed=tolerance)
+    simplified = douglas_peucker(points, tolerance, stop_min_seconds=0)
+    kept = [points.index(p) for p in simplified]
+
+    assert kept[0] == 0 and kept[-1] == len(points) - 1
+    assert len(simplified) < len(points)
+    for start, end in zip(kept, kept[1:]):
+        for i in range(start + 1, end):
+            assert offset_m(points, i, start, end) <= tolerance + 1e-6
+
+def test_simplification_keeps_order_and_original_objects():
+    points = random_walk(100, seed=7)
+    simplified = douglas_peucker(points, 10, stop_min_seconds=0)
+    indexes = [points.index(p) for p in simplified]
+    assert indexes == sorted(indexes)
+    assert all(any(p is q for q in points) for p in simplified)
+
+def test_straight_line_collapses_to_its_endpoints():
+    points = [point(28.6 + i * 10 * ONE_METER, 77.2, seconds=i) for i in range(50)]
+    assert douglas_peucker(points, 1, stop_min_seconds=0) == [points[0], points[-1]]
+
+def test_corner_beyond_tolerance_is_kept():
+    points = [point(28.6, 77.2), point(28.6 + 50 * ONE_METER, 77.2, 10), point(28.6 + 100 * ONE_METER, 77.2, 20),
+              point(28.6 + 100 * ONE_METER, 77.2 + 0.001, 30)]
+    simplified = douglas_peucker(points, 5, stop_min_seconds=0)
+    assert simplified == [points[0], points[2], points[3]]
+
+def test_short_inputs_and_zero_tolerance_are_returned_unchanged():
+    points = random_walk(10, seed=1)
+    assert douglas_peucker(points[:2], 50) == points[:2]
+    assert douglas_peucker(points, 0) == points
+
+def test_stops_survive_simplification():
+    # A straight walk with a ten-minute pause in the middle
+    points = [point(28.6 + i * 10 * ONE_METER, 77.2, seconds=i * 10) for i in range(10)]
+    points += [point(28.6 + i * 10 * ONE_METER, 77.2, seconds=600 + i * 10) for i in range(10, 20)]
+
+    assert douglas_peucker(points, 5, stop_min_seconds=0) == [points[0], points[-1]]
+    assert douglas_peucker(points, 5, stop_min_seconds=120) == [points[0], points[9], points[10], points[-1]]
+
+def test_stationary_radius_follows_accuracy_within_bounds():
+    assert stationary_radius(None) == LOCATION_STATIONARY_MIN_RADIUS_M
+    assert stationary_radius(0) == LOCATION_STATIONARY_MIN_RADIUS_M
+    assert stationary_radius(1) == LOCATION_STATIONARY_MIN_RADIUS_M
+    assert stationary_radius(30) == 30
+    assert stationary_radius(10_000) == LOCATION_STATIONARY_MAX_RADIUS_M
+
+def test_should_merge_compares_against_the_stop_anchor():
+    anchor = type("P", (), {"latitude": 28.6, "longitude": 77.2})()
+    near = type("P", (), {"latitude": 28.6 + 5 * ONE_METER, "longitude": 77.2})()
+
+    assert should_merge(anchor, near, 28.6 + 8 * ONE_METER, 77.2, accuracy=10)
+    # Within 10 m of the tail but not of the anchor: a slow drift starts a new segment
+    assert not should_merge(anchor, near, 28.6 + 14 * ONE_METER, 77.2, accuracy=10)
+    # A coarser fix widens the radius
+    assert should_merge(anchor, near, 28.6 + 14 * ONE_METER, 77.2, accuracy=20)
+    assert not should_merge(None, near, 28.6, 77.2, accuracy=10)
+
+def history(client, headers):
+    return list(reversed(client.get("/location/history", headers=headers).json()))
+
+def test_repeated_fixes_at_a_stop_are_merged_at_ingest(client, register):
+    _, headers = register()
+    for _ in range(5):
+        response = client.post("/location/update", json={"latitude": 28.6, "longitude": 77.2}, headers=headers)
+        assert response.status_code == 200, response.text
+
+    # The stop is kept as where it began and where the phone was last seen
+    stored = history(client, headers)
+    assert len(stored) == 2
+    assert stored[1]["id"] == response.json()["id"]
+
+    client.post("/location/update", json={"latitude": 28.61, "longitude": 77.2}, headers=headers)
+    assert len(history(client, headers)) == 3
+
+def test_batch_reports_merged_fixes(client, register):
+    _, headers = register()
+    start = datetime.utcnow() - timedelta(minutes=5)
+    fixes = [
+        {"latitude": 28.6, "longitude": 77.2, "timestamp": (start + timedelta(seconds=i * 10)).isoformat()}
+        for i in range(4)
+    ]
+    fixes.append({"latitude": 28.61, "longitude": 77.2, "timestamp": (start + timedelta(seconds=60)).isoformat()})
+    fixes.append({"latitude": 91, "longitude": 77.2})
+
+    body = client.post("/location/batch", json={"fixes": fixes}, headers=headers).json()
+    assert [result["status"] for result in body["results"]] == [
+        "accepted", "accepted", "merged", "merged", "accepted", "rejected"
+    ]
+    assert (body["accepted"], body["merged"], body["rejected"]) == (3, 2, 1)
+    # Merged fixes point at the stop they moved
+    assert body["results"][2]["id"] == body["results"][3]["id"] == body["results"][1]["id"]
+    assert len(history(client, headers)) == 3
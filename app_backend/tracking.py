@@ -0,0 +1,226 @@
+"""
+Location ingestion - validation, stationary-point merging and bulk inserts of GPS fixes
+"""
+import os
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from database import LocationUpdate
+from location import get_address_from_coordinates
+from models import LocationFix, LocationBatchItemResult
+from trajectory import should_merge
+from streaming import alert_stream_hub
+from spatial_index import active_alert_index
+
+# Max fixes accepted in one batch request
+LOCATION_BATCH_MAX_SIZE = int(os.getenv("LOCATION_BATCH_MAX_SIZE", 500))
+# Fixes timestamped further than this in the future are rejected
+LOCATION_MAX_CLOCK_SKEW_SECONDS = int(os.getenv("LOCATION_MAX_CLOCK_SKEW_SECONDS", 300))
+# Merge fixes that fall inside the GPS accuracy radius of the current stop
+LOCATION_SIMPLIFY_ON_INGEST = os.getenv("LOCATION_SIMPLIFY_ON_INGEST", "true").lower() == "true"
+
+def _normalize_timestamp(timestamp: Optional[datetime], received_at: datetime) -> datetime:
+    if timestamp is None:
+        return received_at
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def validate_location_batch(
+    raw_fixes: List[Dict[str, Any]]
+) -> Tuple[List[Tuple[int, LocationFix, datetime]], List[LocationBatchItemResult]]:
+    """Validate every fix in one pass, returning accepted fixes and per-item rejections"""
+    received_at = datetime.utcnow()
+    latest_allowed = received_at + timedelta(seconds=LOCATION_MAX_CLOCK_SKEW_SECONDS)
+    accepted = []
+    rejected = []
+
+    for index, raw in enumerate(raw_fixes):
+        try:
+            fix = LocationFix.model_validate(raw)
+        except ValidationError as e:
+            error = e.errors()[0]
+            field = ".".join(str(part) for part in error["loc"])
+            rejected.append(LocationBatchItemResult(
+                index=index, status="rejected", error=f"{field}: {error['msg']}"
+            ))
+            continue
+
+        timestamp = _normalize_timestamp(fix.timestamp, received_at)
+        if timestamp > latest_allowed:
+            rejected.append(LocationBatchItemResult(
+                index=index, status="rejected", error="timestamp: in the future"
+            ))
+            continue
+
+        accepted.append((index, fix, timestamp))
+
+    return accepted, rejected
+
+def location_to_dict(loc: LocationUpdate) -> dict:
+    """Serialize a location point for history and stream payloads"""
+    return {
+        "latitude": loc.latitude,
+        "longitude": loc.longitude,
+        "address": loc.address,
+        "timestamp": loc.timestamp.isoformat(),
+        "accuracy": loc.accuracy,
+        "speed": loc.speed,
+        "heading": loc.heading
+    }
+
+async def _stream_tail(db: AsyncSession, user_id: int, alert_id: Optional[int]) -> List[LocationUpdate]:
+    """Last two stored points of a user's tracking stream or an alert's trajectory, oldest first"""
+    query = select(LocationUpdate).where(LocationUpdate.user_id == user_id)
+    if alert_id is None:
+        query = query.where(LocationUpdate.alert_id.is_(None))
+    else:
+        query = query.where(LocationUpdate.alert_id == alert_id)
+    points = (await db.scalars(
+        query.order_by(LocationUpdate.timestamp.desc(), LocationUpdate.id.desc()).limit(2)
+    )).all()
+    return list(reversed(points))
+
+def _move_point(point, latitude: float, longitude: float, accuracy: Optional[float],
+                speed: Optional[float], heading: Optional[float], timestamp: datetime):
+    point.latitude = latitude
+    point.longitude = longitude
+    point.accuracy = accuracy
+    point.speed = speed
+    point.heading = heading
+    point.timestamp = timestamp
+
+async def record_location(
+    db: AsyncSession,
+    user_id: int,
+    latitude: float,
+    longitude: float,
+    alert_id: Optional[int] = None,
+    address: Optional[str] = None,
+    accuracy: Optional[float] = None,
+    speed: Optional[float] = None,
+    heading: Optional[float] = None
+) -> LocationUpdate:
+    """Store a single fix, merging it into the current stop if the phone hasn't moved"""
+    now = datetime.utcnow()
+    
+    if LOCATION_SIMPLIFY_ON_INGEST:
+        tail = await _stream_tail(db, user_id, alert_id)
+        if len(tail) == 2 and should_merge(tail[0], tail[1], latitude, longitude, accuracy):
+            last = tail[1]
+            _move_point(last, latitude, longitude, accuracy, speed, heading, now)
+            await db.commit()
+            return last
+    
+    if address is None:
+        # End the read transaction so no pooled connection is held across the geocoder call
+        await db.commit()
+        address = await run_in_threadpool(get_address_from_coordinates, latitude, longitude)
+    
+    location_update = LocationUpdate(
+        user_id=user_id,
+        alert_id=alert_id,
+        latitude=latitude,
+        longitude=longitude,
+        address=address,
+        accuracy=accuracy,
+        speed=speed,
+        heading=heading,
+        timestamp=now
+    )
+    db.add(location_update)
+    await db.commit()
+    
+    return location_update
+
+async def insert_location_batch(
+    db: AsyncSession,
+    user_id: int,
+    raw_fixes: List[Dict[str, Any]],
+    alert_id: Optional[int] = None
+) -> List[LocationBatchItemResult]:
+    """Validate and bulk-insert a batch of fixes, returning one result per item.
+
+    Fixes inside the accuracy radius of the current stop are merged into it
+    (status ``merged``, with the id of the point they were merged into).
+    """
+    accepted, rejected = validate_location_batch(raw_fixes)
+    results = list(rejected)
+    if not accepted:
+        return results
+
+    accepted.sort(key=lambda item: item[2])
+    tail = []
+    if LOCATION_SIMPLIFY_ON_INGEST:
+        tail = await _stream_tail(db, user_id, alert_id)
+        # Fixes older than the stored tail are back-filled as-is
+        if tail and accepted[0][2] < tail[-1].timestamp:
+            tail = []
+
+    pending = []
+    targets = []
+    for index, fix, timestamp in accepted:
+        if (LOCATION_SIMPLIFY_ON_INGEST and len(tail) >= 2
+                and should_merge(tail[-2], tail[-1], fix.latitude, fix.longitude, fix.accuracy)):
+            _move_point(tail[-1], fix.latitude, fix.longitude, fix.accuracy,
+                        fix.speed, fix.heading, timestamp)
+            targets.append((index, "merged", tail[-1]))
+            continue
+
+        row = SimpleNamespace(
+            id=None,
+            user_id=user_id,
+            alert_id=alert_id,
+            latitude=fix.latitude,
+            longitude=fix.longitude,
+            address=fix.address,
+            accuracy=fix.accuracy,
+            speed=fix.speed,
+            heading=fix.heading,
+            timestamp=timestamp
+        )
+        pending.append(row)
+        tail.append(row)
+        targets.append((index, "accepted", row))
+
+    if pending:
+        # Only the newest new point is reverse geocoded; the rest keep any address the client sent
+        newest = pending[-1]
+        if newest.address is None:
+            # As in record_location, end the tail read transaction (keeping any merges made
+            # above) so no pooled connection is held across the geocoder call
+            await db.commit()
+            newest.address = await run_in_threadpool(
+                get_address_from_coordinates, newest.latitude, newest.longitude
+            )
+
+        rows = [{key: value for key, value in vars(row).items() if key != "id"} for row in pending]
+        ids = (await db.scalars(
+            insert(LocationUpdate).returning(LocationUpdate.id, sort_by_parameter_order=True),
+            rows
+        )).all()
+        for row, location_id in zip(pending, ids):
+            row.id = location_id
+
+    await db.commit()
+
+    if alert_id is not None:
+        # Each stored point once, in time order (several fixes may merge into one)
+        stored = {id(target): target for _, _, target in targets}
+        points = sorted(stored.values(), key=lambda p: p.timestamp)
+        for point in points:
+            alert_stream_hub.publish(alert_id, "location", location_to_dict(point))
+        active_alert_index.move(alert_id, points[-1].latitude, points[-1].longitude, points[-1].timestamp)
+
+    results.extend(
+        LocationBatchItemResult(index=index, status=item_status, id=target.id)
+        for index, item_status, target in targets
+    )
+    results.sort(key=lambda result: result.index)
+    return results
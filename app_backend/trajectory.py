@@ -0,0 +1,145 @@
+"""
+Trajectory simplification and metrics - stationary-point merging, Douglas-Peucker reduction and summaries
+"""
+import os
+from datetime import datetime
+from math import cos, radians
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from location import calculate_distance, path_metrics
+
+# Ingest-time merging: fixes within the GPS accuracy radius count as stationary
+LOCATION_STATIONARY_MIN_RADIUS_M = float(os.getenv("LOCATION_STATIONARY_MIN_RADIUS_M", 10))
+LOCATION_STATIONARY_MAX_RADIUS_M = float(os.getenv("LOCATION_STATIONARY_MAX_RADIUS_M", 100))
+# On-demand simplification always keeps points where the phone stayed this long
+TRAJECTORY_STOP_MIN_SECONDS = float(os.getenv("TRAJECTORY_STOP_MIN_SECONDS", 120))
+# Summaries: segments slower than this count as stationary time; shorter segments are left
+# out of max speed, where GPS jitter between near-simultaneous fixes would dominate
+TRAJECTORY_STATIONARY_SPEED_MPS = float(os.getenv("TRAJECTORY_STATIONARY_SPEED_MPS", 0.5))
+TRAJECTORY_MIN_SPEED_SEGMENT_SECONDS = float(os.getenv("TRAJECTORY_MIN_SPEED_SEGMENT_SECONDS", 5))
+
+_METERS_PER_DEGREE = 111_320.0
+
+def stationary_radius(accuracy: Optional[float]) -> float:
+    """Radius in meters within which a new fix is treated as not having moved"""
+    radius = accuracy if accuracy is not None and accuracy > 0 else LOCATION_STATIONARY_MIN_RADIUS_M
+    return min(max(radius, LOCATION_STATIONARY_MIN_RADIUS_M), LOCATION_STATIONARY_MAX_RADIUS_M)
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    return calculate_distance(lat1, lon1, lat2, lon2) * 1000
+
+def should_merge(anchor, tail, latitude: float, longitude: float, accuracy: Optional[float]) -> bool:
+    """Whether a new fix extends a stop instead of starting a new segment.
+
+    ``anchor`` is the point where the stop began and ``tail`` the latest
+    point of the stop. Both need ``latitude``/``longitude`` attributes. The
+    new fix replaces ``tail`` when both it and ``tail`` are within the
+    accuracy radius of ``anchor``; comparing against the anchor keeps a
+    long stop from drifting.
+    """
+    if anchor is None or tail is None:
+        return False
+    radius = stationary_radius(accuracy)
+    return (
+        distance_m(anchor.latitude, anchor.longitude, tail.latitude, tail.longitude) <= radius
+        and distance_m(anchor.latitude, anchor.longitude, latitude, longitude) <= radius
+    )
+
+def _timestamp(point) -> Optional[datetime]:
+    value = point["timestamp"] if isinstance(point, dict) else getattr(point, "timestamp", None)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value
+
+def _coords(point):
+    if isinstance(point, dict):
+        return point["latitude"], point["longitude"]
+    return point.latitude, point.longitude
+
+def douglas_peucker(points: Sequence, tolerance_m: float,
+                    stop_min_seconds: float = TRAJECTORY_STOP_MIN_SECONDS) -> List:
+    """Simplify a trajectory to within ``tolerance_m`` meters, keeping stops.
+
+    Points may be dicts or objects with latitude/longitude/timestamp. They
+    are projected onto a local equirectangular plane, which is accurate to
+    well under a meter over the extent of a single trajectory. Points
+    followed by a gap of at least ``stop_min_seconds`` are always kept so
+    stops survive simplification.
+    """
+    count = len(points)
+    if count <= 2 or tolerance_m <= 0:
+        return list(points)
+
+    coords = [_coords(p) for p in points]
+    lat0 = coords[0][0]
+    x_scale = _METERS_PER_DEGREE * cos(radians(lat0))
+    xs = [lon * x_scale for _, lon in coords]
+    ys = [lat * _METERS_PER_DEGREE for lat, _ in coords]
+
+    keep = [False] * count
+    keep[0] = keep[-1] = True
+
+    if stop_min_seconds > 0:
+        timestamps = [_timestamp(p) for p in points]
+        for i in range(count - 1):
+            if timestamps[i] is not None and timestamps[i + 1] is not None:
+                if abs((timestamps[i + 1] - timestamps[i]).total_seconds()) >= stop_min_seconds:
+                    keep[i] = keep[i + 1] = True
+
+    # Run DP independently between each pair of forced points
+    anchors = [i for i in range(count) if keep[i]]
+    tolerance_sq = tolerance_m * tolerance_m
+    stack = list(zip(anchors, anchors[1:]))
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+
+        ax, ay = xs[first], ys[first]
+        dx, dy = xs[last] - ax, ys[last] - ay
+        length_sq = dx * dx + dy * dy
+        max_dist_sq = -1.0
+        index = first
+
+        for i in range(first + 1, last):
+            px, py = xs[i] - ax, ys[i] - ay
+            if length_sq == 0:
+                dist_sq = px * px + py * py
+            else:
+                t = max(0.0, min(1.0, (px * dx + py * dy) / length_sq))
+                ex, ey = px - t * dx, py - t * dy
+                dist_sq = ex * ex + ey * ey
+            if dist_sq > max_dist_sq:
+                max_dist_sq = dist_sq
+                index = i
+
+        if max_dist_sq > tolerance_sq:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [p for p, kept in zip(points, keep) if kept]
+
+def trajectory_summary(points: Sequence) -> dict:
+    """Distance travelled, max speed and time spent stationary over time-ordered points.
+
+    Points may be dicts or objects with latitude/longitude/timestamp.
+    """
+    summary = {"distance_m": 0.0, "duration_seconds": 0.0, "max_speed_mps": None, "stationary_seconds": 0.0}
+    if len(points) < 2:
+        return summary
+
+    coords = np.array([_coords(p) for p in points], dtype=np.float64)
+    metrics = path_metrics(coords[:, 0], coords[:, 1], [_timestamp(p) for p in points])
+    seconds = metrics["segment_seconds"]
+    speeds = metrics["speed_mps"]
+
+    timed = seconds >= TRAJECTORY_MIN_SPEED_SEGMENT_SECONDS
+    summary["distance_m"] = round(float(metrics["cumulative_km"][-1]) * 1000, 1)
+    summary["duration_seconds"] = float(seconds.sum())
+    if timed.any():
+        summary["max_speed_mps"] = round(float(speeds[timed].max()), 2)
+    summary["stationary_seconds"] = float(seconds[(seconds > 0) & (speeds < TRAJECTORY_STATIONARY_SPEED_MPS)].sum())
+    return summary